@@ -113,4 +113,272 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Allow public access
     ],
-}
\ No newline at end of file
+}
+
+# Cursor pagination for the core_api list endpoints (users, allergies).
+# Clients can pass ?limit= to change the page size up to MAX_PAGE_SIZE.
+CORE_API_PAGINATION = {
+    'PAGE_SIZE': int(os.getenv('CORE_API_PAGE_SIZE', '50')),
+    'MAX_PAGE_SIZE': int(os.getenv('CORE_API_MAX_PAGE_SIZE', '500')),
+}
+
+# Bulk allergy writes (POST /api/core/allergies/bulk/): the most items one
+# request may create, update and delete, and the rows per INSERT/UPDATE.
+CORE_API_BULK = {
+    'MAX_ITEMS': int(os.getenv('CORE_API_BULK_MAX_ITEMS', '5000')),
+    'BATCH_SIZE': int(os.getenv('CORE_API_BULK_BATCH_SIZE', '500')),
+}
+
+# LLM hedging: if Gemini has not answered within its recent latency
+# percentile, send the same prompt to Mistral and use whichever answers first.
+# BUDGET caps hedged calls as a fraction of recent LLM traffic.
+LLM_HEDGING = {
+    'ENABLED': os.getenv('LLM_HEDGING_ENABLED', 'False') == 'True',
+    'PERCENTILE': float(os.getenv('LLM_HEDGE_PERCENTILE', '95')),
+    'MIN_DELAY': float(os.getenv('LLM_HEDGE_MIN_DELAY', '0.5')),  # seconds
+    'MAX_DELAY': float(os.getenv('LLM_HEDGE_MAX_DELAY', '5.0')),  # seconds
+    'BUDGET': float(os.getenv('LLM_HEDGE_BUDGET', '0.1')),
+    'MIN_SAMPLES': 20,
+    'MAX_WORKERS': 16,
+}
+
+# Client-side limits per LLM provider. Calls beyond MAX_CONCURRENT wait in a
+# queue of at most MAX_QUEUE for QUEUE_TIMEOUT seconds; calls the token buckets
+# cannot admit before that deadline are shed with a 503 instead of a 429 upstream.
+LLM_RATE_LIMITS = {
+    'gemini': {
+        'MAX_CONCURRENT': int(os.getenv('GEMINI_MAX_CONCURRENT', '8')),
+        'REQUESTS_PER_MINUTE': int(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '60')),
+        'TOKENS_PER_MINUTE': int(os.getenv('GEMINI_TOKENS_PER_MINUTE', '120000')),
+        'MAX_QUEUE': 16,
+        'QUEUE_TIMEOUT': 2.0,  # seconds
+    },
+    'mistral': {
+        'MAX_CONCURRENT': int(os.getenv('MISTRAL_MAX_CONCURRENT', '4')),
+        'REQUESTS_PER_MINUTE': int(os.getenv('MISTRAL_REQUESTS_PER_MINUTE', '60')),
+        'TOKENS_PER_MINUTE': int(os.getenv('MISTRAL_TOKENS_PER_MINUTE', '60000')),
+        'MAX_QUEUE': 16,
+        'QUEUE_TIMEOUT': 2.0,  # seconds
+    },
+}
+
+# LLM provider backends. PRIMARY is called first and SECONDARY is the fallback
+# (and hedge target). Set both to 'fake' to run LLM-backed endpoints offline,
+# e.g. for load tests and CI benchmarks.
+LLM_PROVIDERS = {
+    'PRIMARY': os.getenv('LLM_PRIMARY_PROVIDER', 'gemini'),
+    'SECONDARY': os.getenv('LLM_SECONDARY_PROVIDER', 'mistral'),
+    'BACKENDS': {
+        'gemini': {
+            'CLASS': 'chatbot_ocr.providers.GeminiProvider',
+            'OPTIONS': {
+                'model': os.getenv('GEMINI_MODEL', 'gemini-pro'),
+                # JSON-structured replies (responseMimeType) need gemini-1.5 or newer
+                'json_output': os.getenv('GEMINI_JSON_OUTPUT', 'False') == 'True',
+            },
+        },
+        'mistral': {
+            'CLASS': 'chatbot_ocr.providers.MistralProvider',
+            'OPTIONS': {'model': 'mistral-small', 'max_tokens': 100},
+        },
+        'fake': {
+            'CLASS': 'chatbot_ocr.providers.FakeProvider',
+            'OPTIONS': {
+                'latency': {
+                    'distribution': os.getenv('LLM_FAKE_LATENCY', 'lognormal'),
+                    'median': float(os.getenv('LLM_FAKE_LATENCY_MEDIAN', '0.8')),  # seconds
+                    'sigma': float(os.getenv('LLM_FAKE_LATENCY_SIGMA', '0.5')),
+                },
+                'error_rate': float(os.getenv('LLM_FAKE_ERROR_RATE', '0.0')),
+                'seed': int(os.getenv('LLM_FAKE_SEED', '0')),
+                'responses_file': os.getenv('LLM_FAKE_RESPONSES_FILE') or None,
+            },
+        },
+    },
+}
+
+# Semantic answer cache for chat: paraphrased questions are answered from the
+# closest earlier ChatMessage when cosine similarity is at least THRESHOLD and
+# both mention the same medications, numbers, ages and negations. Dosing
+# questions are never cached. Medications are recognised from the local
+# RxNorm mirror and the cross-reactivity data, so the cache is off by default:
+# enable it once `manage.py import_rxnorm` has loaded the mirror, otherwise two
+# questions that differ only in a drug the data doesn't know can share a reply.
+# Each entry keeps its FEATURES strongest hashed features (4 * FEATURES + 16
+# bytes) plus an inverted index per 16384 entries; about 230 MB in total for
+# MAX_ENTRIES at 32 features.
+CHAT_SEMANTIC_CACHE = {
+    'ENABLED': os.getenv('CHAT_SEMANTIC_CACHE_ENABLED', 'False') == 'True',
+    'THRESHOLD': float(os.getenv('CHAT_SEMANTIC_CACHE_THRESHOLD', '0.95')),
+    'DIMENSIONS': 65536,  # at most 65536; only non-zero features are stored
+    'FEATURES': 32,
+    'MAX_ENTRIES': 1000000,
+    'WARM_ENTRIES': 100000,  # most recent ChatMessage rows, loaded in the background on first use
+}
+
+# Curated FAQ consulted by chat_api before any LLM call (BM25 retrieval).
+# The CANDIDATES best BM25 matches are re-ranked by confidence (question
+# overlap). The top one is answered directly if its confidence is at least
+# ANSWER_THRESHOLD; otherwise up to CONTEXT_PASSAGES passages above
+# CONTEXT_THRESHOLD go into the prompt.
+CHAT_FAQ = {
+    'ENABLED': os.getenv('CHAT_FAQ_ENABLED', 'True') == 'True',
+    'PATH': os.getenv('CHAT_FAQ_PATH', str(BASE_DIR / 'chatbot_ocr' / 'data' / 'faq.json')),
+    'ANSWER_THRESHOLD': float(os.getenv('CHAT_FAQ_ANSWER_THRESHOLD', '0.8')),
+    'CONTEXT_THRESHOLD': 0.2,
+    'CONTEXT_PASSAGES': 3,
+    'CANDIDATES': 20,
+}
+
+# Chat sessions: the most recent turns (up to MAX_TURNS) that fit in
+# HISTORY_TOKENS are sent with each question; older turns are folded into a
+# running summary capped at SUMMARY_TOKENS (estimated tokens).
+CHAT_SESSIONS = {
+    'MAX_TURNS': 20,
+    'HISTORY_TOKENS': int(os.getenv('CHAT_HISTORY_TOKENS', '1500')),
+    'SUMMARY_TOKENS': int(os.getenv('CHAT_SUMMARY_TOKENS', '400')),
+}
+
+# Write-behind persistence for ChatMessage and OCRScan: rows are buffered and
+# written with bulk_create every MAX_BATCH rows or MAX_DELAY seconds, and at
+# shutdown. Responses then carry chat_key/scan_key (UUIDs) while chat_id/scan_id
+# are null. Buffered rows are lost if the process is killed before a flush.
+# Rows that fail to save are retried on up to MAX_RETRIES flushes and then
+# logged and dropped; past MAX_PENDING buffered rows the oldest are dropped.
+WRITE_BEHIND = {
+    'ENABLED': os.getenv('WRITE_BEHIND_ENABLED', 'False') == 'True',
+    'MAX_BATCH': int(os.getenv('WRITE_BEHIND_MAX_BATCH', '200')),
+    'MAX_DELAY': float(os.getenv('WRITE_BEHIND_MAX_DELAY', '1.0')),  # seconds
+    'MAX_RETRIES': 3,
+    'MAX_PENDING': 10000,
+}
+
+# Offline symptom scorer (naive Bayes over data/conditions.json). diagnose_symptoms
+# answers locally when the top condition has at least CONFIDENT_PROBABILITY and
+# MIN_SYMPTOMS symptoms were recognised; otherwise, or when `detailed` is
+# requested, the LLM is asked and the local ranking is the fallback.
+SYMPTOM_SCORER = {
+    'ENABLED': os.getenv('SYMPTOM_SCORER_ENABLED', 'True') == 'True',
+    'PATH': os.getenv('SYMPTOM_SCORER_PATH', str(BASE_DIR / 'chatbot_ocr' / 'data' / 'conditions.json')),
+    'CONFIDENT_PROBABILITY': float(os.getenv('SYMPTOM_SCORER_CONFIDENT_PROBABILITY', '0.6')),
+    'MIN_SYMPTOMS': 2,
+    'MIN_PROBABILITY': 0.05,  # conditions below this are not listed
+    'URGENT_PROBABILITY': 0.1,  # emergency precautions shown above this
+}
+
+# Allergen-free food index (data/foods.json) used by dietary_suggestions. The LLM
+# is only called when a narrative is requested or the index is disabled.
+FOOD_INDEX = {
+    'ENABLED': os.getenv('FOOD_INDEX_ENABLED', 'True') == 'True',
+    'PATH': os.getenv('FOOD_INDEX_PATH', str(BASE_DIR / 'chatbot_ocr' / 'data' / 'foods.json')),
+}
+
+# Drug-allergy cross-reactivity data (classes, ingredients, known cross-reactions)
+# checked against medications found by ocr_api and by allergy-conflicts/.
+CROSS_REACTIVITY = {
+    'ENABLED': os.getenv('CROSS_REACTIVITY_ENABLED', 'True') == 'True',
+    'PATH': os.getenv('CROSS_REACTIVITY_PATH', str(BASE_DIR / 'chatbot_ocr' / 'data' / 'drug_allergy.json')),
+}
+
+# Allergy alert response cache. Alerts are cached per geohash cell of
+# GEOHASH_PRECISION characters (5 is about 5 km across), day and allergy set,
+# for at most MAX_ENTRIES combinations, and dropped at midnight.
+ALERT_CACHE = {
+    'ENABLED': os.getenv('ALERT_CACHE_ENABLED', 'True') == 'True',
+    'GEOHASH_PRECISION': int(os.getenv('ALERT_CACHE_GEOHASH_PRECISION', '5')),
+    'MAX_ENTRIES': int(os.getenv('ALERT_CACHE_MAX_ENTRIES', '10000')),
+}
+
+# Gridded pollen and mold forecasts (see chatbot_ocr/pollen_grid.py), loaded
+# with `manage.py ingest_pollen`. BOUNDS is (south, west, north, east) in
+# degrees, cut into RESOLUTION degree cells; KEEP_DAYS days are kept. Readers
+# look for a new feed drop at most every RELOAD_INTERVAL seconds.
+POLLEN_GRID = {
+    'ENABLED': os.getenv('POLLEN_GRID_ENABLED', 'True') == 'True',
+    'DIR': os.getenv('POLLEN_GRID_DIR', str(BASE_DIR / 'pollen_grid')),
+    'BOUNDS': (-90.0, -180.0, 90.0, 180.0),
+    'RESOLUTION': float(os.getenv('POLLEN_GRID_RESOLUTION', '0.25')),
+    'KEEP_DAYS': int(os.getenv('POLLEN_GRID_KEEP_DAYS', '7')),
+    'RELOAD_INTERVAL': 60,
+}
+
+# Provider directory behind nearby_doctors (see chatbot_ocr/directory.py).
+# Searches are limited to MAX_RADIUS_MILES and paged PAGE_SIZE results at a
+# time (at most MAX_PAGE_SIZE); MAX_CELLS bounds the geohash ranges scanned.
+PROVIDER_DIRECTORY = {
+    'MAX_RADIUS_MILES': float(os.getenv('PROVIDER_MAX_RADIUS_MILES', '100')),
+    'PAGE_SIZE': 10,
+    'MAX_PAGE_SIZE': 50,
+    'MAX_CELLS': 16,
+}
+
+# Medication name autocomplete (GET /api/chatbot/medication/autocomplete/). Names
+# come from the RxNorm mirror and the bundled drug data, ranked by the usage
+# weights in FREQUENCY_PATH; one-letter typos are corrected for queries of at
+# least TYPO_MIN_LENGTH characters.
+AUTOCOMPLETE = {
+    'ENABLED': os.getenv('AUTOCOMPLETE_ENABLED', 'True') == 'True',
+    'FREQUENCY_PATH': str(BASE_DIR / 'chatbot_ocr' / 'data' / 'medication_frequency.csv'),
+    'INCLUDE_RXNORM': True,
+    'MAX_RESULTS': 10,
+    'TYPO_MIN_LENGTH': 4,
+}
+
+# Local drug interaction graph used by drug_interactions and the interaction
+# matrix. PATH is written by `manage.py import_interactions` from the CLASSES
+# and INTERACTIONS CSVs; until then the bundled CSVs are loaded directly.
+INTERACTION_GRAPH = {
+    'ENABLED': os.getenv('INTERACTION_GRAPH_ENABLED', 'True') == 'True',
+    'PATH': os.getenv('INTERACTION_GRAPH_PATH', str(BASE_DIR / 'chatbot_ocr' / 'data' / 'interaction_graph.npz')),
+    'CLASSES': str(BASE_DIR / 'chatbot_ocr' / 'data' / 'drug_classes.csv'),
+    'INTERACTIONS': str(BASE_DIR / 'chatbot_ocr' / 'data' / 'interactions.csv'),
+}
+
+# Batch diagnosis (POST /api/chatbot/diagnose-batch/): records run concurrently
+# on MAX_WORKERS threads (default: the primary provider's MAX_CONCURRENT) and
+# calls shed by the rate limiter are retried up to RETRIES times.
+DIAGNOSE_BATCH = {
+    'MAX_RECORDS': int(os.getenv('DIAGNOSE_BATCH_MAX_RECORDS', '500')),
+    'MAX_WORKERS': int(os.getenv('DIAGNOSE_BATCH_MAX_WORKERS', '0')) or None,
+    'RETRIES': 2,
+}
+
+# RxNorm lookups (rxnorm.py). Names and related concepts come from the local
+# mirror loaded with `manage.py import_rxnorm`; RxNav is only called when the
+# mirror has no answer and REMOTE_FALLBACK is on.
+RXNORM = {
+    'REMOTE_FALLBACK': os.getenv('RXNORM_REMOTE_FALLBACK', 'True') == 'True',
+    'BASE_URL': os.getenv('RXNAV_BASE_URL', 'https://rxnav.nlm.nih.gov/REST'),
+    'TIMEOUT': float(os.getenv('RXNAV_TIMEOUT', '5.0')),  # seconds
+    # Names the local mirror does not know are looked up on a shared pool of
+    # RESOLVE_WORKERS threads; all lookups for one request must finish within
+    # REQUEST_DEADLINE seconds. MAX_MEDICATIONS caps drug-interactions/matrix/.
+    'MAX_MEDICATIONS': 50,
+    'RESOLVE_WORKERS': int(os.getenv('RXNAV_RESOLVE_WORKERS', '8')),
+    'REQUEST_DEADLINE': float(os.getenv('RXNAV_REQUEST_DEADLINE', '10.0')),  # seconds
+    # RxNav answers are cached in CACHES[CACHE_ALIAS]. RxNorm publishes weekly
+    # updates and a monthly full release, so names and related concepts are
+    # kept a week, interaction lists a month, and "not found" answers a day.
+    'CACHE_ALIAS': 'rxnav',
+    'CACHE_TTL': {
+        'rxcui': 7 * 24 * 3600,
+        'allrelated': 7 * 24 * 3600,
+        'interactions': 30 * 24 * 3600,
+        'not_found': 24 * 3600,
+    },
+}
+
+# Caches. 'rxnav' is file based so RxNav lookups survive restarts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'rxnav': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('RXNAV_CACHE_DIR', str(BASE_DIR / 'cache' / 'rxnav')),
+        'TIMEOUT': None,  # per-entry TTLs come from RXNORM['CACHE_TTL']
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+}
@@ -0,0 +1,284 @@
+"""
+Seasonal allergy alerts for allergy_alerts, and a response cache for them.
+An alert response depends only on a coarse location, the date, the set of
+allergies asked about and the pollen forecast cell (see pollen_grid), so it
+is built once per (geohash cell, day, allergy set, forecast cell) and kept in
+a bounded LRU until the day rolls over. Each entry carries a
+weak ETag and a Last-Modified time so polling clients can revalidate with a
+304 instead of downloading the same alerts again.
+"""
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from django.conf import settings
+from .geo import geohash
+from .pollen_grid import LEVELS, POLLEN_TYPES, level, pollen_sample
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# Seasonal allergy mapping (simplified)
+SEASONAL_ALLERGENS = {
+    # Winter (Dec-Feb)
+    12: ['dust mites', 'mold', 'pet dander'],
+    1: ['dust mites', 'mold', 'pet dander'],
+    2: ['dust mites', 'mold', 'pet dander'],
+
+    # Spring (Mar-May)
+    3: ['tree pollen', 'mold'],
+    4: ['tree pollen', 'grass pollen'],
+    5: ['tree pollen', 'grass pollen'],
+
+    # Summer (Jun-Aug)
+    6: ['grass pollen', 'weed pollen', 'insect stings'],
+    7: ['grass pollen', 'weed pollen', 'insect stings'],
+    8: ['ragweed', 'weed pollen', 'insect stings'],
+
+    # Fall (Sep-Nov)
+    9: ['ragweed', 'weed pollen', 'mold'],
+    10: ['ragweed', 'mold', 'dust mites'],
+    11: ['mold', 'dust mites']
+}
+
+SEASON_NAMES = {
+    12: 'Winter', 1: 'Winter', 2: 'Winter',
+    3: 'Spring', 4: 'Spring', 5: 'Spring',
+    6: 'Summer', 7: 'Summer', 8: 'Summer',
+    9: 'Fall', 10: 'Fall', 11: 'Fall'
+}
+
+POLLEN_ALLERGIES = ['pollen', 'tree pollen', 'grass pollen', 'weed pollen', 'ragweed']
+POLLEN_ALLERGENS = ['tree pollen', 'grass pollen', 'weed pollen', 'ragweed']
+
+# Forecast allergens each pollen allergy reacts to
+FORECAST_ALLERGENS = {
+    'pollen': POLLEN_TYPES,
+    'tree pollen': ['tree pollen'],
+    'grass pollen': ['grass pollen'],
+    'weed pollen': ['weed pollen', 'ragweed'],
+    'ragweed': ['ragweed'],
+}
+
+POLLEN_ALERT = {
+    'type': 'pollen',
+    'severity': 'high',
+    'description': 'High pollen levels in your area. Consider limiting outdoor activities.',
+    'recommendations': [
+        'Keep windows closed',
+        'Use air purifiers',
+        'Shower after being outdoors',
+        'Take allergy medication before symptoms start'
+    ]
+}
+
+MOLD_ALERT = {
+    'type': 'mold',
+    'severity': 'moderate',
+    'description': 'Moderate mold levels due to recent weather conditions.',
+    'recommendations': [
+        'Use dehumidifiers',
+        'Clean damp areas regularly',
+        'Use mold-killing products in bathrooms',
+        'Ensure good ventilation'
+    ]
+}
+
+DUST_MITE_ALERT = {
+    'type': 'dust_mites',
+    'severity': 'moderate',
+    'description': 'Indoor heating can increase dust mite activity.',
+    'recommendations': [
+        'Use allergen-proof bed covers',
+        'Wash bedding in hot water weekly',
+        'Keep humidity below 50%',
+        'Vacuum with a HEPA filter'
+    ]
+}
+
+PET_DANDER_ALERT = {
+    'type': 'pet_dander',
+    'severity': 'varies',
+    'description': 'Pet dander allergies can be worse in winter when more time is spent indoors.',
+    'recommendations': [
+        'Keep pets out of bedrooms',
+        'Bathe pets weekly',
+        'Use HEPA air purifiers',
+        'Clean floors and furniture regularly'
+    ]
+}
+
+
+def normalize_allergies(allergies):
+    """Lower-cased, de-duplicated, sorted allergy names."""
+    return sorted({' '.join(allergy.lower().split()) for allergy in allergies} - {''})
+
+
+def forecast_alert(template, allergens, readings, unit):
+    """
+    A copy of an alert template for the worst forecast level among
+    `allergens`, or None if none of them reach moderate.
+    """
+    worst = max(allergens, key=lambda allergen: LEVELS.index(level(allergen, readings[allergen])))
+    worst_level = level(worst, readings[worst])
+    if worst_level == 'low':
+        return None
+    return {
+        **template,
+        'severity': worst_level,
+        'description': f"{worst.capitalize()} levels are {worst_level} in your area today "
+                       f"({readings[worst]:.0f} {unit}).",
+    }
+
+
+def build_alerts(allergies, today, readings=None):
+    """
+    Build the alert body for normalized allergy names on a date, without the
+    per-request location. Pollen and mold alerts come from the forecast
+    `readings` ({allergen: count}) when they cover the allergy, otherwise
+    from the season.
+    """
+    month = today.month
+    seasonal_allergens = SEASONAL_ALLERGENS.get(month, [])
+    readings = readings or {}
+
+    # Generate alerts based on user's allergies and seasonal allergens
+    alerts = []
+    forecast_pollen = [allergen for allergy in allergies for allergen in FORECAST_ALLERGENS.get(allergy, [])
+                       if allergen in readings]
+    if forecast_pollen:
+        alert = forecast_alert(POLLEN_ALERT, forecast_pollen, readings, 'grains/m³')
+        if alert:
+            alerts.append(alert)
+    elif any(a in POLLEN_ALLERGIES for a in allergies) and any(p in seasonal_allergens for p in POLLEN_ALLERGENS):
+        alerts.append(POLLEN_ALERT)
+    if 'mold' in allergies and 'mold' in readings:
+        alert = forecast_alert(MOLD_ALERT, ['mold'], readings, 'spores/m³')
+        if alert:
+            alerts.append(alert)
+    elif 'mold' in allergies and 'mold' in seasonal_allergens:
+        alerts.append(MOLD_ALERT)
+    if 'dust' in allergies and 'dust mites' in seasonal_allergens:
+        alerts.append(DUST_MITE_ALERT)
+    # Pet dander is always relevant if allergic
+    if 'pet' in allergies or 'dander' in allergies:
+        alerts.append(PET_DANDER_ALERT)
+
+    current_season = SEASON_NAMES.get(month)
+    body = {
+        'current_date': today.strftime('%Y-%m-%d'),
+        'season': current_season,
+        'seasonal_allergens': seasonal_allergens,
+        'alerts': alerts,
+        'general_info': f"{current_season} is typically a season when {', '.join(seasonal_allergens)} "
+                        f"are common allergens."
+    }
+    if readings:
+        body['forecast'] = {allergen: {'count': round(value, 1), 'level': level(allergen, value)}
+                            for allergen, value in readings.items()}
+    return body
+
+
+class CachedAlerts:
+    """An alert body with its validators and the time it stops being valid."""
+
+    def __init__(self, key, body, modified, expires):
+        self.body = body
+        self.modified = modified
+        self.expires = expires
+        digest = hashlib.sha1(json.dumps([key, body], sort_keys=True).encode('utf-8')).hexdigest()
+        # Weak: responses in the same cell differ in the echoed coordinates
+        self.etag = f'W/"{digest[:20]}"'
+
+    @classmethod
+    def build(cls, key, allergies, now, sample=None):
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        body = build_alerts(allergies, now.date(), sample.readings if sample else None)
+        return cls(key, body, now.replace(microsecond=0), tomorrow)
+
+
+class AlertCache:
+    """
+    Least-recently-used map from (geohash cell, date, allergy set, forecast
+    cell) to CachedAlerts, holding at most `max_entries`. Entries expire at the first
+    midnight after they were built.
+    """
+
+    def __init__(self, max_entries=10000, precision=5):
+        self.max_entries = max_entries
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._day = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def key(self, latitude, longitude, allergies, today, sample=None):
+        # The forecast cell carries the grid version, so a new feed drop gets new entries
+        return (geohash(latitude, longitude, self.precision), today.isoformat(), '|'.join(allergies),
+                sample.cell if sample else None)
+
+    def get(self, latitude, longitude, allergies, now=None, sample=None):
+        """
+        Return the CachedAlerts for a request, building and storing it on a
+        miss. `sample` is the request's PollenSample, if there is a forecast.
+        """
+        now = now or datetime.now()
+        allergies = normalize_allergies(allergies)
+        key = self.key(latitude, longitude, allergies, now.date(), sample)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires:
+                self._entries.move_to_end(key)
+                return entry
+
+        entry = CachedAlerts.build(key, allergies, now, sample)
+        with self._lock:
+            if self._day is not None and key[1] < self._day:
+                return entry
+            # Yesterday's entries can never be hit again
+            if key[1] != self._day:
+                self._entries.clear()
+                self._day = key[1]
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_alert_cache():
+    """Return the process-wide alert cache, or None if it is disabled."""
+    global _cache
+    config = settings.ALERT_CACHE
+    if not config.get('ENABLED'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = AlertCache(config.get('MAX_ENTRIES', 10000), config.get('GEOHASH_PRECISION', 5))
+            logger.info(f"Allergy alert cache created for {_cache.max_entries} entries "
+                        f"at geohash precision {_cache.precision}")
+        return _cache
+
+
+def alerts_for(latitude, longitude, allergies, now=None):
+    """Return CachedAlerts for a request, through the cache when it is enabled."""
+    now = now or datetime.now()
+    sample = pollen_sample(latitude, longitude, now.date())
+    cache = get_alert_cache()
+    if cache is not None:
+        return cache.get(latitude, longitude, allergies, now, sample)
+    allergies = normalize_allergies(allergies)
+    key = ('', now.date().isoformat(), '|'.join(allergies), sample.cell if sample else None)
+    return CachedAlerts.build(key, allergies, now, sample)
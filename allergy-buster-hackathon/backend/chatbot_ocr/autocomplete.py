@@ -0,0 +1,189 @@
+"""
+Medication name autocomplete for the frontend medication forms.
+Every known drug name and synonym (the RxNorm mirror's ingredient and brand
+names, plus the bundled drug data) is held in one sorted list with parallel
+NumPy arrays. A prefix is a pair of binary searches and the top results come
+from an argpartition over the weights. When a query has few prefix matches,
+its one-edit variants are tried too, so 'amoxicilin' still finds amoxicillin.
+"""
+import csv
+import json
+import logging
+import threading
+from bisect import bisect_left
+import numpy as np
+from django.conf import settings
+from .models import RxConcept
+from .rxnorm import normalize_name
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+# Base weights before usage frequency is added
+INGREDIENT_WEIGHT = 3.0
+BRAND_WEIGHT = 2.0
+SYNONYM_WEIGHT = 1.0
+RXNORM_TTY_WEIGHTS = {'IN': INGREDIENT_WEIGHT, 'BN': BRAND_WEIGHT, 'PIN': SYNONYM_WEIGHT, 'MIN': SYNONYM_WEIGHT}
+# Typo corrections rank below every true prefix match of the same weight
+CORRECTION_PENALTY = 0.5
+# Queries this short have huge prefix ranges, so their results are kept
+SHORT_PREFIX = 2
+
+
+def edits1(word):
+    """All strings one deletion, transposition, substitution or insertion away from word."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    transposes = [left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1]
+    replaces = [left + c + right[1:] for left, right in splits if right for c in ALPHABET if c != right[0]]
+    inserts = [left + c + right for left, right in splits for c in ALPHABET]
+    return set(deletes + transposes + replaces + inserts) - {word}
+
+
+class MedicationIndex:
+    """
+    Sorted normalized names with parallel labels, canonical names, RxCUIs
+    and weights. Duplicate names keep their heaviest entry.
+    """
+
+    def __init__(self, entries):
+        merged = {}
+        for label, canonical, rxcui, weight in entries:
+            key = normalize_name(label)
+            if not key:
+                continue
+            current = merged.get(key)
+            if current is None or weight > current[3]:
+                merged[key] = (label, canonical, rxcui or (current[2] if current else None), weight)
+            elif rxcui and not current[2]:
+                merged[key] = current[:2] + (rxcui,) + current[3:]
+
+        self.keys = sorted(merged)
+        self.labels = [merged[key][0] for key in self.keys]
+        self.canonical = [merged[key][1] for key in self.keys]
+        self.rxcuis = [merged[key][2] for key in self.keys]
+        self.weights = np.array([merged[key][3] for key in self.keys], dtype=np.float32)
+        self._short = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _range(self, prefix):
+        lo = bisect_left(self.keys, prefix)
+        return lo, bisect_left(self.keys, prefix + '\U0010ffff', lo)
+
+    def prefix(self, prefix, limit):
+        """Positions of the `limit` heaviest names starting with prefix, heaviest first."""
+        if len(prefix) <= SHORT_PREFIX and (prefix, limit) in self._short:
+            return self._short[(prefix, limit)]
+        lo, hi = self._range(prefix)
+        weights = self.weights[lo:hi]
+        if hi - lo > limit:
+            top = np.argpartition(-weights, limit)[:limit]
+        else:
+            top = np.arange(hi - lo)
+        positions = [lo + int(i) for i in top[np.argsort(-weights[top], kind='stable')]]
+        if len(prefix) <= SHORT_PREFIX:
+            self._short[(prefix, limit)] = positions
+        return positions
+
+    def search(self, query, limit=10, typo_min_length=4):
+        """
+        Return up to `limit` suggestions as (position, corrected) pairs: an
+        exact name first, then prefix matches by weight, then one-edit
+        corrections if there is room and the query is long enough.
+        """
+        query = normalize_name(query)
+        if not query:
+            return []
+        positions = list(self.prefix(query, limit))
+        exact = bisect_left(self.keys, query)
+        if exact < len(self.keys) and self.keys[exact] == query:
+            if exact in positions:
+                positions.remove(exact)
+            positions = [exact] + positions[:limit - 1]
+        results = [(position, False) for position in positions]
+        if len(results) >= limit or len(query) < typo_min_length:
+            return results
+
+        seen = set(positions)
+        corrections = {}
+        for variant in edits1(query):
+            lo, hi = self._range(variant)
+            if hi > lo:
+                for position in self.prefix(variant, limit):
+                    if position not in seen:
+                        corrections[position] = self.weights[position] * CORRECTION_PENALTY
+        ranked = sorted(corrections, key=lambda position: (-corrections[position], self.keys[position]))
+        return results + [(position, True) for position in ranked[:limit - len(results)]]
+
+    def suggestion(self, position, corrected):
+        return {
+            'name': self.labels[position],
+            'canonical': self.canonical[position],
+            'rxcui': self.rxcuis[position],
+            'corrected': corrected,
+        }
+
+
+def read_frequencies(path):
+    """Relative usage weights by normalized name from a name,weight CSV."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return {normalize_name(row['name']): float(row['weight']) for row in csv.DictReader(f)}
+
+
+def index_entries(config):
+    """Yield (label, canonical, rxcui, weight) for every name the index should know."""
+    frequencies = read_frequencies(config['FREQUENCY_PATH'])
+    for name, weight in frequencies.items():
+        yield name, name, None, INGREDIENT_WEIGHT + weight
+
+    with open(settings.CROSS_REACTIVITY['PATH'], 'r', encoding='utf-8') as f:
+        drug_allergy = json.load(f)
+    for name, info in drug_allergy['ingredients'].items():
+        frequency = frequencies.get(name, 0.0)
+        yield name, name, info.get('rxcui'), INGREDIENT_WEIGHT + frequency
+        for alias in info.get('aliases', []):
+            yield alias, name, info.get('rxcui'), BRAND_WEIGHT + 0.8 * frequency
+
+    with open(settings.INTERACTION_GRAPH['CLASSES'], 'r', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            name = row['ingredient']
+            yield name, name, row['rxcui'], INGREDIENT_WEIGHT + frequencies.get(name, 0.0)
+
+    if config.get('INCLUDE_RXNORM', True):
+        rows = (RxConcept.objects.filter(tty__in=list(RXNORM_TTY_WEIGHTS))
+                .values_list('name', 'normalized_name', 'rxcui', 'tty').iterator(chunk_size=5000))
+        for name, normalized, rxcui, tty in rows:
+            # Long multi-ingredient names are not useful as suggestions
+            if len(normalized) <= 60:
+                yield name, name, rxcui, RXNORM_TTY_WEIGHTS[tty] + frequencies.get(normalized, 0.0)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_medication_index():
+    """Return the process-wide medication name index, or None if autocomplete is disabled."""
+    global _index
+    config = settings.AUTOCOMPLETE
+    if not config.get('ENABLED'):
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = MedicationIndex(index_entries(config))
+            logger.info(f"Medication autocomplete index built with {len(_index)} names")
+        return _index
+
+
+def autocomplete(query, limit=None):
+    """Suggestion dicts for a partial medication name, or None if autocomplete is disabled."""
+    config = settings.AUTOCOMPLETE
+    index = get_medication_index()
+    if index is None:
+        return None
+    limit = min(limit or config.get('MAX_RESULTS', 10), config.get('MAX_RESULTS', 10))
+    return [index.suggestion(position, corrected)
+            for position, corrected in index.search(query, limit, config.get('TYPO_MIN_LENGTH', 4))]
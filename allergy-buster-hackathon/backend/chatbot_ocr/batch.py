@@ -0,0 +1,66 @@
+"""
+Concurrent execution for batch endpoints.
+Items run on a bounded thread pool and are yielded as they finish, so a batch
+takes roughly (items / workers) x latency rather than the sum of every item's
+latency. Worker count defaults to the primary provider's concurrency limit.
+"""
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from .providers import get_providers
+from .rate_limit import RateLimitExceeded, get_limiter
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+
+def provider_workers(default=4):
+    """Worker count matching the primary provider's MAX_CONCURRENT limit."""
+    limiter = get_limiter(get_providers()[0].name)
+    return limiter.max_concurrent if limiter is not None else default
+
+
+def call_with_retries(func, item, retries=2, max_backoff=5.0):
+    """
+    Call func(item), retrying when the rate limiter sheds the call.
+    Batch items can wait for capacity where an interactive request would not,
+    so they back off for the limiter's suggested Retry-After first.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func(item)
+        except RateLimitExceeded as e:
+            if attempt == retries:
+                raise
+            time.sleep(min(e.retry_after or 0.5, max_backoff))
+
+
+def run_batch(func, items, max_workers, retries=2):
+    """
+    Run func over items concurrently, yielding (index, result, error) in
+    completion order. Exactly one of result/error is set per item; an
+    exception in one item never affects the others. At most 2 x max_workers
+    items are in flight, so huge batches don't all sit in the executor queue.
+    """
+    pending = {}
+    items = iter(enumerate(items))
+    exhausted = False
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch') as executor:
+        while True:
+            while not exhausted and len(pending) < 2 * max_workers:
+                try:
+                    index, item = next(items)
+                except StopIteration:
+                    exhausted = True
+                    break
+                pending[executor.submit(call_with_retries, func, item, retries)] = index
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    yield index, future.result(), None
+                except Exception as e:
+                    logger.warning(f"Batch item {index} failed: {e}")
+                    yield index, None, e
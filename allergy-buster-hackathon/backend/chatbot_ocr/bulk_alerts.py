@@ -0,0 +1,224 @@
+"""
+Morning allergy alerts for every user, computed in bulk (see compute_alerts).
+Allergy rows are streamed in user order and each user's allergens are
+encoded as a small bitmask. Users are grouped into regions: the pollen grid
+cell of their AlertSubscription, or a seasonal region when there is no
+subscription or no forecast. Each region gets one bitmask of the allergens
+active there today, so matching a chunk of users is a NumPy AND over arrays;
+the matches are written to AlertOutbox with bulk_create.
+"""
+import logging
+import re
+import numpy as np
+from django.db import transaction
+from core_api.models import Allergy
+from .alerts import (DUST_MITE_ALERT, MOLD_ALERT, PET_DANDER_ALERT, POLLEN_ALERT, SEASONAL_ALLERGENS,
+                     forecast_alert)
+from .models import AlertOutbox, AlertSubscription
+from .pollen_grid import ALLERGENS, THRESHOLDS
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# Bit i is allergen i; the first five follow pollen_grid.ALLERGENS
+BITS = ALLERGENS + ['dust mites', 'pet dander']
+TREE, GRASS, WEED, RAGWEED, MOLD, DUST, PET = (1 << i for i in range(len(BITS)))
+POLLEN = TREE | GRASS | WEED | RAGWEED
+FORECAST = POLLEN | MOLD
+
+# (alert type, bits it covers, template), in the order alerts are listed
+ALERT_TYPES = [
+    ('pollen', POLLEN, POLLEN_ALERT),
+    ('mold', MOLD, MOLD_ALERT),
+    ('dust_mites', DUST, DUST_MITE_ALERT),
+    ('pet_dander', PET, PET_DANDER_ALERT),
+]
+UNITS = {'mold': 'spores/m³'}
+
+# Ranking of seasonal (template) alerts against forecast levels (0 low .. 3 very high)
+SEASONAL_SCORE = np.array([2, 2, 2, 2, 1, 1, 1], dtype=np.int8)
+
+# Allergy names are free text, so they are matched on keywords
+ALLERGY_KEYWORDS = [
+    (re.compile(r'\b(?:trees?(?!\s*nuts?\b)|birch|oak|alder|cedar|juniper)\b'), TREE),
+    (re.compile(r'\bgrass(?:es)?\b'), GRASS),
+    (re.compile(r'\bweeds?\b'), WEED | RAGWEED),
+    (re.compile(r'\bragweed\b'), RAGWEED),
+    (re.compile(r'\bmou?lds?\b'), MOLD),
+    (re.compile(r'\bdust\b'), DUST),
+    (re.compile(r'\b(?:pets?|dander|cats?|dogs?)\b'), PET),
+]
+POLLEN_RE = re.compile(r'\bpollen\b|\bhay ?fever\b')
+
+
+def encode_allergy(name):
+    """The allergen bits for one allergy name; a bare 'pollen' covers every pollen type."""
+    name = ' '.join(name.lower().split())
+    mask = 0
+    for pattern, bits in ALLERGY_KEYWORDS:
+        if pattern.search(name):
+            mask |= bits
+    if not mask & POLLEN and POLLEN_RE.search(name):
+        mask |= POLLEN
+    return mask
+
+
+def seasonal_mask(day):
+    """Bits of the allergens active on a date by season alone; pet dander always is."""
+    return sum(1 << BITS.index(name) for name in SEASONAL_ALLERGENS.get(day.month, []) if name in BITS) | PET
+
+
+class RegionTable:
+    """
+    Today's allergen bitmask, alert ranking and forecast counts for a set of
+    regions. Region 0 is seasonal; the others are pollen grid cells.
+    """
+
+    def __init__(self, day, cells, grid=None):
+        self.day = day
+        season = seasonal_mask(day)
+        count = len(cells) + 1
+        self.values = np.full((count, len(ALLERGENS)), np.nan, dtype=np.float32)
+        if grid is not None and day in grid.days and len(cells):
+            rows, cols = np.divmod(np.asarray(cells, dtype=np.int64), grid.spec.cols)
+            self.values[1:] = grid.days[day][rows, cols]
+
+        known = ~np.isnan(self.values)
+        thresholds = np.array([THRESHOLDS[allergen] for allergen in ALLERGENS], dtype=np.float32)
+        with np.errstate(invalid='ignore'):
+            levels = (self.values[:, :, None] >= thresholds[None]).sum(axis=2).astype(np.int8)
+        weights = 1 << np.arange(len(ALLERGENS))
+        forecast = ((levels >= 1) * weights).sum(axis=1)
+        unknown = (~known * weights).sum(axis=1)
+        # Forecast where there is one, the season for everything else
+        self.masks = (forecast | (season & FORECAST & unknown) | (season & ~FORECAST)).astype(np.int64)
+        self.known = np.concatenate([known, np.zeros((count, len(BITS) - len(ALLERGENS)), dtype=bool)], axis=1)
+        self.scores = np.where(self.known, np.pad(levels, ((0, 0), (0, len(BITS) - len(ALLERGENS)))),
+                               SEASONAL_SCORE)
+        self._payloads = {}
+
+    def payload(self, region, bit, alert_type, template):
+        """The alert dict for a region's allergen `bit`, built once per table."""
+        key = (region, bit)
+        if key not in self._payloads:
+            if self.known[region, bit]:
+                allergen = BITS[bit]
+                readings = {allergen: float(self.values[region, bit])}
+                self._payloads[key] = forecast_alert(template, [allergen], readings,
+                                                     UNITS.get(alert_type, 'grains/m³'))
+            else:
+                self._payloads[key] = template
+        return self._payloads[key]
+
+
+def user_chunks(chunk_size):
+    """
+    Yield (user_ids, masks, latitudes, longitudes) arrays for users with an
+    outdoor or indoor allergen, `chunk_size` users at a time. Allergy rows
+    and active subscriptions are both read in user order and merged.
+    """
+    names = {}
+    subscriptions = iter(AlertSubscription.objects.filter(active=True).order_by('user_id')
+                         .values_list('user_id', 'latitude', 'longitude').iterator(chunk_size=10000))
+    subscription = next(subscriptions, None)
+    rows = Allergy.objects.order_by('user_id').values_list('user_id', 'name').iterator(chunk_size=10000)
+
+    user_ids, masks, latitudes, longitudes = [], [], [], []
+    current, mask = None, 0
+
+    def finish(user_id, user_mask):
+        nonlocal subscription
+        while subscription is not None and subscription[0] < user_id:
+            subscription = next(subscriptions, None)
+        if not user_mask:
+            return
+        user_ids.append(user_id)
+        masks.append(user_mask)
+        if subscription is not None and subscription[0] == user_id:
+            latitudes.append(subscription[1])
+            longitudes.append(subscription[2])
+        else:
+            latitudes.append(np.nan)
+            longitudes.append(np.nan)
+
+    def flush():
+        chunk = (np.array(user_ids, dtype=np.int64), np.array(masks, dtype=np.int64),
+                 np.array(latitudes, dtype=np.float64), np.array(longitudes, dtype=np.float64))
+        for values in (user_ids, masks, latitudes, longitudes):
+            values.clear()
+        return chunk
+
+    for user_id, name in rows:
+        if user_id != current:
+            if current is not None:
+                finish(current, mask)
+                if len(user_ids) >= chunk_size:
+                    yield flush()
+            current, mask = user_id, 0
+        if name not in names:
+            names[name] = encode_allergy(name)
+        mask |= names[name]
+    if current is not None:
+        finish(current, mask)
+    if user_ids:
+        yield flush()
+
+
+def match_chunk(day, user_ids, masks, latitudes, longitudes, grid=None):
+    """Return (user_id, alert_type, alert) for every alert in a chunk of users."""
+    cells = np.full(len(user_ids), -1, dtype=np.int64)
+    if grid is not None:
+        located = ~np.isnan(latitudes)
+        rows, cols, inside = grid.spec.cells(np.nan_to_num(latitudes), np.nan_to_num(longitudes))
+        inside &= located
+        cells[inside] = rows[inside] * grid.spec.cols + cols[inside]
+    # Region 0 is seasonal, so unique cells (with -1 first) map straight onto regions
+    unique, regions = np.unique(cells, return_inverse=True)
+    if len(unique) and unique[0] == -1:
+        table = RegionTable(day, unique[1:], grid)
+    else:
+        table = RegionTable(day, unique, grid)
+        regions = regions + 1
+
+    hits = masks & table.masks[regions]
+    matches = []
+    for alert_type, bits, template in ALERT_TYPES:
+        typed = hits & bits
+        users = np.nonzero(typed)[0]
+        if not len(users):
+            continue
+        # The user's worst allergen of this type decides the alert
+        positions = np.arange(len(BITS))
+        present = (typed[users, None] >> positions) & 1
+        worst = np.argmax(np.where(present, table.scores[regions[users]] + 1, 0), axis=1)
+        # One payload per (region, allergen) group rather than per user
+        groups, group_of = np.unique(regions[users] * len(BITS) + worst, return_inverse=True)
+        payloads = [table.payload(int(group) // len(BITS), int(group) % len(BITS), alert_type, template)
+                    for group in groups]
+        matches.extend((user_id, alert_type, payloads[group])
+                       for user_id, group in zip(user_ids[users].tolist(), group_of.tolist())
+                       if payloads[group] is not None)
+    return matches
+
+
+def compute_alerts(day, grid=None, chunk_size=100000, batch_size=5000, progress=None):
+    """
+    Compute every user's alerts for a date into AlertOutbox. Existing rows
+    for the same (user, date, type) are kept, so the job can be re-run.
+    Returns {'users', 'alerts'}: users with an allergen the job knows about,
+    and alerts computed for them.
+    """
+    users = written = 0
+    for chunk in user_chunks(chunk_size):
+        matches = match_chunk(day, *chunk, grid=grid)
+        outbox = [AlertOutbox(user_id=user_id, date=day, alert_type=alert_type,
+                              severity=payload['severity'], payload=payload)
+                  for user_id, alert_type, payload in matches]
+        with transaction.atomic():
+            AlertOutbox.objects.bulk_create(outbox, batch_size=batch_size, ignore_conflicts=True)
+        users += len(chunk[0])
+        written += len(outbox)
+        if progress:
+            progress(users, written)
+    logger.info(f"Computed {written} alerts for {users} users on {day}")
+    return {'users': users, 'alerts': written}
@@ -0,0 +1,236 @@
+"""
+Drug-allergy cross-reactivity checks for ocr_api and allergy_conflicts.
+Drug classes, ingredients, combination products and known cross-reactions
+(data/drug_allergy.json) are compiled at load time into one bitset of
+ingredients per risk level for every allergen a patient can name, so checking
+a medication list against someone's allergies is a few integer ANDs rather
+than an LLM call.
+"""
+import json
+import logging
+import re
+import threading
+from django.conf import settings
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# Least to most serious; 'direct' means the medication is (or contains) the allergen
+RISK_LEVELS = ['low', 'moderate', 'high', 'direct']
+
+ALLERGY_SUFFIX_RE = re.compile(r'\s+(?:allergy|allergies|sensitivity|intolerance)$')
+
+
+def normalize_term(text):
+    return ALLERGY_SUFFIX_RE.sub('', ' '.join(text.lower().split()))
+
+
+class CrossReactivity:
+    """
+    Allergen profiles over a fixed ingredient list.
+
+    Ingredient i is bit i. Each class's mask is the transitive closure of its
+    members and its subclasses' members. An allergen's profile is a list of
+    (risk, mask, reason) entries, most serious first: the allergen itself,
+    its class (at the class's `within_risk`), and the cross-reactions that
+    touch it or any of its ancestor classes. A combination product (e.g.
+    Bactrim) stands for all of its ingredients, as a medication and as an
+    allergen.
+    """
+
+    def __init__(self, data):
+        self.classes = data['classes']
+        self.ingredients = list(data['ingredients'])
+        self.bits = {name: 1 << i for i, name in enumerate(self.ingredients)}
+
+        children = {class_id: [] for class_id in self.classes}
+        for class_id, info in self.classes.items():
+            for parent in info.get('parents', []):
+                children[parent].append(class_id)
+        members = {class_id: 0 for class_id in self.classes}
+        self.ingredient_classes = {}
+        for name, info in data['ingredients'].items():
+            self.ingredient_classes[name] = info['classes']
+            for class_id in info['classes']:
+                members[class_id] |= self.bits[name]
+
+        self.ancestors = {class_id: self._walk(class_id, lambda c: self.classes[c].get('parents', []))
+                          for class_id in self.classes}
+        descendants = {class_id: self._walk(class_id, children.__getitem__) for class_id in self.classes}
+        self.class_masks = {class_id: self._or(members[c] for c in descendants[class_id])
+                            for class_id in self.classes}
+
+        self.products = {name: info['ingredients'] for name, info in data.get('products', {}).items()}
+
+        # Every name a patient or a label might use, mapped to a class, ingredient or product
+        self.concepts = {}
+        for class_id, info in self.classes.items():
+            for alias in [class_id.replace('_', ' '), info['name']] + info.get('aliases', []):
+                self.concepts[alias.lower()] = ('class', class_id)
+        for name, info in data['ingredients'].items():
+            for alias in [name] + info.get('aliases', []):
+                self.concepts[alias.lower()] = ('ingredient', name)
+        for name, info in data.get('products', {}).items():
+            for alias in [name] + info.get('aliases', []):
+                self.concepts[alias.lower()] = ('product', name)
+        alternatives = sorted(self.concepts, key=len, reverse=True)
+        self._concept_re = re.compile(r'\b(?:' + '|'.join(map(re.escape, alternatives)) + r')\b')
+
+        self.profiles = {}
+        for class_id in self.classes:
+            self.profiles[('class', class_id)] = self._class_profile(class_id, descendants[class_id],
+                                                                     data['cross_reactivity'])
+        for name in self.ingredients:
+            self.profiles[('ingredient', name)] = self._ingredient_profile(name, data['cross_reactivity'])
+        for name, ingredients in self.products.items():
+            self.profiles[('product', name)] = self._sorted(
+                [entry for ingredient in ingredients for entry in self.profiles[('ingredient', ingredient)]])
+
+    @staticmethod
+    def _walk(start, neighbours):
+        seen = [start]
+        for node in seen:
+            seen.extend(n for n in neighbours(node) if n not in seen)
+        return seen
+
+    @staticmethod
+    def _or(masks):
+        result = 0
+        for mask in masks:
+            result |= mask
+        return result
+
+    def _mask(self, target):
+        return self.class_masks[target] if target in self.classes else self.bits[target]
+
+    def _cross_entries(self, related, edges):
+        entries = []
+        for edge in edges:
+            for near, far in ((edge['a'], edge['b']), (edge['b'], edge['a'])):
+                if near in related:
+                    entries.append((edge['risk'], self._mask(far), edge['note']))
+        return entries
+
+    def _class_profile(self, class_id, descendants, edges):
+        name = self.classes[class_id]['name']
+        related = set(self.ancestors[class_id]) | set(descendants)
+        related |= {i for i in self.ingredients if self.bits[i] & self.class_masks[class_id]}
+        entries = [('high', self.class_masks[class_id], f"{{ingredient}} is one of the {name}")]
+        return self._sorted(entries + self._cross_entries(related, edges))
+
+    def _ingredient_profile(self, ingredient, edges):
+        entries = [('direct', self.bits[ingredient], f"{{medication}} contains {ingredient}")]
+        related = {ingredient}
+        for class_id in self.ingredient_classes[ingredient]:
+            for ancestor in self.ancestors[class_id]:
+                related.add(ancestor)
+                risk = self.classes[ancestor].get('within_risk', 'high')
+                if risk:
+                    entries.append((risk, self.class_masks[ancestor],
+                                    f"{{ingredient}} is in the same class as {ingredient} "
+                                    f"({self.classes[ancestor]['name']})"))
+        return self._sorted(entries + self._cross_entries(related, edges))
+
+    @staticmethod
+    def _sorted(entries):
+        return sorted(entries, key=lambda entry: RISK_LEVELS.index(entry[0]), reverse=True)
+
+    def find(self, text):
+        """Classes, ingredients and products named in free text, as (kind, id) pairs in order of appearance."""
+        found = []
+        for match in self._concept_re.finditer(normalize_term(text)):
+            concept = self.concepts[match.group(0)]
+            if concept not in found:
+                found.append(concept)
+        return found
+
+    def medication_mask(self, medication):
+        """Bitset of the known ingredients in a medication name (e.g. 'Amoxil 500 mg', 'Bactrim DS')."""
+        mask = 0
+        for kind, name in self.find(medication):
+            if kind == 'ingredient':
+                mask |= self.bits[name]
+            elif kind == 'product':
+                mask |= self._or(self.bits[ingredient] for ingredient in self.products[name])
+        return mask
+
+    def ingredients_of(self, mask):
+        """Ingredient names in a bitset, in data file order."""
+        return [name for name in self.ingredients if self.bits[name] & mask]
+
+    def check(self, allergies, medications):
+        """
+        Return the conflicts between allergy names and medication names, one
+        per (allergy, medication) at its most serious risk, most serious first.
+        `ingredients` lists every ingredient of the medication at that risk;
+        `ingredient` is the first of them.
+        """
+        profiles = [(allergy, self.profiles[concept]) for allergy in allergies
+                    for concept in self.find(allergy)]
+        conflicts = []
+        for medication in medications:
+            mask = self.medication_mask(medication)
+            if not mask:
+                continue
+            for allergy, profile in profiles:
+                for risk, risk_mask, reason in profile:
+                    hit = mask & risk_mask
+                    if hit:
+                        ingredients = self.ingredients_of(hit)
+                        ingredient = ingredients[0]
+                        conflicts.append({
+                            'allergy': allergy,
+                            'medication': medication,
+                            'ingredient': ingredient,
+                            'ingredients': ingredients,
+                            'risk': risk,
+                            'reason': reason.format(medication=medication, ingredient=ingredient)
+                        })
+                        break
+        # One entry per pair even when an allergy names several concepts
+        best = {}
+        for conflict in conflicts:
+            key = (conflict['allergy'], conflict['medication'])
+            if key not in best or RISK_LEVELS.index(conflict['risk']) > RISK_LEVELS.index(best[key]['risk']):
+                best[key] = conflict
+        return sorted(best.values(), key=lambda c: RISK_LEVELS.index(c['risk']), reverse=True)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_cross_reactivity():
+    """Return the process-wide cross-reactivity engine, or None if it is disabled."""
+    global _engine
+    config = settings.CROSS_REACTIVITY
+    if not config.get('ENABLED'):
+        return None
+    with _engine_lock:
+        if _engine is None:
+            with open(config['PATH'], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _engine = CrossReactivity(data)
+            logger.info(f"Cross-reactivity engine built with {len(_engine.ingredients)} ingredients "
+                        f"and {len(_engine.classes)} drug classes")
+        return _engine
+
+
+def allergy_conflicts(allergies, medications):
+    """
+    Check medication names against allergy names. Returns None if the engine
+    is disabled, otherwise {'conflicts', 'recognized_medications',
+    'unrecognized_medications', 'unrecognized_allergies'}. Nothing is known
+    about unrecognized allergies or medications, so no conflicts for them
+    does not mean they are safe together.
+    """
+    engine = get_cross_reactivity()
+    if engine is None:
+        return None
+    recognized = [medication for medication in medications if engine.medication_mask(medication)]
+    return {
+        'conflicts': engine.check(allergies, medications),
+        'recognized_medications': recognized,
+        'unrecognized_medications': [medication for medication in medications if medication not in recognized],
+        'unrecognized_allergies': [allergy for allergy in allergies if not engine.find(allergy)],
+    }
@@ -0,0 +1,89 @@
+"""
+Radius search over the HealthcareProvider directory for nearby_doctors.
+The search circle is covered by a handful of geohash cells (see geo.py), each
+of which is an index range scan on HealthcareProvider.geohash. Only the ids
+and coordinates of those candidates are fetched; true haversine distances
+are computed over them with NumPy, and only the requested page of providers
+is loaded in full.
+"""
+import logging
+import numpy as np
+from django.conf import settings
+from django.db.models import Q
+from .geo import GEOHASH_END, bounding_box, covering_cells, haversine_miles
+from .models import HealthcareProvider
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# NUCC taxonomy code prefixes for the specialties the frontend asks for
+SPECIALTY_TAXONOMIES = {
+    'allergist': ['207K', '207RA0201X', '2080P0201X'],
+    'immunologist': ['207K', '207RA0201X', '2080P0201X'],
+    'pediatric allergist': ['2080P0201X'],
+    'dermatologist': ['207N'],
+    'ent': ['207Y'],
+    'pulmonologist': ['207RP1001X', '2080P0214X'],
+    'pediatrician': ['2080'],
+    'primary care': ['207Q', '207R00000X', '208000000X', '208D'],
+}
+ANY_SPECIALTY = {'', 'any', 'all'}
+
+
+def specialty_filter(specialty):
+    """Q matching doctors of a specialty keyword, taxonomy code or free-text name."""
+    specialty = ' '.join(specialty.lower().split())
+    if specialty in ANY_SPECIALTY:
+        return Q()
+    prefixes = SPECIALTY_TAXONOMIES.get(specialty)
+    if prefixes is None:
+        # 'allergists' as well as 'allergist'
+        prefixes = SPECIALTY_TAXONOMIES.get(specialty.removesuffix('s'))
+    if prefixes is None:
+        return Q(taxonomy__iexact=specialty) | Q(specialty__icontains=specialty)
+    query = Q()
+    for prefix in prefixes:
+        query |= Q(taxonomy__startswith=prefix)
+    return query
+
+
+def cell_filter(cells):
+    """Q selecting rows whose geohash falls in any of the cells, as index range scans."""
+    query = Q()
+    for cell in cells:
+        query |= Q(geohash__gte=cell, geohash__lt=cell + GEOHASH_END)
+    return query
+
+
+def nearby_providers(latitude, longitude, miles, specialty='allergist', page=1, page_size=None):
+    """
+    Providers within `miles` of a point, nearest first: doctors of the given
+    specialty and every hospital. Returns {'total', 'page', 'page_size',
+    'results'}, where results are (provider, distance in miles) pairs for
+    the requested page.
+    """
+    config = settings.PROVIDER_DIRECTORY
+    page_size = page_size or config['PAGE_SIZE']
+    cells = covering_cells(latitude, longitude, miles, config['MAX_CELLS'])
+    south, west, north, east = bounding_box(latitude, longitude, miles)
+
+    candidates = HealthcareProvider.objects.filter(cell_filter(cells), latitude__range=(south, north))
+    if west <= east:
+        candidates = candidates.filter(longitude__range=(west, east))
+    candidates = candidates.filter(Q(kind=HealthcareProvider.HOSPITAL) |
+                                   (Q(kind=HealthcareProvider.DOCTOR) & specialty_filter(specialty)))
+    rows = list(candidates.values_list('id', 'latitude', 'longitude'))
+    if not rows:
+        return {'total': 0, 'page': page, 'page_size': page_size, 'results': []}
+
+    ids, latitudes, longitudes = (np.array(column) for column in zip(*rows))
+    distances = haversine_miles(latitude, longitude, latitudes, longitudes)
+    within = np.nonzero(distances <= miles)[0]
+    # Ties are broken by id so pages are stable
+    order = within[np.lexsort((ids[within], distances[within]))]
+    selected = order[(page - 1) * page_size:page * page_size]
+
+    providers = HealthcareProvider.objects.in_bulk([int(ids[i]) for i in selected])
+    results = [(providers[int(ids[i])], float(distances[i])) for i in selected]
+    logger.debug(f"{len(rows)} candidates in {len(cells)} cells, {len(within)} within {miles} miles")
+    return {'total': int(len(within)), 'page': page, 'page_size': page_size, 'results': results}
@@ -0,0 +1,151 @@
+"""
+BM25 retrieval over the curated FAQ knowledge base.
+chat_api consults the index before calling an LLM: a confident match is
+answered directly, otherwise the best passages are added to the prompt.
+"""
+import json
+import logging
+import math
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+from django.conf import settings
+from .semantic_cache import STOPWORDS, TOKEN_RE
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+
+def tokenize(text):
+    """Lowercase word tokens without stopwords."""
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Inverted index with Okapi BM25 scoring.
+
+    Each posting list stores document ids and the fully precomputed BM25
+    weight of the term in that document, so a query is one scatter-add per
+    query term into a dense score array followed by a partial sort.
+    Question text counts `question_boost` times as much as answer text.
+    BM25 only picks the candidates; they are returned in order of
+    `confidence`, since that is what callers apply thresholds to.
+    """
+
+    def __init__(self, passages, k1=1.2, b=0.75, question_boost=2):
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.size = len(passages)
+
+        term_freqs = []
+        self.question_terms = []
+        lengths = np.zeros(self.size, dtype=np.float32)
+        for doc_id, passage in enumerate(passages):
+            counts = Counter(tokenize(passage.get('answer', '')))
+            question_terms = set(tokenize(passage.get('question', '')))
+            for term in question_terms:
+                counts[term] += question_boost
+            self.question_terms.append(question_terms)
+            term_freqs.append(counts)
+            lengths[doc_id] = sum(counts.values())
+        avg_length = float(lengths.mean()) if self.size else 0.0
+
+        postings = defaultdict(list)
+        for doc_id, counts in enumerate(term_freqs):
+            for term, tf in counts.items():
+                postings[term].append((doc_id, tf))
+
+        self.postings = {}
+        self.idf = {}
+        for term, entries in postings.items():
+            doc_ids = np.fromiter((d for d, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = self._idf(len(entries))
+            norm = self.k1 * (1 - self.b + self.b * lengths[doc_ids] / (avg_length or 1.0))
+            self.idf[term] = idf
+            self.postings[term] = (doc_ids, (idf * tfs * (self.k1 + 1) / (tfs + norm)).astype(np.float32))
+
+    def _idf(self, doc_freq):
+        return math.log(1 + (self.size - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _weight(self, terms):
+        # Unknown terms count with the maximum idf
+        return sum(self.idf.get(term, self._idf(0)) for term in terms)
+
+    def confidence(self, terms, doc_id):
+        """
+        How closely the query terms match the passage's question, from 0 to 1:
+        the idf-weighted Dice overlap of the two term sets. BM25 scores rank
+        passages but are unbounded, so this is what thresholds are applied to.
+        """
+        question_terms = self.question_terms[doc_id]
+        total = self._weight(terms) + self._weight(question_terms)
+        return 2 * self._weight(terms & question_terms) / total if total else 0.0
+
+    def search(self, query, top_k=3, candidates=20):
+        """
+        Return up to `top_k` (passage, score, confidence) tuples, highest
+        confidence first (BM25 score breaks ties), from the `candidates`
+        passages with the best BM25 scores.
+        """
+        terms = set(tokenize(query))
+        if not terms or not self.size:
+            return []
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is not None:
+                doc_ids, weights = posting
+                scores[doc_ids] += weights
+
+        k = min(max(top_k, candidates), self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        results = [(self.passages[i], float(scores[i]), self.confidence(terms, i)) for i in top if scores[i] > 0]
+        results.sort(key=lambda result: (result[2], result[1]), reverse=True)
+        return results[:top_k]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_faq_index():
+    """Return the process-wide FAQ index, or None if the FAQ is disabled."""
+    global _index
+    config = settings.CHAT_FAQ
+    if not config.get('ENABLED'):
+        return None
+    with _index_lock:
+        if _index is None:
+            with open(config['PATH'], 'r', encoding='utf-8') as f:
+                passages = json.load(f)
+            _index = BM25Index(passages)
+            logger.info(f"FAQ index built with {_index.size} passages")
+        return _index
+
+
+def faq_lookup(question):
+    """
+    Consult the FAQ for a chat question.
+    Returns (answer, context): `answer` is the curated answer when the best
+    match clears ANSWER_THRESHOLD, otherwise None and `context` holds the
+    passages worth adding to the LLM prompt.
+    """
+    config = settings.CHAT_FAQ
+    index = get_faq_index()
+    if index is None:
+        return None, []
+    results = index.search(question, top_k=config.get('CONTEXT_PASSAGES', 3),
+                           candidates=config.get('CANDIDATES', 20))
+    if results and results[0][2] >= config.get('ANSWER_THRESHOLD', 0.8):
+        return results[0][0]['answer'], []
+    context = [passage for passage, _, confidence in results
+               if confidence >= config.get('CONTEXT_THRESHOLD', 0.2)]
+    return None, context
+
+
+def format_context(passages):
+    """Render FAQ passages as reference text for an LLM prompt."""
+    return '\n'.join(f"- Q: {p['question']}\n  A: {p['answer']}" for p in passages)
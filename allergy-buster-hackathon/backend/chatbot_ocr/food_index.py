@@ -0,0 +1,204 @@
+"""
+Allergen-free food index for dietary_suggestions.
+Every recipe and product in data/foods.json carries a uint16 bitmask of the
+14 major allergens, so the safe foods for any allergy set come from a single
+vectorized `masks & allergy_mask == 0`. Suggestions are cached per allergy
+mask, which covers all 2^14 combinations.
+"""
+import json
+import logging
+import re
+import threading
+import numpy as np
+from django.conf import settings
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+MEALS = ('breakfast', 'lunch', 'dinner', 'snack')
+PLAN_DAYS = 3
+
+GENERAL_EATING_OUT_TIPS = [
+    "Tell staff about your allergies before ordering and ask to speak to the chef if unsure",
+    "Carry a chef card listing your allergens",
+    "Choose simple dishes with few ingredients and sauces on the side",
+]
+
+
+def _stem(term):
+    """Crude singular stem so 'strawberry' also matches 'strawberries'."""
+    return re.sub(r'(?:ies|es|s|y)$', '', term) if len(term) > 4 else term
+
+
+class FoodIndex:
+    """
+    Recipes, products and allergy-prone staples with precomputed allergen masks.
+    Bit i of a mask is the i-th allergen in the data file.
+    """
+
+    def __init__(self, data):
+        self.allergens = data['allergens']
+        names = list(self.allergens)
+        if len(names) > 16:
+            raise ValueError('FoodIndex supports at most 16 allergens')
+        self.bits = {name: 1 << i for i, name in enumerate(names)}
+        self.aliases = {}
+        for name, info in self.allergens.items():
+            for alias in [name, name.replace('_', ' ')] + info.get('aliases', []):
+                self.aliases[alias.lower()] = self.aliases.get(alias.lower(), 0) | self.bits[name]
+
+        self.recipes = data['recipes']
+        self.recipe_masks = np.array([self.mask_of(r['allergens']) for r in self.recipes], dtype=np.uint16)
+        self.meal_rows = {meal: np.array([meal in r['meals'] for r in self.recipes]) for meal in MEALS}
+        self.diet_rows = {
+            diet: np.array([diet in r.get('tags', []) for r in self.recipes]) for diet in ('vegetarian', 'vegan')
+        }
+        self._recipe_text = [' '.join([r['name']] + r['ingredients']).lower() for r in self.recipes]
+
+        self.product_names = list(data['products'])
+        self.product_masks = np.array([self.mask_of(a) for a in data['products'].values()], dtype=np.uint16)
+        self._product_rows = {name: i for i, name in enumerate(self.product_names)}
+        self.staples = data['staples']
+        self.staple_masks = np.array([self.mask_of(s['allergens']) for s in self.staples], dtype=np.uint16)
+
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def mask_of(self, allergens):
+        mask = 0
+        for name in allergens:
+            mask |= self.bits[name]
+        return mask
+
+    def allergy_mask(self, allergies):
+        """
+        Map free-text allergy names to (mask, unrecognized); e.g. 'dairy' sets
+        the milk bit and 'shellfish' both crustaceans and molluscs.
+        """
+        mask = 0
+        unrecognized = []
+        for allergy in allergies:
+            term = allergy.strip().lower()
+            if not term:
+                continue
+            bits = self.aliases.get(term) or self.aliases.get(term.rstrip('s'))
+            if bits:
+                mask |= bits
+            else:
+                unrecognized.append(term)
+        return mask, unrecognized
+
+    def allergen_names(self, mask):
+        return [name for name, bit in self.bits.items() if mask & bit]
+
+    def suggestions(self, mask, diet=None, exclude_terms=()):
+        """
+        Return the dietary_suggestions sections for an allergy mask.
+        `diet` is None, 'vegetarian' or 'vegan'. `exclude_terms` are allergies
+        outside the 14 majors, matched against recipe names and ingredients.
+        """
+        key = (mask, diet)
+        if not exclude_terms and key in self._cache:
+            return self._cache[key]
+
+        safe = (self.recipe_masks & np.uint16(mask)) == 0
+        if diet:
+            safe &= self.diet_rows[diet]
+        stems = [_stem(term) for term in exclude_terms]
+        if stems:
+            safe &= np.array([not any(stem in text for stem in stems) for text in self._recipe_text])
+        safe_products = (self.product_masks & np.uint16(mask)) == 0
+
+        meal_plan, shopping_list = self._meal_plan(safe)
+        allergens = self.allergen_names(mask)
+        result = {
+            'foods_to_avoid': [item for name in allergens for item in self.allergens[name].get('watch_for', [])]
+                              + [f"Anything containing {term}" for term in exclude_terms],
+            'safe_alternatives': self._alternatives(mask, safe_products, exclude_terms),
+            'meal_plan': meal_plan,
+            'shopping_list': shopping_list,
+            'eating_out_tips': GENERAL_EATING_OUT_TIPS + [self.allergens[name]['tip'] for name in allergens
+                                                          if self.allergens[name].get('tip')],
+            'safe_foods': [self.recipes[i]['name'] for i in np.flatnonzero(safe)],
+        }
+        if not exclude_terms:
+            with self._lock:
+                self._cache[key] = result
+        return result
+
+    def _alternatives(self, mask, safe_products, exclude_terms):
+        alternatives = []
+        for row in np.flatnonzero(self.staple_masks & np.uint16(mask)):
+            staple = self.staples[row]
+            options = [name for name in staple['alternatives']
+                       if safe_products[self._product_rows[name]]
+                       and not any(_stem(t) in name.lower() for t in exclude_terms)]
+            if options:
+                alternatives.append(f"Instead of {staple['name'].lower()}: {', '.join(options)}")
+        return alternatives
+
+    def _meal_plan(self, safe):
+        """
+        Rotate through the safe recipes for each meal, preferring recipes not
+        yet in the plan, then ones not already eaten the same day.
+        """
+        candidates = {meal: np.flatnonzero(safe & self.meal_rows[meal]) for meal in MEALS}
+        next_pick = dict.fromkeys(MEALS, 0)
+        planned = set()
+        plan = []
+        ingredients = {}
+        for day in range(PLAN_DAYS):
+            today = set()
+            for meal in MEALS:
+                rows = candidates[meal]
+                if not len(rows):
+                    plan.append(f"Day {day + 1} {meal}: no safe option in the local database")
+                    continue
+                order = [(next_pick[meal] + offset) % len(rows) for offset in range(len(rows))]
+                position = next((p for p in order if rows[p] not in planned),
+                                next((p for p in order if rows[p] not in today), order[0]))
+                next_pick[meal] = position + 1
+                row = rows[position]
+                planned.add(row)
+                today.add(row)
+                recipe = self.recipes[row]
+                plan.append(f"Day {day + 1} {meal}: {recipe['name']}")
+                ingredients.update(dict.fromkeys(recipe['ingredients']))
+        return plan, list(ingredients)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_food_index():
+    """Return the process-wide food index, or None if it is disabled."""
+    global _index
+    config = settings.FOOD_INDEX
+    if not config.get('ENABLED'):
+        return None
+    with _index_lock:
+        if _index is None:
+            with open(config['PATH'], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _index = FoodIndex(data)
+            logger.info(f"Food index built with {len(_index.recipes)} recipes and "
+                        f"{len(_index.product_names)} products")
+        return _index
+
+
+def food_suggestions(allergies, preferences=''):
+    """
+    Local dietary suggestions for a list of allergies, or None if the index
+    is disabled. Vegan or vegetarian in `preferences` filters the recipes.
+    """
+    index = get_food_index()
+    if index is None:
+        return None
+    mask, unrecognized = index.allergy_mask(allergies)
+    preferences = preferences.lower()
+    diet = 'vegan' if 'vegan' in preferences else 'vegetarian' if 'vegetarian' in preferences else None
+    result = dict(index.suggestions(mask, diet, tuple(unrecognized)))
+    result['recognized_allergens'] = index.allergen_names(mask)
+    result['unrecognized_allergies'] = unrecognized
+    return result
@@ -0,0 +1,96 @@
+"""
+Geographic helpers shared by allergy_alerts and the provider directory:
+geohash encoding, haversine distances and the set of geohash cells that
+cover a search radius. A geohash prefix is a rectangle, so "every point in
+cell c" is the index range [c, c + '{') on a geohash column.
+"""
+import math
+import numpy as np
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE_LATITUDE = 69.05
+# Sorts after every geohash character, so cell + GEOHASH_END bounds a prefix range
+GEOHASH_END = '{'
+
+
+def geohash(latitude, longitude, precision):
+    """Encode a coordinate as a geohash of `precision` characters."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude, longitude) size in degrees of a geohash cell."""
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def haversine_miles(latitude, longitude, latitudes, longitudes):
+    """Great-circle distances in miles from one point to arrays of points."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def bounding_box(latitude, longitude, miles):
+    """
+    (south, west, north, east) around a circle of `miles`. west > east when
+    the box crosses the antimeridian; near the poles it spans all longitudes.
+    """
+    dlat = miles / MILES_PER_DEGREE_LATITUDE
+    south, north = max(latitude - dlat, -90.0), min(latitude + dlat, 90.0)
+    widest = max(abs(south), abs(north))
+    if widest >= 89.0:
+        return south, -180.0, north, 180.0
+    dlon = dlat / math.cos(math.radians(widest))
+    if dlon >= 180.0:
+        return south, -180.0, north, 180.0
+    west = (longitude - dlon + 180.0) % 360.0 - 180.0
+    east = (longitude + dlon + 180.0) % 360.0 - 180.0
+    return south, west, north, east
+
+
+def covering_cells(latitude, longitude, miles, max_cells=16):
+    """
+    The geohash cells, at the finest precision that needs no more than
+    `max_cells` of them, that together cover every point within `miles`.
+    """
+    south, west, north, east = bounding_box(latitude, longitude, miles)
+    width = east - west if west <= east else east - west + 360.0
+    for precision in range(9, 0, -1):
+        lat_step, lon_step = cell_size(precision)
+        rows = int(math.floor(north / lat_step) - math.floor(south / lat_step)) + 1
+        cols = min(int(math.ceil(width / lon_step)) + 1, int(round(360.0 / lon_step)))
+        if rows * cols <= max_cells or precision == 1:
+            break
+    cells = set()
+    for row in range(rows):
+        lat = min(south + row * lat_step, north)
+        for col in range(cols):
+            lon = (west + min(col * lon_step, width) + 180.0) % 360.0 - 180.0
+            cells.add(geohash(lat, lon, precision))
+        cells.add(geohash(lat, east, precision))
+    for col in range(cols):
+        lon = (west + min(col * lon_step, width) + 180.0) % 360.0 - 180.0
+        cells.add(geohash(north, lon, precision))
+    cells.add(geohash(north, east, precision))
+    return sorted(cells)
@@ -0,0 +1,177 @@
+"""
+Hedged requests for the LLM call layer.
+If the primary provider has not answered within a delay derived from its recent
+latency percentile, the same prompt is sent to the secondary provider and the
+first successful answer wins.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """
+    Keeps a sliding window of observed call latencies (in seconds)
+    and answers percentile queries over it.
+    """
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        """Record a single observed latency."""
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct):
+        """
+        Return the given percentile (0-100) of the recorded latencies,
+        or None if nothing has been recorded yet.
+        """
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        rank = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+        return ordered[rank]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class HedgeBudget:
+    """
+    Caps hedged requests to a fraction of recent traffic.
+    Counts are kept over a sliding window of the last `window` calls.
+    """
+
+    def __init__(self, fraction=0.1, window=1000):
+        self.fraction = fraction
+        self._calls = deque(maxlen=window)
+        self._hedged = 0
+        self._lock = threading.Lock()
+
+    def _append(self, hedged):
+        if len(self._calls) == self._calls.maxlen and self._calls[0]:
+            self._hedged -= 1
+        self._calls.append(hedged)
+        if hedged:
+            self._hedged += 1
+
+    def record_unhedged(self):
+        """Record a call that completed without a hedge."""
+        with self._lock:
+            self._append(False)
+
+    def try_acquire(self):
+        """
+        Record a call that wants to hedge. Returns True, counting the call as
+        hedged, only if that keeps hedges within the budget.
+        """
+        with self._lock:
+            allowed = (self._hedged + 1) <= self.fraction * (len(self._calls) + 1)
+            self._append(allowed)
+            return allowed
+
+
+class HedgedCaller:
+    """
+    Runs a primary callable and, if it is slow, a secondary one in parallel.
+
+    Both callables take no arguments and either return a result or raise.
+    `call` returns a (result, name) tuple for whichever finished first with
+    a result. Python threads cannot be interrupted, so the losing call is
+    cancelled if it has not started yet and otherwise left to finish in the
+    background with its result discarded.
+    """
+
+    def __init__(self, percentile=95, min_delay=0.5, max_delay=5.0,
+                 budget_fraction=0.1, min_samples=20, max_workers=16):
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.min_samples = min_samples
+        self.budget = HedgeBudget(fraction=budget_fraction)
+        self.latencies = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-hedge')
+
+    @classmethod
+    def from_settings(cls, config):
+        """Build a caller from the LLM_HEDGING settings dict."""
+        return cls(
+            percentile=config.get('PERCENTILE', 95),
+            min_delay=config.get('MIN_DELAY', 0.5),
+            max_delay=config.get('MAX_DELAY', 5.0),
+            budget_fraction=config.get('BUDGET', 0.1),
+            min_samples=config.get('MIN_SAMPLES', 20),
+            max_workers=config.get('MAX_WORKERS', 16),
+        )
+
+    def hedge_delay(self):
+        """
+        Seconds to wait for the primary before hedging. Until enough samples
+        exist the maximum delay is used so that a cold start does not hedge
+        every request.
+        """
+        observed = self.latencies.percentile(self.percentile)
+        if observed is None or len(self.latencies) < self.min_samples:
+            return self.max_delay
+        return min(self.max_delay, max(self.min_delay, observed))
+
+    def _timed(self, fn):
+        """Wrap the primary so successful latencies feed the tracker."""
+        def run():
+            started = time.monotonic()
+            result = fn()
+            self.latencies.record(time.monotonic() - started)
+            return result
+        return run
+
+    def call(self, primary, secondary):
+        """
+        Call `primary` and hedge with `secondary` once the hedge delay expires.
+        Each argument is a (name, callable) pair. If the primary fails outright
+        the secondary is used as a plain fallback, outside of the hedge budget.
+        """
+        primary_name, primary_fn = primary
+        secondary_name, secondary_fn = secondary
+
+        primary_future = self._executor.submit(self._timed(primary_fn))
+        done, _ = wait([primary_future], timeout=self.hedge_delay())
+
+        if primary_future in done:
+            self.budget.record_unhedged()
+            if primary_future.exception() is None:
+                return primary_future.result(), primary_name
+            logger.warning(f"Primary provider {primary_name} failed: {primary_future.exception()}")
+            return secondary_fn(), secondary_name
+
+        if not self.budget.try_acquire():
+            try:
+                return primary_future.result(), primary_name
+            except Exception as e:
+                logger.warning(f"Primary provider {primary_name} failed: {e}")
+                return secondary_fn(), secondary_name
+
+        logger.info(f"Hedging {primary_name} with {secondary_name} after {self.hedge_delay():.2f}s")
+        secondary_future = self._executor.submit(secondary_fn)
+        names = {primary_future: primary_name, secondary_future: secondary_name}
+        pending = set(names)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result(), names[future]
+                error = future.exception()
+                logger.warning(f"Provider {names[future]} failed during hedge: {error}")
+        raise error
@@ -0,0 +1,265 @@
+"""
+Local drug interaction graph for drug_interactions and the interaction matrix.
+Interactions between ingredients (keyed by ingredient RxCUI) and between drug
+classes are imported from CSV (see `manage.py import_interactions`) into sorted
+NumPy arrays, so a pair is a binary search and a whole medication list is one
+vectorized lookup. The graph only answers with interactions it records; pairs
+it has no edge for still go to RxNav and the LLM.
+"""
+import csv
+import logging
+import os
+import threading
+import numpy as np
+from django.conf import settings
+from .models import RxConcept
+from .rxnorm import SEVERITY_ORDER, related_concepts
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+SOURCE_NAME = 'Local interaction graph'
+
+
+def _pair_keys(first, second, size):
+    """Order-independent int64 keys for index pairs (a node may pair with itself)."""
+    first, second = np.asarray(first, dtype=np.int64), np.asarray(second, dtype=np.int64)
+    return np.minimum(first, second) * size + np.maximum(first, second)
+
+
+class InteractionGraph:
+    """
+    Ingredients, drug classes and interaction edges as flat arrays.
+
+    Ingredient i is `rxcuis[i]` (sorted). Its classes are
+    `member_classes[member_ptr[i]:member_ptr[i + 1]]`. Ingredient edges are
+    `pair_keys` (sorted, see _pair_keys) with parallel `pair_severity` and
+    `pair_text`; class edges are the same over class indices.
+    """
+
+    ARRAYS = ('rxcuis', 'names', 'class_ids', 'class_names', 'member_ptr', 'member_classes',
+              'pair_keys', 'pair_severity', 'pair_text', 'class_pair_keys', 'class_pair_severity',
+              'class_pair_text', 'texts')
+
+    def __init__(self, arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def from_rows(cls, class_rows, interaction_rows):
+        """
+        Build the graph from drug_classes.csv and interactions.csv rows (dicts).
+        Raises ValueError for unknown severities, classes or ingredients.
+        """
+        names = {}
+        memberships = {}
+        class_names = {}
+        for row in class_rows:
+            names.setdefault(int(row['rxcui']), row['ingredient'])
+            class_names.setdefault(row['class'], row['class_name'])
+            memberships.setdefault(int(row['rxcui']), set()).add(row['class'])
+        for row in interaction_rows:
+            if row['level'] == 'ingredient':
+                for rxcui in (int(row['a']), int(row['b'])):
+                    names.setdefault(rxcui, str(rxcui))
+
+        rxcuis = np.array(sorted(names), dtype=np.int64)
+        class_ids = sorted(class_names)
+        class_index = {class_id: i for i, class_id in enumerate(class_ids)}
+        member_ptr = [0]
+        member_classes = []
+        for rxcui in rxcuis:
+            member_classes.extend(sorted(class_index[c] for c in memberships.get(int(rxcui), ())))
+            member_ptr.append(len(member_classes))
+
+        texts = []
+        edges = {'ingredient': ([], [], [], []), 'class': ([], [], [], [])}
+        for row in interaction_rows:
+            if row['severity'] not in SEVERITY_ORDER:
+                raise ValueError(f"Unknown severity {row['severity']!r}")
+            if row['level'] == 'ingredient':
+                a, b = np.searchsorted(rxcuis, [int(row['a']), int(row['b'])])
+            elif row['level'] == 'class':
+                if row['a'] not in class_index or row['b'] not in class_index:
+                    raise ValueError(f"Unknown drug class in {row['a']!r}, {row['b']!r}")
+                a, b = class_index[row['a']], class_index[row['b']]
+            else:
+                raise ValueError(f"Unknown interaction level {row['level']!r}")
+            first, second, severity, text = edges[row['level']]
+            first.append(a)
+            second.append(b)
+            severity.append(SEVERITY_ORDER.index(row['severity']))
+            text.append(len(texts))
+            texts.append(row['description'])
+
+        arrays = {
+            'rxcuis': rxcuis,
+            'names': np.array([names[int(rxcui)] for rxcui in rxcuis], dtype=str),
+            'class_ids': np.array(class_ids, dtype=str),
+            'class_names': np.array([class_names[c] for c in class_ids], dtype=str),
+            'member_ptr': np.array(member_ptr, dtype=np.int32),
+            'member_classes': np.array(member_classes, dtype=np.int32),
+            'texts': np.array(texts, dtype=str),
+        }
+        for level, size, prefix in (('ingredient', len(rxcuis), 'pair'), ('class', len(class_ids), 'class_pair')):
+            first, second, severity, text = edges[level]
+            keys = _pair_keys(first, second, size)
+            order = np.argsort(keys, kind='stable')
+            arrays[f'{prefix}_keys'] = keys[order]
+            arrays[f'{prefix}_severity'] = np.array(severity, dtype=np.int8)[order]
+            arrays[f'{prefix}_text'] = np.array(text, dtype=np.int32)[order]
+        return cls(arrays)
+
+    @classmethod
+    def from_csv(cls, classes_path, interactions_path):
+        with open(classes_path, 'r', encoding='utf-8', newline='') as f:
+            class_rows = list(csv.DictReader(f))
+        with open(interactions_path, 'r', encoding='utf-8', newline='') as f:
+            interaction_rows = list(csv.DictReader(f))
+        return cls.from_rows(class_rows, interaction_rows)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls({name: data[name] for name in cls.ARRAYS})
+
+    def save(self, path):
+        # np.savez appends .npz to paths without it, so write through a file object
+        with open(path, 'wb') as f:
+            np.savez_compressed(f, **{name: getattr(self, name) for name in self.ARRAYS})
+
+    def node(self, rxcui):
+        """Index of an ingredient RxCUI, or None if the graph does not know it."""
+        try:
+            value = int(rxcui)
+        except (TypeError, ValueError):
+            return None
+        i = int(np.searchsorted(self.rxcuis, value))
+        return i if i < len(self.rxcuis) and self.rxcuis[i] == value else None
+
+    def has(self, rxcui):
+        return self.node(rxcui) is not None
+
+    def classes_of(self, node):
+        return self.member_classes[self.member_ptr[node]:self.member_ptr[node + 1]]
+
+    def _edges(self, keys, severities, text_ids, wanted):
+        """(position in `wanted`, severity, text) for every edge whose key is in `wanted`."""
+        left = np.searchsorted(keys, wanted, side='left')
+        right = np.searchsorted(keys, wanted, side='right')
+        for position in np.flatnonzero(right > left):
+            for edge in range(left[position], right[position]):
+                yield int(position), SEVERITY_ORDER[severities[edge]], str(self.texts[text_ids[edge]])
+
+    def interactions(self, rxcuis):
+        """
+        Return {(rxcui_a, rxcui_b): [interaction, ...]} for every interacting
+        pair among the given ingredient RxCUIs, keyed in input order. Pairs
+        with no interaction and RxCUIs the graph does not know are left out.
+        """
+        known = [(rxcui, self.node(rxcui)) for rxcui in dict.fromkeys(rxcuis)]
+        known = [(rxcui, node) for rxcui, node in known if node is not None]
+        if len(known) < 2:
+            return {}
+        first, second = np.triu_indices(len(known), k=1)
+        nodes = np.array([node for _, node in known])
+        pairs = [(known[i][0], known[j][0]) for i, j in zip(first, second)]
+        found = {}
+
+        keys = _pair_keys(nodes[first], nodes[second], len(self.rxcuis))
+        for position, severity, text in self._edges(self.pair_keys, self.pair_severity, self.pair_text, keys):
+            found.setdefault(pairs[position], []).append({
+                'description': text,
+                'severity': severity,
+                'source': SOURCE_NAME,
+                'level': 'ingredient'
+            })
+
+        # Class edges: every class of one ingredient against every class of the other
+        class_pairs = []
+        wanted = []
+        for pair, i, j in zip(pairs, nodes[first], nodes[second]):
+            for class_a in self.classes_of(i):
+                for class_b in self.classes_of(j):
+                    class_pairs.append((pair, class_a, class_b))
+                    wanted.append(_pair_keys(class_a, class_b, len(self.class_ids)))
+        if wanted:
+            edges = self._edges(self.class_pair_keys, self.class_pair_severity, self.class_pair_text,
+                                np.array(wanted, dtype=np.int64))
+            for position, severity, text in edges:
+                pair, class_a, class_b = class_pairs[position]
+                interaction = {
+                    'description': text,
+                    'severity': severity,
+                    'source': SOURCE_NAME,
+                    'level': 'class',
+                    'classes': [str(self.class_names[class_a]), str(self.class_names[class_b])]
+                }
+                # An ingredient in two matching classes (e.g. aspirin) would repeat the edge
+                if all(existing['description'] != text for existing in found.get(pair, [])):
+                    found.setdefault(pair, []).append(interaction)
+        return found
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_interaction_graph():
+    """
+    Return the process-wide interaction graph, or None if it is disabled.
+    Loads the imported arrays at PATH, or builds them from the bundled CSVs
+    if nothing has been imported yet.
+    """
+    global _graph
+    config = settings.INTERACTION_GRAPH
+    if not config.get('ENABLED'):
+        return None
+    with _graph_lock:
+        if _graph is None:
+            if os.path.exists(config['PATH']):
+                _graph = InteractionGraph.load(config['PATH'])
+            else:
+                _graph = InteractionGraph.from_csv(config['CLASSES'], config['INTERACTIONS'])
+            logger.info(f"Interaction graph loaded with {len(_graph.rxcuis)} ingredients, "
+                        f"{len(_graph.pair_keys)} ingredient and {len(_graph.class_pair_keys)} class edges")
+        return _graph
+
+
+def graph_ingredients(graph, rxcui):
+    """
+    Graph ingredients for a resolved RxCUI: the RxCUI itself if it is a known
+    ingredient, otherwise the known ingredients of a brand or product. An
+    ingredient the graph does not know maps to nothing; it is never swapped
+    for another ingredient (such as a co-ingredient in a combination product).
+    May raise RxNavError when the related concepts are looked up remotely.
+    """
+    if graph.has(rxcui):
+        return [rxcui]
+    if RxConcept.objects.filter(rxcui=rxcui, tty='IN').exists():
+        return []
+    ingredients = [concept['rxcui'] for concept in related_concepts(rxcui).get('IN', [])]
+    # RxNav's allrelated lists an ingredient among its own ingredients
+    if rxcui in ingredients:
+        return []
+    return [ingredient for ingredient in ingredients if graph.has(ingredient)]
+
+
+def local_interactions(rxcui1, rxcui2):
+    """
+    Interactions between two resolved medications recorded in the local
+    graph, or None if the graph is disabled, does not know both of them, or
+    has no edge between them. The graph only lists known interactions, so a
+    missing edge is not evidence that there is none.
+    """
+    graph = get_interaction_graph()
+    if graph is None:
+        return None
+    first, second = graph_ingredients(graph, rxcui1), graph_ingredients(graph, rxcui2)
+    if not first or not second:
+        return None
+    interactions = []
+    for (a, b), found in graph.interactions(first + second).items():
+        if (a in first and b in second) or (a in second and b in first):
+            interactions.extend(interaction for interaction in found if interaction not in interactions)
+    return interactions or None
@@ -0,0 +1,46 @@
+"""
+Compute the day's allergy alerts for every user into the AlertOutbox table.
+
+Usage:
+    python manage.py compute_alerts
+    python manage.py compute_alerts --date 2025-04-10 --chunk-size 200000
+
+Meant to run once each morning from cron (or any scheduler), after the day's
+pollen forecast has been ingested with ingest_pollen. Running it again for
+the same date only adds alerts that are missing.
+"""
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from chatbot_ocr.bulk_alerts import compute_alerts
+from chatbot_ocr.pollen_grid import get_pollen_grid
+
+
+class Command(BaseCommand):
+    help = "Compute every user's allergy alerts for a day into the alert outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Day to compute alerts for (YYYY-MM-DD, default today)')
+        parser.add_argument('--chunk-size', type=int, default=100000, help='Users matched per chunk')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        try:
+            day = date.fromisoformat(options['date']) if options['date'] else date.today()
+        except ValueError:
+            raise CommandError(f"Invalid date: {options['date']}")
+        grid = get_pollen_grid()
+        if grid is None or day not in grid.days:
+            self.stdout.write(f'No pollen forecast for {day}; using seasonal alerts only')
+
+        started = time.monotonic()
+
+        def progress(users, alerts):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'{users} users, {alerts} alerts ({users / max(elapsed, 1e-6):.0f} users/s)...')
+
+        result = compute_alerts(day, grid, options['chunk_size'], options['batch_size'], progress)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{day}: {result['alerts']} alerts for {result['users']} users in {elapsed:.1f}s"
+        ))
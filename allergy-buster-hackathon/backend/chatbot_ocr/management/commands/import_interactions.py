@@ -0,0 +1,42 @@
+"""
+Build the local drug interaction graph from CSV.
+
+Usage:
+    python manage.py import_interactions
+    python manage.py import_interactions --classes classes.csv --interactions interactions.csv
+
+drug_classes.csv has one row per (class, ingredient): class, class_name,
+rxcui, ingredient. interactions.csv has level (ingredient or class), a, b,
+severity (mild, moderate, high, severe) and description; a and b are
+ingredient RxCUIs or class ids. The graph is written as compressed arrays to
+INTERACTION_GRAPH['PATH'] and picked up on the next start.
+"""
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from chatbot_ocr.interaction_graph import InteractionGraph
+
+
+class Command(BaseCommand):
+    help = 'Import drug classes and interactions from CSV into the local interaction graph'
+
+    def add_arguments(self, parser):
+        config = settings.INTERACTION_GRAPH
+        parser.add_argument('--classes', default=config['CLASSES'], help='Drug class membership CSV')
+        parser.add_argument('--interactions', default=config['INTERACTIONS'], help='Interactions CSV')
+        parser.add_argument('--output', default=config['PATH'], help='Where to write the graph (.npz)')
+
+    def handle(self, *args, **options):
+        for path in (options['classes'], options['interactions']):
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist')
+        try:
+            graph = InteractionGraph.from_csv(options['classes'], options['interactions'])
+        except (KeyError, ValueError) as e:
+            raise CommandError(f'Invalid interaction data: {e}')
+
+        graph.save(options['output'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {options['output']}: {len(graph.rxcuis)} ingredients, {len(graph.class_ids)} classes, "
+            f"{len(graph.pair_keys)} ingredient and {len(graph.class_pair_keys)} class interactions"
+        ))
@@ -0,0 +1,281 @@
+"""
+Load an NPPES-style provider file into the HealthcareProvider directory.
+
+Usage:
+    python manage.py import_providers npidata_pfile.csv --zip-centroids 2020_Gaz_zcta_national.txt
+    python manage.py import_providers NPPES_Data_Dissemination.zip --zip-centroids zips.csv \\
+        --taxonomy 207K,2080P0201X,282N --batch-size 10000
+
+The provider file is streamed row by row (from a .csv or straight out of the
+NPPES zip) and upserted by NPI in batches, so memory stays flat however
+large the file is. Providers are placed at the centroid of their practice
+ZIP code from the lookup table: a CSV or tab-separated file with zip,
+latitude, longitude columns (the Census ZCTA gazetteer's GEOID, INTPTLAT and
+INTPTLONG columns also work). Rows without a known ZIP are skipped, and
+providers whose NPI has been deactivated are removed from the directory.
+"""
+import csv
+import functools
+import io
+import os
+import re
+import sys
+import time
+import zipfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, reset_queries, transaction
+from django.utils import timezone
+from chatbot_ocr.geo import geohash
+from chatbot_ocr.models import GEOHASH_PRECISION, HealthcareProvider
+
+# NPPES column names
+NPI = 'NPI'
+ENTITY_TYPE = 'Entity Type Code'
+ORGANIZATION = 'Provider Organization Name (Legal Business Name)'
+LAST_NAME = 'Provider Last Name (Legal Name)'
+FIRST_NAME = 'Provider First Name'
+CREDENTIAL = 'Provider Credential Text'
+ADDRESS = 'Provider First Line Business Practice Location Address'
+CITY = 'Provider Business Practice Location Address City Name'
+STATE = 'Provider Business Practice Location Address State Name'
+POSTAL_CODE = 'Provider Business Practice Location Address Postal Code'
+PHONE = 'Provider Business Practice Location Address Telephone Number'
+DEACTIVATED = 'NPI Deactivation Date'
+REACTIVATED = 'NPI Reactivation Date'
+TAXONOMY = 'Healthcare Provider Taxonomy Code_{}'
+PRIMARY = 'Healthcare Provider Primary Taxonomy Switch_{}'
+TAXONOMY_SLOTS = 15
+
+# Hospital taxonomy groups (NUCC 28x)
+HOSPITAL_TAXONOMIES = ('281', '282', '283', '284', '286')
+
+# Display names for the taxonomies nearby_doctors searches most
+TAXONOMY_NAMES = {
+    '207K00000X': 'Allergist / Immunologist',
+    '207KA0200X': 'Allergist',
+    '207KI0005X': 'Clinical & Laboratory Immunologist',
+    '207RA0201X': 'Allergist / Immunologist (Internal Medicine)',
+    '2080P0201X': 'Pediatric Allergist',
+    '207N00000X': 'Dermatologist',
+    '207Y00000X': 'Otolaryngologist (ENT)',
+    '207RP1001X': 'Pulmonologist',
+    '2080P0214X': 'Pediatric Pulmonologist',
+    '207Q00000X': 'Family Medicine',
+    '207R00000X': 'Internal Medicine',
+    '208000000X': 'Pediatrician',
+    '208D00000X': 'General Practice',
+    '282N00000X': 'General Acute Care Hospital',
+    '282NC0060X': 'Critical Access Hospital',
+    '282NC2000X': "Children's Hospital",
+}
+
+UPDATE_FIELDS = ['kind', 'name', 'specialty', 'taxonomy', 'address', 'city', 'state', 'postal_code', 'phone',
+                 'latitude', 'longitude', 'geohash', 'updated_at']
+
+# NPIs per deactivation DELETE, well under SQLite's bound-variable limit
+DELETE_CHUNK = 500
+
+
+# Words NPPES spells in capitals that should stay that way
+ACRONYMS = {'LLC', 'LLP', 'PC', 'PA', 'PLLC', 'MD', 'DO', 'NP', 'ENT', 'NYU', 'UCLA', 'USA', 'PO'}
+
+
+def _title_word(word):
+    if word.upper() in ACRONYMS:
+        return word.upper()
+    # O'BRIEN -> O'Brien, but CHILDREN'S -> Children's
+    if len(word) > 2 and word[1] == "'":
+        return word[:2].upper() + word[2:].capitalize()
+    return word.capitalize()
+
+
+@functools.lru_cache(maxsize=65536)
+def title(text):
+    """'SMITH-JONES ENT PLLC' -> 'Smith-Jones ENT PLLC', "O'BRIEN" -> "O'Brien"."""
+    return re.sub(r"[A-Za-z][A-Za-z']*", lambda m: _title_word(m.group(0)), ' '.join(text.split()))
+
+
+def format_phone(digits):
+    digits = re.sub(r'\D', '', digits)
+    if len(digits) == 10:
+        return f'({digits[:3]}) {digits[3:6]}-{digits[6:]}'
+    return digits
+
+
+def read_zip_centroids(path):
+    """
+    {5-digit ZIP: (latitude, longitude, geohash)} from a CSV or tab-separated
+    lookup file. Geohashes are computed once per ZIP rather than per provider.
+    """
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        sample = f.readline()
+        f.seek(0)
+        reader = csv.DictReader(f, delimiter='\t' if '\t' in sample else ',')
+        fields = {name.strip().lower(): name for name in reader.fieldnames}
+        try:
+            zip_field = fields.get('zip') or fields['geoid']
+            lat_field = fields.get('latitude') or fields['intptlat']
+            lon_field = fields.get('longitude') or fields['intptlong']
+        except KeyError:
+            raise CommandError(f'{path} needs zip, latitude and longitude columns')
+        centroids = {}
+        for row in reader:
+            latitude, longitude = float(row[lat_field]), float(row[lon_field])
+            centroids[row[zip_field].strip().zfill(5)] = (latitude, longitude,
+                                                          geohash(latitude, longitude, GEOHASH_PRECISION))
+        return centroids
+
+
+class Command(BaseCommand):
+    help = 'Import an NPPES-style provider CSV into the nearby_doctors directory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='NPPES data file (.csv) or dissemination zip')
+        parser.add_argument('--zip-centroids', required=True, help='ZIP code to latitude/longitude lookup file')
+        parser.add_argument('--taxonomy', default='',
+                            help='Comma-separated taxonomy code prefixes to keep (default: all providers)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for path in (options['source'], options['zip_centroids']):
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist')
+        self.centroids = read_zip_centroids(options['zip_centroids'])
+        self.taxonomies = tuple(code.strip().upper() for code in options['taxonomy'].split(',') if code.strip())
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        started = time.monotonic()
+        batch = []
+        deactivated = []
+        read = written = skipped = removed = batches = 0
+        # NPPES rows carry long free-text fields
+        csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+        with self.open_source(options['source']) as f:
+            for row in csv.DictReader(f):
+                read += 1
+                if self.is_deactivated(row):
+                    deactivated.append(row[NPI].strip())
+                else:
+                    provider = self.provider_from_row(row)
+                    if provider is None:
+                        skipped += 1
+                        continue
+                    batch.append(provider)
+                if len(batch) + len(deactivated) >= batch_size:
+                    added, dropped = self.flush(batch, deactivated)
+                    written += added
+                    removed += dropped
+                    batch, deactivated = [], []
+                    batches += 1
+                    if batches % 20 == 0:
+                        elapsed = time.monotonic() - started
+                        self.stdout.write(f'{written} providers ({read / elapsed:.0f} rows/s)...')
+        added, dropped = self.flush(batch, deactivated)
+        written += added
+        removed += dropped
+
+        self.stdout.write('Rebuilding the geohash index...')
+        self.rebuild_index()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {written} providers from {read} rows ({skipped} skipped) and removed {removed} '
+            f'deactivated in {elapsed:.1f}s, {read / max(elapsed, 1e-6):.0f} rows/s'
+        ))
+
+    def open_source(self, source):
+        """Open the provider CSV, or the main npidata file inside an NPPES zip, as a text stream."""
+        if zipfile.is_zipfile(source):
+            archive = zipfile.ZipFile(source)
+            member = next((name for name in archive.namelist() if os.path.basename(name).startswith('npidata_pfile')
+                           and not name.endswith('_fileheader.csv')), None)
+            if member is None:
+                raise CommandError(f'No npidata_pfile CSV found in {source}')
+            return io.TextIOWrapper(archive.open(member), encoding='utf-8', newline='')
+        return open(source, 'r', encoding='utf-8', newline='')
+
+    def primary_taxonomy(self, row):
+        codes = [(row.get(TAXONOMY.format(i)) or '').strip() for i in range(1, TAXONOMY_SLOTS + 1)]
+        for i, code in enumerate(codes, 1):
+            if code and (row.get(PRIMARY.format(i)) or '').strip() == 'Y':
+                return code
+        return next((code for code in codes if code), '')
+
+    def is_deactivated(self, row):
+        return bool((row.get(DEACTIVATED) or '').strip() and not (row.get(REACTIVATED) or '').strip())
+
+    def provider_from_row(self, row):
+        taxonomy = self.primary_taxonomy(row)
+        if self.taxonomies and not taxonomy.startswith(self.taxonomies):
+            return None
+        postal_code = (row.get(POSTAL_CODE) or '').strip()[:5]
+        location = self.centroids.get(postal_code)
+        if location is None:
+            return None
+
+        if row.get(ENTITY_TYPE) == '2':
+            name = title(row.get(ORGANIZATION) or '')
+        else:
+            name = ' '.join(part for part in [title(row.get(FIRST_NAME) or ''), title(row.get(LAST_NAME) or '')]
+                            if part)
+            credential = (row.get(CREDENTIAL) or '').replace('.', '').strip().upper()
+            if credential:
+                name = f'{name}, {credential}'
+        if not name:
+            return None
+
+        latitude, longitude, cell = location
+        return HealthcareProvider(
+            npi=row[NPI].strip(),
+            kind=HealthcareProvider.HOSPITAL if taxonomy.startswith(HOSPITAL_TAXONOMIES) else HealthcareProvider.DOCTOR,
+            name=name[:200],
+            specialty=TAXONOMY_NAMES.get(taxonomy, ''),
+            taxonomy=taxonomy,
+            address=title(row.get(ADDRESS) or '')[:300],
+            city=title(row.get(CITY) or '')[:100],
+            state=(row.get(STATE) or '').strip().upper()[:50],
+            postal_code=postal_code,
+            phone=format_phone(row.get(PHONE) or ''),
+            latitude=latitude,
+            longitude=longitude,
+            geohash=cell,
+        )
+
+    def flush(self, batch, deactivated=()):
+        """
+        Delete deactivated NPIs and upsert a batch by NPI; returns the number
+        of rows written and the number of providers removed.
+        """
+        if not batch and not deactivated:
+            return 0, 0
+        # The same NPI twice in one batch would make the upsert ambiguous; keep the last
+        batch = list({provider.npi: provider for provider in batch}.values())
+        now = timezone.now()
+        for provider in batch:
+            # Upserts skip auto_now on the rows they update
+            provider.updated_at = now
+        removed = 0
+        with transaction.atomic():
+            for start in range(0, len(deactivated), DELETE_CHUNK):
+                removed += HealthcareProvider.objects.filter(
+                    npi__in=deactivated[start:start + DELETE_CHUNK]).delete()[0]
+            if batch:
+                HealthcareProvider.objects.bulk_create(batch, update_conflicts=True, unique_fields=['npi'],
+                                                       update_fields=UPDATE_FIELDS)
+        # With DEBUG on, Django keeps every query's SQL; drop it so memory stays flat
+        reset_queries()
+        return len(batch), removed
+
+    def rebuild_index(self):
+        """Rebuild the geohash index and refresh planner statistics after a bulk load."""
+        table = HealthcareProvider._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute(f'REINDEX {table}')
+                cursor.execute(f'ANALYZE {table}')
+            elif connection.vendor == 'postgresql':
+                cursor.execute(f'REINDEX TABLE {table}')
+                cursor.execute(f'ANALYZE {table}')
+            elif connection.vendor == 'mysql':
+                cursor.execute(f'ANALYZE TABLE {table}')
@@ -0,0 +1,109 @@
+"""
+Load an RxNorm release into the local RxConcept/RxRelation mirror.
+
+Usage:
+    python manage.py import_rxnorm /path/to/RxNorm_full_01062025.zip
+    python manage.py import_rxnorm /path/to/RxNorm_full_01062025/rrf
+
+The RRF files are streamed line by line and written in batches, so multi-GB
+releases import in constant memory. Only RxNorm-sourced (SAB=RXNORM),
+unsuppressed rows are kept. The old mirror is replaced inside one transaction,
+so lookups keep seeing the previous release until the new one is complete and
+a failed import leaves it untouched.
+"""
+import io
+import os
+import time
+import zipfile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from chatbot_ocr.models import RxConcept, RxRelation
+from chatbot_ocr.rxnorm import normalize_name
+
+# Column positions in the RRF files (see the RxNorm technical documentation)
+CONSO_RXCUI, CONSO_RXAUI, CONSO_SAB, CONSO_TTY, CONSO_STR, CONSO_SUPPRESS = 0, 7, 11, 12, 14, 16
+REL_RXCUI1, REL_RXCUI2, REL_RELA, REL_SAB, REL_SUPPRESS = 0, 4, 7, 10, 14
+
+
+class Command(BaseCommand):
+    help = 'Import RxNorm RRF files (RXNCONSO.RRF, RXNREL.RRF) into the local mirror'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='RxNorm release zip, or the directory containing the .RRF files')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not os.path.exists(source):
+            raise CommandError(f'{source} does not exist')
+        self.batch_size = options['batch_size']
+
+        with transaction.atomic():
+            RxRelation.objects.all().delete()
+            RxConcept.objects.all().delete()
+
+            with self.open_rrf(source, 'RXNCONSO.RRF') as f:
+                self.load(f, RxConcept, self.concept_from_row)
+            with self.open_rrf(source, 'RXNREL.RRF') as f:
+                self.load(f, RxRelation, self.relation_from_row)
+
+    def open_rrf(self, source, filename):
+        """Open one RRF file from a release directory or zip as a text stream."""
+        if zipfile.is_zipfile(source):
+            archive = zipfile.ZipFile(source)
+            member = next((name for name in archive.namelist()
+                           if os.path.basename(name).upper() == filename), None)
+            if member is None:
+                raise CommandError(f'{filename} not found in {source}')
+            return io.TextIOWrapper(archive.open(member), encoding='utf-8', newline='')
+        path = os.path.join(source, filename)
+        if not os.path.exists(path):
+            path = os.path.join(source, 'rrf', filename)
+        if not os.path.exists(path):
+            raise CommandError(f'{filename} not found in {source}')
+        return open(path, 'r', encoding='utf-8', newline='')
+
+    def concept_from_row(self, row):
+        if row[CONSO_SAB] != 'RXNORM' or row[CONSO_SUPPRESS] not in ('N', ''):
+            return None
+        return RxConcept(
+            rxaui=row[CONSO_RXAUI],
+            rxcui=row[CONSO_RXCUI],
+            tty=row[CONSO_TTY],
+            name=row[CONSO_STR][:3000],
+            normalized_name=normalize_name(row[CONSO_STR]),
+        )
+
+    def relation_from_row(self, row):
+        if row[REL_SAB] != 'RXNORM' or row[REL_SUPPRESS] not in ('N', '') or not row[REL_RXCUI1] or not row[REL_RXCUI2]:
+            return None
+        return RxRelation(rxcui1=row[REL_RXCUI1], rxcui2=row[REL_RXCUI2], rela=row[REL_RELA])
+
+    def load(self, lines, model, build):
+        """Stream rows into `model` in batches; returns the number of rows written."""
+        started = time.monotonic()
+        batch = []
+        read = written = 0
+        for line in lines:
+            read += 1
+            instance = build(line.rstrip('\r\n').split('|'))
+            if instance is None:
+                continue
+            batch.append(instance)
+            if len(batch) >= self.batch_size:
+                written += self.flush(model, batch)
+                batch = []
+                if written % (self.batch_size * 20) == 0:
+                    self.stdout.write(f'{model.__name__}: {written} rows...')
+        written += self.flush(model, batch)
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{model.__name__}: imported {written} of {read} rows in {elapsed:.1f}s'
+        ))
+        return written
+
+    def flush(self, model, batch):
+        if not batch:
+            return 0
+        model.objects.bulk_create(batch)
+        return len(batch)
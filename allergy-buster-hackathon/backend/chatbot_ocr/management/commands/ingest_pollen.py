@@ -0,0 +1,60 @@
+"""
+Merge pollen and mold forecast files into the gridded store used by allergy_alerts.
+
+Usage:
+    python manage.py ingest_pollen forecast-2025-04-10.csv
+    python manage.py ingest_pollen drop/*.npz --keep-days 10
+
+CSV files are either long (date, latitude, longitude, allergen, value) or
+wide (date, latitude, longitude, tree_pollen, grass_pollen, weed_pollen,
+ragweed, mold). .npz files hold NetCDF-style arrays: time, latitude,
+longitude and one (time, latitude, longitude) variable per allergen. Values
+are counts per cubic metre. Only the days in the files are rewritten;
+running servers pick up the new data within POLLEN_GRID['RELOAD_INTERVAL'].
+"""
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from chatbot_ocr.pollen_grid import PollenGridWriter, grid_spec
+
+
+class Command(BaseCommand):
+    help = 'Merge gridded pollen/mold forecast files (CSV or .npz) into the local pollen grid'
+
+    def add_arguments(self, parser):
+        config = settings.POLLEN_GRID
+        parser.add_argument('files', nargs='+', help='Forecast files (.csv or .npz)')
+        parser.add_argument('--dir', default=config['DIR'], help='Grid store directory')
+        parser.add_argument('--keep-days', type=int, default=config['KEEP_DAYS'],
+                            help='Days to keep, counting back from today')
+
+    def handle(self, *args, **options):
+        for path in options['files']:
+            if not os.path.exists(path):
+                raise CommandError(f'{path} does not exist')
+        try:
+            writer = PollenGridWriter(options['dir'], grid_spec(settings.POLLEN_GRID), options['keep_days'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        started = time.monotonic()
+        stored = 0
+        for path in options['files']:
+            try:
+                if path.endswith('.npz'):
+                    count = writer.add_npz(path)
+                else:
+                    count = writer.add_csv(path)
+            except (KeyError, ValueError) as e:
+                raise CommandError(f'Invalid forecast data in {path}: {e}')
+            self.stdout.write(f'{path}: {count} values')
+            stored += count
+
+        days = [day.isoformat() for day in writer.pending_days()]
+        version = writer.commit()
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Pollen grid version {version}: {stored} values for {len(days)} days "
+            f"({', '.join(days)}) in {elapsed:.1f}s"
+        ))
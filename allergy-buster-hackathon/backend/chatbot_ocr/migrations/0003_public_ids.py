@@ -0,0 +1,43 @@
+import uuid
+from django.db import migrations, models
+
+
+def populate_public_ids(apps, schema_editor):
+    """Give existing rows their own UUID before the unique constraint is added."""
+    for model_name in ('ChatMessage', 'OCRScan'):
+        model = apps.get_model('chatbot_ocr', model_name)
+        rows = list(model.objects.only('pk'))
+        for row in rows:
+            row.public_id = uuid.uuid4()
+        model.objects.bulk_update(rows, ['public_id'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_ocr', '0002_chat_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatmessage',
+            name='public_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrscan',
+            name='public_id',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_public_ids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='chatmessage',
+            name='public_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='ocrscan',
+            name='public_id',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_ocr', '0003_public_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RxRelation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rxcui1', models.CharField(db_index=True, max_length=12)),
+                ('rxcui2', models.CharField(db_index=True, max_length=12)),
+                ('rela', models.CharField(max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RxConcept',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rxaui', models.CharField(max_length=12, unique=True)),
+                ('rxcui', models.CharField(db_index=True, max_length=12)),
+                ('tty', models.CharField(max_length=20)),
+                ('name', models.CharField(max_length=3000)),
+                ('normalized_name', models.CharField(max_length=255)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['normalized_name', 'tty'], name='chatbot_ocr_normali_a38707_idx'), models.Index(fields=['rxcui', 'tty'], name='chatbot_ocr_rxcui_501b4d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 01:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chatbot_ocr', '0005_alert_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthcareProvider',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('npi', models.CharField(max_length=10, unique=True)),
+                ('kind', models.CharField(choices=[('doctor', 'Doctor'), ('hospital', 'Hospital')], default='doctor', max_length=10)),
+                ('name', models.CharField(max_length=200)),
+                ('specialty', models.CharField(blank=True, default='', max_length=200)),
+                ('taxonomy', models.CharField(blank=True, default='', max_length=10)),
+                ('address', models.CharField(blank=True, default='', max_length=300)),
+                ('city', models.CharField(blank=True, default='', max_length=100)),
+                ('state', models.CharField(blank=True, default='', max_length=50)),
+                ('postal_code', models.CharField(blank=True, default='', max_length=10)),
+                ('phone', models.CharField(blank=True, default='', max_length=30)),
+                ('latitude', models.FloatField()),
+                ('longitude', models.FloatField()),
+                ('geohash', models.CharField(db_index=True, max_length=12)),
+                ('accepting_new_patients', models.BooleanField(blank=True, null=True)),
+                ('emergency', models.BooleanField(default=False)),
+                ('rating', models.FloatField(blank=True, null=True)),
+                ('reviews_count', models.IntegerField(default=0)),
+                ('languages', models.JSONField(blank=True, default=list)),
+                ('insurance_accepted', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -1,8 +1,16 @@
 # Models if needed
+import uuid
+from django.contrib.auth.models import User
 from django.db import models
+from .geo import geohash
+
+# Geohash length stored on HealthcareProvider (cells of about 5 m)
+GEOHASH_PRECISION = 9
 
 class OCRScan(models.Model):
     """Stores OCR scan results for future reference."""
+    # Key returned to clients before the row is written (see write_behind.py)
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     raw_text = models.TextField()
     detected_medicines = models.JSONField(null=True, blank=True)
@@ -10,11 +18,37 @@ class OCRScan(models.Model):
     def __str__(self):
         return f"OCR Scan on {self.uploaded_at}"
 
+class ChatSession(models.Model):
+    """A conversation; older turns are folded into a running summary."""
+    session_key = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    summary = models.TextField(blank=True, default='')
+    # Id of the newest ChatMessage already folded into the summary
+    summarized_through = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Chat session {self.session_key}"
+
 class ChatMessage(models.Model):
     """Stores chat interactions for history."""
+    # Key returned to clients before the row is written (see write_behind.py)
+    public_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     user_message = models.TextField()
     ai_reply = models.TextField()
+    session = models.ForeignKey(
+        ChatSession,
+        on_delete=models.CASCADE,
+        related_name='messages',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['session', 'id']),  # recent turns of a session
+        ]
 
     def __str__(self):
         return f"Chat @ {self.created_at}"
@@ -26,4 +60,104 @@ class ChatMessage(models.Model):
 
     @property
     def response(self):
-        return self.ai_reply
\ No newline at end of file
+        return self.ai_reply
+
+class RxConcept(models.Model):
+    """A concept name (atom) from the RxNorm RXNCONSO.RRF release file."""
+    rxaui = models.CharField(max_length=12, unique=True)
+    rxcui = models.CharField(max_length=12, db_index=True)
+    tty = models.CharField(max_length=20)
+    name = models.CharField(max_length=3000)
+    # Lower-cased, whitespace-collapsed name used for lookups (see rxnorm.py)
+    normalized_name = models.CharField(max_length=255)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['normalized_name', 'tty']),  # name -> RxCUI
+            models.Index(fields=['rxcui', 'tty']),  # related concepts by type
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.rxcui}, {self.tty})"
+
+class RxRelation(models.Model):
+    """A relationship between two RxNorm concepts from RXNREL.RRF."""
+    rxcui1 = models.CharField(max_length=12, db_index=True)
+    rxcui2 = models.CharField(max_length=12, db_index=True)
+    rela = models.CharField(max_length=100)
+
+    def __str__(self):
+        return f"{self.rxcui2} {self.rela} {self.rxcui1}"
+
+class AlertSubscription(models.Model):
+    """Where a user wants their morning allergy alerts computed for."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='alert_subscription')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Alerts for {self.user_id} at {self.latitude}, {self.longitude}"
+
+class AlertOutbox(models.Model):
+    """A computed alert waiting to be delivered (see compute_alerts)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='alert_outbox')
+    date = models.DateField()
+    alert_type = models.CharField(max_length=20)
+    severity = models.CharField(max_length=20)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # Re-running a day's job does not duplicate alerts
+            models.UniqueConstraint(fields=['user', 'date', 'alert_type'], name='unique_daily_alert'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'sent_at']),  # unsent alerts for a day
+        ]
+
+    def __str__(self):
+        return f"{self.alert_type} alert for {self.user_id} on {self.date}"
+
+class HealthcareProvider(models.Model):
+    """A doctor or hospital in the nearby_doctors directory."""
+    DOCTOR = 'doctor'
+    HOSPITAL = 'hospital'
+    KIND_CHOICES = [
+        (DOCTOR, 'Doctor'),
+        (HOSPITAL, 'Hospital'),
+    ]
+
+    # NPPES National Provider Identifier; the upsert key for imports
+    npi = models.CharField(max_length=10, unique=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=DOCTOR)
+    name = models.CharField(max_length=200)
+    specialty = models.CharField(max_length=200, blank=True, default='')
+    # NUCC healthcare provider taxonomy code, e.g. 207K00000X (Allergy & Immunology)
+    taxonomy = models.CharField(max_length=10, blank=True, default='')
+    address = models.CharField(max_length=300, blank=True, default='')
+    city = models.CharField(max_length=100, blank=True, default='')
+    state = models.CharField(max_length=50, blank=True, default='')
+    postal_code = models.CharField(max_length=10, blank=True, default='')
+    phone = models.CharField(max_length=30, blank=True, default='')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    # Precision-9 geohash of (latitude, longitude); radius searches scan prefix ranges of it
+    geohash = models.CharField(max_length=12, db_index=True)
+    accepting_new_patients = models.BooleanField(null=True, blank=True)
+    emergency = models.BooleanField(default=False)
+    rating = models.FloatField(null=True, blank=True)
+    reviews_count = models.IntegerField(default=0)
+    languages = models.JSONField(default=list, blank=True)
+    insurance_accepted = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        self.geohash = geohash(self.latitude, self.longitude, GEOHASH_PRECISION)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.name} ({self.npi})"
@@ -0,0 +1,308 @@
+"""
+Gridded pollen and mold forecasts for allergy_alerts.
+Forecast drops (long or wide CSV, or NetCDF-style .npz arrays) are snapped
+onto a regular latitude/longitude grid and stored as one float32 .npy file
+per day, shaped (rows, cols, allergens), under POLLEN_GRID['DIR']. Readers
+memory-map the day files, so a lookup is an index into the page cache: snap
+the coordinate to a cell, pick the day, read one row of five floats.
+
+A drop only rewrites the days it covers. Each day file is written to a
+temporary name and renamed into place, then manifest.json is replaced the
+same way; readers notice the new manifest version and swap in a fresh
+snapshot, while requests already holding the old one keep reading the old
+files.
+"""
+import csv
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+import numpy as np
+from django.conf import settings
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+ALLERGENS = ['tree pollen', 'grass pollen', 'weed pollen', 'ragweed', 'mold']
+POLLEN_TYPES = ['tree pollen', 'grass pollen', 'weed pollen', 'ragweed']
+
+# Counts (grains or spores per cubic metre) at which each allergen becomes
+# moderate, high and very high, after the National Allergy Bureau scale
+THRESHOLDS = {
+    'tree pollen': (15, 90, 1500),
+    'grass pollen': (5, 20, 200),
+    'weed pollen': (10, 50, 500),
+    'ragweed': (10, 50, 500),
+    'mold': (6500, 13000, 50000),
+}
+LEVELS = ['low', 'moderate', 'high', 'very high']
+
+MANIFEST = 'manifest.json'
+
+# A forecast value at one grid cell: `cell` identifies the cell and the data
+# version (for cache keys), `readings` maps allergen to count
+PollenSample = namedtuple('PollenSample', ['cell', 'readings'])
+
+
+def allergen_key(name):
+    """Match feed column and variable names like 'Tree_Pollen' to ALLERGENS."""
+    name = ' '.join(name.lower().replace('_', ' ').replace('-', ' ').split())
+    return name if name in ALLERGENS else None
+
+
+def level(allergen, value):
+    """The LEVELS name for a count of an allergen."""
+    return LEVELS[sum(value >= threshold for threshold in THRESHOLDS[allergen])]
+
+
+class GridSpec:
+    """
+    A regular grid of `resolution` degree cells whose south-west corner is
+    (south, west). Row 0 is the southernmost band.
+    """
+
+    def __init__(self, south, west, north, east, resolution):
+        self.south, self.west, self.north, self.east = south, west, north, east
+        self.resolution = resolution
+        self.rows = int(round((north - south) / resolution))
+        self.cols = int(round((east - west) / resolution))
+
+    def as_dict(self):
+        return {'south': self.south, 'west': self.west, 'north': self.north, 'east': self.east,
+                'resolution': self.resolution}
+
+    def __eq__(self, other):
+        return isinstance(other, GridSpec) and self.as_dict() == other.as_dict()
+
+    def cell(self, latitude, longitude):
+        """(row, col) of the cell containing a coordinate, or None outside the grid."""
+        if not (self.south <= latitude <= self.north and self.west <= longitude <= self.east):
+            return None
+        row = min(int((latitude - self.south) / self.resolution), self.rows - 1)
+        col = min(int((longitude - self.west) / self.resolution), self.cols - 1)
+        return row, col
+
+    def cells(self, latitudes, longitudes):
+        """Vectorized cell(): row and col arrays, plus a mask of points inside the grid."""
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        inside = ((latitudes >= self.south) & (latitudes <= self.north) &
+                  (longitudes >= self.west) & (longitudes <= self.east))
+        rows = np.minimum(((latitudes - self.south) / self.resolution).astype(np.int64), self.rows - 1)
+        cols = np.minimum(((longitudes - self.west) / self.resolution).astype(np.int64), self.cols - 1)
+        return rows, cols, inside
+
+
+class PollenGrid:
+    """
+    A read-only snapshot of the store: the manifest plus a memory map of
+    every day file it lists. Snapshots are never modified after loading.
+    """
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.version = manifest['version']
+        self.spec = GridSpec(**manifest['grid'])
+        self.allergens = manifest['allergens']
+        self.days = {date.fromisoformat(day): np.load(os.path.join(directory, filename), mmap_mode='r')
+                     for day, filename in manifest['days'].items()}
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            return cls(directory, json.load(f))
+
+    def sample(self, latitude, longitude, day):
+        """The PollenSample for a coordinate and date, or None if there is no forecast for it."""
+        grid = self.days.get(day)
+        cell = self.spec.cell(latitude, longitude)
+        if grid is None or cell is None:
+            return None
+        values = grid[cell[0], cell[1]]
+        readings = {allergen: float(value) for allergen, value in zip(self.allergens, values)
+                    if not math.isnan(value)}
+        if not readings:
+            return None
+        return PollenSample((self.version, day.isoformat()) + cell, readings)
+
+
+class PollenGridWriter:
+    """
+    Merges forecast drops into the store. Day files touched by a drop are
+    loaded into memory, updated, and written back atomically; days outside
+    the retention window are removed.
+    """
+
+    def __init__(self, directory, spec, keep_days=7):
+        self.directory = directory
+        self.spec = spec
+        self.keep_days = keep_days
+        self.manifest = {'version': 0, 'grid': spec.as_dict(), 'allergens': ALLERGENS, 'days': {}}
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+            if GridSpec(**self.manifest['grid']) != spec:
+                raise ValueError(f"{directory} holds a {self.manifest['grid']} grid, not {spec.as_dict()}")
+        self._pending = {}
+
+    def day(self, day):
+        """The in-memory array for a day, loaded from its file or filled with NaN."""
+        if day not in self._pending:
+            filename = self.manifest['days'].get(day.isoformat())
+            if filename:
+                self._pending[day] = np.load(os.path.join(self.directory, filename))
+            else:
+                self._pending[day] = np.full((self.spec.rows, self.spec.cols, len(ALLERGENS)), np.nan,
+                                             dtype=np.float32)
+        return self._pending[day]
+
+    def pending_days(self):
+        """Dates changed since the last commit, oldest first."""
+        return sorted(self._pending)
+
+    def add(self, day, allergen, latitudes, longitudes, values):
+        """Set an allergen's values at the cells containing the given points; returns points kept."""
+        rows, cols, inside = self.spec.cells(latitudes, longitudes)
+        values = np.asarray(values, dtype=np.float32)
+        self.day(day)[rows[inside], cols[inside], ALLERGENS.index(allergen)] = values[inside]
+        return int(inside.sum())
+
+    def add_csv(self, path, chunk_size=100000):
+        """
+        Read a long (date, latitude, longitude, allergen, value) or wide
+        (date, latitude, longitude, tree_pollen, ...) CSV in chunks; returns
+        the number of values stored.
+        """
+        stored = 0
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            long_format = 'allergen' in reader.fieldnames
+            wide = {column: allergen_key(column) for column in reader.fieldnames if allergen_key(column)}
+            if not long_format and not wide:
+                raise ValueError(f'{path} has neither an allergen column nor allergen columns')
+            chunk = {}
+            for i, row in enumerate(reader, 1):
+                if long_format:
+                    items = [(allergen_key(row['allergen']), row['value'])]
+                else:
+                    items = [(allergen, row[column]) for column, allergen in wide.items()]
+                for allergen, value in items:
+                    if allergen is None or value in ('', None):
+                        continue
+                    points = chunk.setdefault((date.fromisoformat(row['date']), allergen), ([], [], []))
+                    points[0].append(float(row['latitude']))
+                    points[1].append(float(row['longitude']))
+                    points[2].append(float(value))
+                if i % chunk_size == 0:
+                    stored += self._add_chunk(chunk)
+                    chunk = {}
+            stored += self._add_chunk(chunk)
+        return stored
+
+    def _add_chunk(self, chunk):
+        return sum(self.add(day, allergen, *points) for (day, allergen), points in chunk.items())
+
+    def add_npz(self, path):
+        """
+        Read NetCDF-style arrays: `time` (ISO dates), `latitude` and
+        `longitude` axes, and one (time, latitude, longitude) variable per
+        allergen. Returns the number of values stored.
+        """
+        stored = 0
+        with np.load(path) as data:
+            days = [date.fromisoformat(str(day)[:10]) for day in data['time']]
+            latitudes, longitudes = np.meshgrid(data['latitude'], data['longitude'], indexing='ij')
+            for variable in data.files:
+                allergen = allergen_key(variable)
+                if allergen is None:
+                    continue
+                values = data[variable]
+                for t, day in enumerate(days):
+                    present = ~np.isnan(values[t])
+                    stored += self.add(day, allergen, latitudes[present], longitudes[present], values[t][present])
+        return stored
+
+    def commit(self, today=None):
+        """Write the changed days and a new manifest; returns the new version."""
+        today = today or date.today()
+        oldest = today - timedelta(days=self.keep_days - 1)
+        os.makedirs(self.directory, exist_ok=True)
+        for day, grid in self._pending.items():
+            if day < oldest:
+                continue
+            filename = f'{day.isoformat()}.npy'
+            temporary = os.path.join(self.directory, f'.{filename}.tmp')
+            with open(temporary, 'wb') as f:
+                np.save(f, grid)
+            os.replace(temporary, os.path.join(self.directory, filename))
+            self.manifest['days'][day.isoformat()] = filename
+        self._pending = {}
+
+        expired = [day for day in self.manifest['days'] if date.fromisoformat(day) < oldest]
+        for day in expired:
+            filename = self.manifest['days'].pop(day)
+            # Readers with an older snapshot keep the file open until they let go of it
+            os.remove(os.path.join(self.directory, filename))
+
+        self.manifest['version'] += 1
+        self.manifest['days'] = dict(sorted(self.manifest['days'].items()))
+        temporary = os.path.join(self.directory, f'.{MANIFEST}.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temporary, os.path.join(self.directory, MANIFEST))
+        return self.manifest['version']
+
+
+def grid_spec(config):
+    return GridSpec(*config['BOUNDS'], config['RESOLUTION'])
+
+
+_grid = None
+_grid_checked = None
+_grid_stat = None
+_grid_lock = threading.Lock()
+
+
+def get_pollen_grid():
+    """
+    Return the current PollenGrid snapshot, or None if the store is disabled
+    or empty. The manifest is checked for changes at most every
+    RELOAD_INTERVAL seconds; a reload happens on one thread while the others
+    keep using the previous snapshot.
+    """
+    global _grid, _grid_checked, _grid_stat
+    config = settings.POLLEN_GRID
+    if not config.get('ENABLED'):
+        return None
+    if _grid_checked is not None and time.monotonic() - _grid_checked < config.get('RELOAD_INTERVAL', 60):
+        return _grid
+    if not _grid_lock.acquire(blocking=False):
+        return _grid
+    try:
+        _grid_checked = time.monotonic()
+        path = os.path.join(config['DIR'], MANIFEST)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            _grid, _grid_stat = None, None
+            return None
+        # The manifest is replaced, never rewritten, so a new inode means a new version
+        if (stat.st_ino, stat.st_mtime_ns) != _grid_stat:
+            grid = PollenGrid.load(config['DIR'])
+            _grid, _grid_stat = grid, (stat.st_ino, stat.st_mtime_ns)
+            logger.info(f"Pollen grid version {grid.version} loaded with {len(grid.days)} days "
+                        f"on a {grid.spec.rows}x{grid.spec.cols} grid")
+        return _grid
+    finally:
+        _grid_lock.release()
+
+
+def pollen_sample(latitude, longitude, day):
+    """The PollenSample for a coordinate and date, or None if there is no forecast."""
+    grid = get_pollen_grid()
+    return grid.sample(latitude, longitude, day) if grid is not None else None
@@ -0,0 +1,328 @@
+"""
+LLM provider backends for the chatbot_ocr app.
+Defines a small provider interface with Gemini and Mistral implementations and
+an offline FakeProvider for load tests and benchmarks. The primary and
+secondary providers are chosen in settings.LLM_PROVIDERS.
+"""
+import json
+import logging
+import math
+import os
+import random
+import threading
+import time
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .rate_limit import estimate_tokens, provider_slot
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+API_KEYS_FILE = os.path.join(os.path.dirname(__file__), '..', 'core_api', 'APIKeys.txt')
+
+
+class LLMProviderError(Exception):
+    """Raised when an LLM provider answers with a non-success status."""
+
+
+_api_keys = None
+
+
+def load_api_keys(path=API_KEYS_FILE):
+    """
+    Load API keys from APIKeys.txt ("Name: value" per line).
+    The file is read once and cached.
+    """
+    global _api_keys
+    if _api_keys is None:
+        keys = {}
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        keys[key.strip()] = value.strip()
+        except Exception as e:
+            logger.error(f"Error loading API keys: {e}")
+        _api_keys = keys
+    return _api_keys
+
+
+class LLMProvider:
+    """
+    Base class for LLM backends.
+    Subclasses implement `_complete`; `complete` wraps it in the provider's
+    rate limiter slot (see rate_limit.py).
+    """
+    name = None
+    supports_streaming = False
+    supports_json = False
+
+    def __init__(self, name=None):
+        if name:
+            self.name = name
+
+    def is_available(self):
+        """Whether the provider is configured well enough to be called."""
+        return True
+
+    def complete(self, prompt, temperature=0.7, max_tokens=800, json_mode=False):
+        """
+        Return the generated text for a prompt. Raises on failure.
+        `json_mode` asks for a JSON reply; only honoured if `supports_json`.
+        """
+        with provider_slot(self.name, estimate_tokens(prompt, max_tokens)):
+            return self._complete(prompt, temperature, max_tokens, json_mode and self.supports_json)
+
+    def stream(self, prompt, temperature=0.7, max_tokens=800):
+        """Yield the reply in chunks. Defaults to a single chunk."""
+        yield self.complete(prompt, temperature, max_tokens)
+
+    def _complete(self, prompt, temperature, max_tokens, json_mode=False):
+        raise NotImplementedError
+
+
+class APIKeyProvider(LLMProvider):
+    """Provider authenticated with a key from the environment or APIKeys.txt."""
+    key_name = None
+    env_var = None
+    placeholder = None
+
+    def __init__(self, name=None, api_key=None, timeout=30):
+        super().__init__(name)
+        self.api_key = api_key or os.getenv(self.env_var, '') or load_api_keys().get(self.key_name, '')
+        self.timeout = timeout
+
+    def is_available(self):
+        return bool(self.api_key) and self.api_key != self.placeholder
+
+
+class GeminiProvider(APIKeyProvider):
+    """Google Gemini via the generateContent REST API."""
+    name = 'gemini'
+    key_name = 'GeminiAPIKey'
+    env_var = 'GEMINI_API_KEY'
+    placeholder = 'YOUR_GEMINI_API_KEY_HERE'
+    base_url = "https://generativelanguage.googleapis.com/v1beta/models"
+
+    def __init__(self, name=None, api_key=None, model='gemini-pro', timeout=30, json_output=False):
+        super().__init__(name, api_key, timeout)
+        self.model = model
+        # responseMimeType needs a Gemini 1.5 or newer model
+        self.supports_json = json_output
+
+    def _complete(self, prompt, temperature, max_tokens, json_mode=False):
+        # Add the API key as a query parameter
+        url = f"{self.base_url}/{self.model}:generateContent?key={self.api_key}"
+        headers = {
+            "Content-Type": "application/json"
+        }
+        data = {
+            "contents": [
+                {
+                    "parts": [
+                        {
+                            "text": prompt
+                        }
+                    ]
+                }
+            ],
+            "generationConfig": {
+                "temperature": temperature,
+                "maxOutputTokens": max_tokens,
+                "topP": 0.95
+            }
+        }
+        if json_mode:
+            data["generationConfig"]["responseMimeType"] = "application/json"
+
+        response = requests.post(url, headers=headers, json=data, timeout=self.timeout)
+
+        if response.status_code != 200:
+            raise LLMProviderError(f'Gemini returned status {response.status_code}')
+        response_data = response.json()
+        return response_data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', 'No response from Gemini')
+
+
+class MistralProvider(APIKeyProvider):
+    """Mistral AI via the chat completions REST API."""
+    name = 'mistral'
+    key_name = 'MistralAPIKey'
+    env_var = 'MISTRAL_API_KEY'
+    url = 'https://api.mistral.ai/v1/chat/completions'
+
+    def __init__(self, name=None, api_key=None, model='mistral-small', max_tokens=100, timeout=30):
+        super().__init__(name, api_key, timeout)
+        self.model = model
+        self.max_tokens = max_tokens
+
+    def complete(self, prompt, temperature=0.7, max_tokens=800, json_mode=False):
+        # Mistral replies are capped at the provider's own max_tokens
+        return super().complete(prompt, temperature, min(max_tokens, self.max_tokens), json_mode)
+
+    def _complete(self, prompt, temperature, max_tokens, json_mode=False):
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        data = {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': max_tokens
+        }
+
+        response = requests.post(self.url, headers=headers, json=data, timeout=self.timeout)
+
+        if response.status_code != 200:
+            raise LLMProviderError('Could not get response from Mistral AI')
+        return response.json().get('choices', [{}])[0].get('message', {}).get('content', 'No response from AI')
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline, deterministic provider for load tests, benchmarks and CI.
+
+    Options:
+    - latency: dict with 'distribution' ('constant', 'uniform' or 'lognormal')
+      and its parameters ('value'; 'low'/'high'; 'median'/'sigma'), in seconds
+    - error_rate: fraction of calls that raise LLMProviderError
+    - seed: seed for the latency and error draws
+    - responses: list of {'keywords': [...], 'text': ...}; the first entry whose
+      keywords all appear in the prompt is returned, else the default reply.
+      An entry may also have a 'json' object, returned in JSON mode
+    - json_output: whether the provider honours JSON mode
+    - responses_file: JSON file with the same structure as `responses`
+    - chunk_size / chunk_delay: word chunking and delay used by `stream`
+    """
+    name = 'fake'
+    supports_streaming = True
+
+    DEFAULT_REPLY = (
+        "## Summary\n"
+        "- This is a simulated response from the offline test provider.\n"
+        "## Recommendations\n"
+        "- Consult a healthcare professional for personal medical advice.\n"
+    )
+
+    DEFAULT_RESPONSES = [
+        {
+            'keywords': ['allergist', 'symptoms'],
+            'text': (
+                "## Possible Allergic Conditions\n"
+                "- Allergic rhinitis (hay fever)\n"
+                "- Allergic conjunctivitis\n"
+                "## Recommended Next Steps\n"
+                "- Skin prick or specific IgE testing\n"
+                "- Consultation with an allergist\n"
+                "## Immediate Relief Suggestions\n"
+                "- Oral antihistamines such as cetirizine or loratadine\n"
+                "- Saline nasal rinse\n"
+                "## Precautions\n"
+                "- Seek emergency care for difficulty breathing or facial swelling\n"
+                "This is not a medical diagnosis. Please consult a healthcare professional.\n"
+            ),
+        },
+        {
+            'keywords': ['nutritionist', 'allergies'],
+            'text': (
+                "## Foods to Avoid\n"
+                "- Products listing the allergen or its derivatives on the label\n"
+                "## Safe Alternatives\n"
+                "- Oat or rice milk instead of dairy milk\n"
+                "- Sunflower seed butter instead of peanut butter\n"
+                "## 3-Day Meal Plan\n"
+                "- Day 1: oatmeal with berries, quinoa salad, grilled chicken with rice\n"
+                "## Shopping List\n"
+                "- Fresh fruit and vegetables, rice, quinoa, chicken\n"
+                "## Eating Out Tips\n"
+                "- Tell staff about your allergies before ordering\n"
+            ),
+        },
+        {
+            'keywords': ['pharmacist', 'interactions'],
+            'text': "No known interaction between these medications was found in the simulated data.",
+        },
+    ]
+
+    def __init__(self, name=None, latency=None, error_rate=0.0, seed=0, responses=None,
+                 responses_file=None, chunk_size=8, chunk_delay=0.0, json_output=False):
+        super().__init__(name)
+        self.supports_json = json_output
+        self.latency = latency or {'distribution': 'constant', 'value': 0.0}
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        if responses_file:
+            with open(responses_file, 'r') as f:
+                responses = json.load(f)
+        self.responses = responses if responses is not None else self.DEFAULT_RESPONSES
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample_latency(self):
+        """Draw one latency (seconds) from the configured distribution."""
+        distribution = self.latency.get('distribution', 'constant')
+        with self._lock:
+            if distribution == 'uniform':
+                return self._random.uniform(self.latency.get('low', 0.0), self.latency.get('high', 0.0))
+            if distribution == 'lognormal':
+                median = self.latency.get('median', 0.5)
+                return self._random.lognormvariate(math.log(median), self.latency.get('sigma', 0.5))
+            return self.latency.get('value', 0.0)
+
+    def _should_fail(self):
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def reply_for(self, prompt, json_mode=False):
+        """Return the canned reply for a prompt."""
+        prompt_lower = prompt.lower()
+        for entry in self.responses:
+            if all(keyword in prompt_lower for keyword in entry.get('keywords', [])):
+                if json_mode and 'json' in entry:
+                    return json.dumps(entry['json'])
+                return entry['text']
+        return self.DEFAULT_REPLY
+
+    def _complete(self, prompt, temperature, max_tokens, json_mode=False):
+        time.sleep(self.sample_latency())
+        if self._should_fail():
+            raise LLMProviderError('Simulated provider error')
+        return self.reply_for(prompt, json_mode)
+
+    def stream(self, prompt, temperature=0.7, max_tokens=800):
+        """Yield the canned reply in word chunks after the sampled first-token latency."""
+        with provider_slot(self.name, estimate_tokens(prompt, max_tokens)):
+            time.sleep(self.sample_latency())
+            if self._should_fail():
+                raise LLMProviderError('Simulated provider error')
+            words = self.reply_for(prompt).split(' ')
+            for start in range(0, len(words), self.chunk_size):
+                if start and self.chunk_delay:
+                    time.sleep(self.chunk_delay)
+                chunk = ' '.join(words[start:start + self.chunk_size])
+                yield chunk if start + self.chunk_size >= len(words) else chunk + ' '
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    """
+    Return the shared provider instance registered under `name` in
+    settings.LLM_PROVIDERS['BACKENDS'].
+    """
+    with _providers_lock:
+        if name not in _providers:
+            config = settings.LLM_PROVIDERS['BACKENDS'][name]
+            provider_class = import_string(config['CLASS'])
+            _providers[name] = provider_class(name=name, **config.get('OPTIONS', {}))
+        return _providers[name]
+
+
+def get_providers():
+    """Return the configured (primary, secondary) providers."""
+    return (get_provider(settings.LLM_PROVIDERS['PRIMARY']),
+            get_provider(settings.LLM_PROVIDERS['SECONDARY']))
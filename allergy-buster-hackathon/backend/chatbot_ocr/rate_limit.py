@@ -0,0 +1,191 @@
+"""
+Client-side limits for LLM provider calls.
+Each provider gets a cap on in-flight requests, token buckets for requests and
+estimated tokens per minute, and a short bounded queue with a deadline. Work
+that cannot be admitted in time is shed with RateLimitExceeded instead of
+being sent upstream to fail with a 429.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider call is shed because the limiter is at capacity."""
+
+    def __init__(self, provider, reason, retry_after=None):
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"{provider} is over capacity ({reason})")
+
+
+def estimate_tokens(text, max_tokens=0):
+    """
+    Rough token estimate for a call: about four characters per prompt token
+    plus the completion budget.
+    """
+    return len(text) // 4 + 1 + max_tokens
+
+
+class TokenBucket:
+    """
+    Classic token bucket refilled continuously at `rate_per_minute`.
+    Not thread-safe on its own; ProviderLimiter guards it with its lock.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now=None):
+        """Seconds until `amount` tokens are available (0 if available now)."""
+        self._refill(now if now is not None else time.monotonic())
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        """Remove `amount` tokens; callers check `delay` first."""
+        self.tokens -= amount
+
+
+class ProviderLimiter:
+    """
+    Admission control for a single provider.
+    A call holds a slot for its whole duration; use `slot()` as a context manager.
+    """
+
+    def __init__(self, name, max_concurrent=8, requests_per_minute=60,
+                 tokens_per_minute=100000, max_queue=16, queue_timeout=2.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.in_flight = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_settings(cls, name, config):
+        """Build a limiter from one entry of the LLM_RATE_LIMITS settings dict."""
+        return cls(
+            name,
+            max_concurrent=config.get('MAX_CONCURRENT', 8),
+            requests_per_minute=config.get('REQUESTS_PER_MINUTE', 60),
+            tokens_per_minute=config.get('TOKENS_PER_MINUTE', 100000),
+            max_queue=config.get('MAX_QUEUE', 16),
+            queue_timeout=config.get('QUEUE_TIMEOUT', 2.0),
+        )
+
+    def _admission_delay(self, estimated_tokens, now):
+        """Seconds until both buckets can admit the call."""
+        return max(self.request_bucket.delay(1, now), self.token_bucket.delay(estimated_tokens, now))
+
+    def _admit(self, estimated_tokens):
+        self.request_bucket.take(1)
+        self.token_bucket.take(estimated_tokens)
+        self.in_flight += 1
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Wait for a slot, for at most `queue_timeout` seconds.
+        Raises RateLimitExceeded straight away if the queue is full or the
+        buckets cannot refill before the deadline.
+        """
+        if estimated_tokens > self.token_bucket.capacity:
+            raise RateLimitExceeded(self.name, 'request larger than token budget')
+
+        with self._cond:
+            now = time.monotonic()
+            deadline = now + self.queue_timeout
+            if self.in_flight < self.max_concurrent and self._admission_delay(estimated_tokens, now) == 0:
+                self._admit(estimated_tokens)
+                return
+            if self.waiting >= self.max_queue:
+                raise RateLimitExceeded(self.name, 'queue full', retry_after=self.queue_timeout)
+
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    remaining = deadline - now
+                    if self.in_flight < self.max_concurrent:
+                        delay = self._admission_delay(estimated_tokens, now)
+                        if delay == 0:
+                            self._admit(estimated_tokens)
+                            return
+                        if delay > remaining:
+                            # The buckets will not refill in time; shed now rather than at the deadline
+                            raise RateLimitExceeded(self.name, 'rate limit', retry_after=delay)
+                        wait_for = delay
+                    else:
+                        if remaining <= 0:
+                            raise RateLimitExceeded(self.name, 'too many concurrent requests',
+                                                    retry_after=self.queue_timeout)
+                        wait_for = remaining
+                    self._cond.wait(wait_for)
+            finally:
+                self.waiting -= 1
+
+    def release(self):
+        """Free the slot taken by `acquire`."""
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self, estimated_tokens=0):
+        """Hold a slot for the duration of the with-block."""
+        self.acquire(estimated_tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name):
+    """
+    Return the shared limiter for a provider, built from settings.LLM_RATE_LIMITS.
+    Providers without an entry are not limited and get None.
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            config = getattr(settings, 'LLM_RATE_LIMITS', {}).get(name)
+            _limiters[name] = ProviderLimiter.from_settings(name, config) if config else None
+        return _limiters[name]
+
+
+@contextmanager
+def provider_slot(name, estimated_tokens=0):
+    """Hold a slot on the named provider's limiter, if it has one."""
+    limiter = get_limiter(name)
+    if limiter is None:
+        yield
+        return
+    try:
+        limiter.acquire(estimated_tokens)
+    except RateLimitExceeded as e:
+        logger.warning(f"Shedding {name} call: {e.reason}")
+        raise
+    try:
+        yield
+    finally:
+        limiter.release()
@@ -0,0 +1,157 @@
+"""
+Structured parsing of LLM replies into named sections.
+A ResponseSchema lists the sections an endpoint expects. Providers that
+support it are asked for a JSON object with those keys; any other reply is
+parsed as markdown (headings and bullet or numbered lists) in a single pass.
+"""
+import json
+import logging
+import re
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# One alternative per line shape; the named group that matched tells them apart.
+LINE_RE = re.compile(r"""
+    ^[ \t]*(?:
+        \#{1,6}[ \t]+(?P<markdown>.+?)[ \t#]*                        # ## Heading
+      | \*\*(?P<bold>[^*\n]+?)\*\*[ \t]*:?                           # **Heading** / **Heading:**
+      | \d{1,2}[.)][ \t]+\*\*(?P<numbered_bold>[^*\n]+?)
+        (?::\*\*|\*\*[ \t]*:)                                         # 1. **Heading:**
+      | (?P<numbered>\d{1,2}[.)][ \t]+)?(?P<label>[A-Za-z][^\n:*]{0,60}):  # Heading: / 1. Heading:
+      | (?:[-*+•]|\d{1,3}[.)])[ \t]+(?P<item>.+?)                # - item / * item / 1. item
+    )[ \t]*$
+""", re.MULTILINE | re.VERBOSE)
+
+JSON_FENCE_RE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*```\s*$', re.DOTALL)
+
+
+class ResponseSchema:
+    """
+    The sections expected in a reply.
+
+    `sections` maps each output key to a regex of heading keywords. A heading
+    belongs to the section whose keywords match earliest in it, so
+    "Safe alternatives to foods to avoid" is 'alternatives', not 'avoid'.
+    """
+
+    def __init__(self, sections, titles=None):
+        self.keys = list(sections)
+        self.titles = titles or {key: key.replace('_', ' ').capitalize() for key in self.keys}
+        self._heading_re = re.compile(
+            '|'.join(f'(?P<{key}>{pattern})' for key, pattern in sections.items()),
+            re.IGNORECASE,
+        )
+
+    def classify(self, heading):
+        """Return the section key for a heading, or None."""
+        match = self._heading_re.search(heading)
+        return match.lastgroup if match else None
+
+    def json_prompt(self, prompt):
+        """Append instructions for a JSON reply to a prompt."""
+        keys = ', '.join(f'"{key}" ({self.titles[key]})' for key in self.keys)
+        return (f"{prompt}\n\nRespond only with a JSON object whose keys are {keys}; "
+                f"each value is a list of short strings.")
+
+    def empty(self):
+        return {key: [] for key in self.keys}
+
+    def parse_markdown(self, text):
+        """
+        Collect the bullet and numbered items under each recognised heading.
+        A bulleted line is always an item, even when it is all bold; only an
+        unbulleted bold line or a numbered bold line ending in a colon can
+        start a section.
+        """
+        sections = self.empty()
+        current = None
+        for match in LINE_RE.finditer(text):
+            item = match.group('item')
+            if item is not None:
+                if current is not None:
+                    sections[current].append(item.replace('**', '').strip())
+                continue
+            heading = (match.group('markdown') or match.group('bold') or match.group('numbered_bold')
+                       or match.group('label'))
+            key = self.classify(heading)
+            if key is not None:
+                current = key
+            elif match.group('markdown') is not None:
+                # An unrelated top-level heading ends the current section
+                current = None
+            elif current is not None and (match.group('label') is None or match.group('numbered')):
+                # Sub-headings such as "**Day 1**" stay in the current section as items
+                sections[current].append(heading.strip())
+        return sections
+
+    def parse_json(self, text):
+        """Return the sections of a JSON reply, or None if it isn't one."""
+        fenced = JSON_FENCE_RE.match(text)
+        candidate = fenced.group(1) if fenced else text.strip()
+        if not candidate.startswith('{'):
+            return None
+        try:
+            data = json.loads(candidate)
+        except ValueError:
+            return None
+        if not isinstance(data, dict):
+            return None
+        sections = self.empty()
+        for key in self.keys:
+            value = data.get(key, [])
+            if isinstance(value, str):
+                value = [value]
+            if isinstance(value, list):
+                sections[key] = [str(v).strip() for v in value if str(v).strip()]
+        return sections
+
+    def to_markdown(self, sections):
+        """Render sections as markdown, for showing a JSON reply to users."""
+        return '\n'.join(
+            f"## {self.titles[key]}\n" + ''.join(f"- {item}\n" for item in sections[key])
+            for key in self.keys if sections.get(key)
+        )
+
+    def parse(self, text):
+        """
+        Parse a reply into a (sections, text) tuple. JSON replies are rendered
+        back to markdown so `text` is always readable; markdown is returned as is.
+        """
+        sections = self.parse_json(text)
+        if sections is not None:
+            return sections, self.to_markdown(sections)
+        return self.parse_markdown(text), text
+
+
+DIAGNOSIS_SCHEMA = ResponseSchema(
+    {
+        'possible_conditions': r'condition|diagnos',
+        'next_steps': r'next step|recommend|test',
+        'relief_suggestions': r'relief|treatment|remed',
+        'precautions': r'precaution|warning|emergency|when to seek',
+    },
+    titles={
+        'possible_conditions': 'Possible Allergic Conditions',
+        'next_steps': 'Recommended Next Steps',
+        'relief_suggestions': 'Immediate Relief Suggestions',
+        'precautions': 'Precautions',
+    },
+)
+
+DIETARY_SCHEMA = ResponseSchema(
+    {
+        'safe_alternatives': r'alternative|substitut|swap',
+        'foods_to_avoid': r'avoid|watch',
+        'meal_plan': r'meal plan|menu',
+        'shopping_list': r'shopping|grocer',
+        'eating_out_tips': r'eating out|restaurant|dining',
+    },
+    titles={
+        'safe_alternatives': 'Safe Alternatives',
+        'foods_to_avoid': 'Foods to Avoid',
+        'meal_plan': '3-Day Meal Plan',
+        'shopping_list': 'Shopping List',
+        'eating_out_tips': 'Eating Out Tips',
+    },
+)
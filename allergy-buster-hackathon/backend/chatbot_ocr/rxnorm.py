@@ -0,0 +1,341 @@
+"""
+RxNorm lookups for medication_api and drug_interactions.
+Names and related concepts are answered from the local RxNorm mirror
+(RxConcept/RxRelation, loaded by `manage.py import_rxnorm`). RxNav is only
+called when the mirror has no answer and RXNORM['REMOTE_FALLBACK'] is on,
+always with a timeout, and its answers are kept in the persistent 'rxnav'
+cache, including "not found" answers for a shorter time.
+"""
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import quote
+import requests
+from django.conf import settings
+from django.core.cache import caches
+from .models import RxConcept, RxRelation
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+# Preferred term types when a name matches several concepts, best first
+NAME_TTY_ORDER = ['IN', 'PIN', 'MIN', 'BN', 'SCD', 'SBD', 'GPCK', 'BPCK', 'SCDF', 'SBDF', 'SCDC', 'SY', 'TMSY']
+# Term types reported by related_concepts
+RELATED_TTYS = ['IN', 'PIN', 'MIN', 'BN', 'SCD', 'SBD', 'SCDF', 'SBDF', 'SCDC', 'GPCK', 'BPCK']
+
+# Interaction severities, least severe first ('high' is what ONCHigh reports)
+SEVERITY_ORDER = ['mild', 'moderate', 'high', 'severe']
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+class RxNavError(Exception):
+    """Raised when RxNav is needed but cannot be reached or answers with an error."""
+
+
+def normalize_name(name):
+    """Lower-case and collapse whitespace, as stored in RxConcept.normalized_name."""
+    return WHITESPACE_RE.sub(' ', name).strip().lower()[:255]
+
+
+def rxnav_get(path, params=None):
+    """GET an RxNav REST path (e.g. 'rxcui.json') and return the decoded JSON."""
+    config = settings.RXNORM
+    try:
+        response = requests.get(f"{config['BASE_URL']}/{path}", params=params, timeout=config.get('TIMEOUT', 5.0))
+    except requests.RequestException as e:
+        raise RxNavError(f'Could not reach RxNav: {e}')
+    if response.status_code != 200:
+        raise RxNavError(f'RxNav returned status {response.status_code}')
+    return response.json()
+
+
+def remote_fallback():
+    return settings.RXNORM.get('REMOTE_FALLBACK', True)
+
+
+# Stored for lookups that found nothing, since the cache returns None for misses
+NOT_FOUND = '__not_found__'
+
+
+def cached_remote(kind, key, fetch):
+    """
+    Return fetch() through the RxNav cache. Results are kept for
+    RXNORM['CACHE_TTL'][kind] seconds and empty results for
+    CACHE_TTL['not_found']. Errors are not cached.
+    """
+    config = settings.RXNORM
+    cache = caches[config.get('CACHE_ALIAS', 'rxnav')]
+    cache_key = f"rxnav:{kind}:{quote(key, safe='')}"
+    value = cache.get(cache_key)
+    if value is not None:
+        return None if value == NOT_FOUND else value
+
+    value = fetch()
+    ttls = config.get('CACHE_TTL', {})
+    if value:
+        cache.set(cache_key, value, ttls.get(kind))
+    else:
+        cache.set(cache_key, NOT_FOUND, ttls.get('not_found'))
+    return value
+
+
+def local_rxcuis(names):
+    """
+    Map normalized names to RxCUIs from the local mirror with one query.
+    Names the mirror does not know are left out.
+    """
+    best = {}
+    matches = (RxConcept.objects.filter(normalized_name__in={normalize_name(name) for name in names})
+               .values_list('normalized_name', 'rxcui', 'tty'))
+    for normalized, rxcui, tty in matches:
+        rank = NAME_TTY_ORDER.index(tty) if tty in NAME_TTY_ORDER else len(NAME_TTY_ORDER)
+        if normalized not in best or rank < best[normalized][0]:
+            best[normalized] = (rank, rxcui)
+    return {normalized: rxcui for normalized, (_, rxcui) in best.items()}
+
+
+def local_rxcui(name):
+    """Return the RxCUI for an exact (normalized) name from the local mirror, or None."""
+    return local_rxcuis([name]).get(normalize_name(name))
+
+
+def remote_rxcui(name):
+    """Resolve a name with RxNav, through the cache."""
+    def fetch():
+        data = rxnav_get('rxcui.json', {'name': name})
+        ids = data.get('idGroup', {}).get('rxnormId') or []
+        return ids[0] if ids else None
+    return cached_remote('rxcui', normalize_name(name), fetch)
+
+
+def resolve_rxcui(name):
+    """
+    Return the RxCUI for a medication name, or None if it is unknown.
+    Raises RxNavError if the local mirror misses and RxNav is unreachable.
+    """
+    rxcui = local_rxcui(name)
+    if rxcui is not None or not remote_fallback():
+        return rxcui
+    return remote_rxcui(name)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process-wide thread pool for RxNav lookups."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.RXNORM.get('RESOLVE_WORKERS', 8),
+                                           thread_name_prefix='rxnav')
+        return _executor
+
+
+def resolve_rxcuis(names, deadline=None):
+    """
+    Return {name: rxcui or None} for several names. The local mirror is
+    queried once for all of them and the misses go to RxNav concurrently,
+    so the whole list costs about one lookup. `deadline` is a
+    time.monotonic() value, by default REQUEST_DEADLINE seconds from now.
+    Raises RxNavError like resolve_rxcui, or if the deadline passes.
+    """
+    found = local_rxcuis(names)
+    result = {name: found.get(normalize_name(name)) for name in names}
+    missing = [name for name, rxcui in result.items() if rxcui is None]
+    if not missing or not remote_fallback():
+        return result
+
+    if deadline is None:
+        deadline = time.monotonic() + settings.RXNORM.get('REQUEST_DEADLINE', 10.0)
+    executor = get_executor()
+    futures = {executor.submit(remote_rxcui, name): name for name in missing}
+    done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+    for future in not_done:
+        future.cancel()
+    if not_done:
+        raise RxNavError(f'RxNav lookups did not finish in time for {len(not_done)} name(s)')
+    for future in done:
+        result[futures[future]] = future.result()
+    return result
+
+
+# Relationship labels in RXNREL.RRF, both directions of each
+INGREDIENT_RELAS = ('has_ingredient', 'ingredient_of')
+TRADENAME_RELAS = ('has_tradename', 'tradename_of')
+CONSISTS_RELAS = ('consists_of', 'constitutes')
+FORM_RELAS = ('has_form', 'form_of', 'has_precise_ingredient', 'precise_ingredient_of')
+PART_RELAS = ('has_part', 'part_of')
+
+# How allrelated reaches each term type from a concept of a given term type:
+# {query tty: {related tty: [path, ...]}}, a path being (relas, tty) steps.
+# An empty path is the concept itself. Ingredients are only reached through
+# has_ingredient/tradename_of/form/part edges, never through products, so an
+# ingredient's combination products never contribute their co-ingredients.
+_SCD_INGREDIENTS = [[(INGREDIENT_RELAS, 'IN')], [(CONSISTS_RELAS, 'SCDC'), (INGREDIENT_RELAS, 'IN')]]
+_SCD_OF_IN = [[(INGREDIENT_RELAS, 'SCD')], [(INGREDIENT_RELAS, 'SCDC'), (CONSISTS_RELAS, 'SCD')]]
+RELATED_PATHS = {
+    'IN': {
+        'IN': [[]],
+        'PIN': [[(FORM_RELAS, 'PIN')]],
+        'MIN': [[(PART_RELAS, 'MIN')]],
+        'BN': [[(TRADENAME_RELAS, 'BN')]],
+        'SCDC': [[(INGREDIENT_RELAS, 'SCDC')]],
+        'SCDF': [[(INGREDIENT_RELAS, 'SCDF')]],
+        'SCD': _SCD_OF_IN,
+        'SBD': [path + [(TRADENAME_RELAS, 'SBD')] for path in _SCD_OF_IN],
+    },
+    'PIN': {
+        'PIN': [[]],
+        'IN': [[(FORM_RELAS, 'IN')]],
+    },
+    'MIN': {
+        'MIN': [[]],
+        'IN': [[(PART_RELAS, 'IN')]],
+    },
+    'BN': {
+        'BN': [[]],
+        'IN': [[(TRADENAME_RELAS, 'IN')]],
+        'SBD': [[(INGREDIENT_RELAS, 'SBD')]],
+        'SBDF': [[(INGREDIENT_RELAS, 'SBDF')]],
+    },
+    'SCDC': {
+        'SCDC': [[]],
+        'IN': [[(INGREDIENT_RELAS, 'IN')]],
+        'SCD': [[(CONSISTS_RELAS, 'SCD')]],
+    },
+    'SCDF': {
+        'SCDF': [[]],
+        'IN': [[(INGREDIENT_RELAS, 'IN')]],
+    },
+    'SCD': {
+        'SCD': [[]],
+        'IN': _SCD_INGREDIENTS,
+        'SCDC': [[(CONSISTS_RELAS, 'SCDC')]],
+        'SBD': [[(TRADENAME_RELAS, 'SBD')]],
+        'BN': [[(TRADENAME_RELAS, 'SBD'), (INGREDIENT_RELAS, 'BN')]],
+    },
+    'SBD': {
+        'SBD': [[]],
+        'BN': [[(INGREDIENT_RELAS, 'BN')]],
+        'SCD': [[(TRADENAME_RELAS, 'SCD')]],
+        'IN': [[(TRADENAME_RELAS, 'SCD')] + path for path in _SCD_INGREDIENTS],
+    },
+}
+
+# rxcui__in lists are split into chunks well under SQLite's variable limit
+QUERY_CHUNK = 500
+
+
+def _chunks(values):
+    values = sorted(values)
+    for start in range(0, len(values), QUERY_CHUNK):
+        yield values[start:start + QUERY_CHUNK]
+
+
+def _step(rxcuis, relas, tty):
+    """RxCUIs of term type `tty` linked to any of `rxcuis` by one of `relas`, in either direction."""
+    linked = set()
+    for chunk in _chunks(rxcuis):
+        linked.update(RxRelation.objects.filter(rxcui1__in=chunk, rela__in=relas).values_list('rxcui2', flat=True))
+        linked.update(RxRelation.objects.filter(rxcui2__in=chunk, rela__in=relas).values_list('rxcui1', flat=True))
+    found = set()
+    for chunk in _chunks(linked):
+        found.update(RxConcept.objects.filter(rxcui__in=chunk, tty=tty).values_list('rxcui', flat=True))
+    return found
+
+
+def local_related(rxcui):
+    """
+    Concepts related to `rxcui` in the local mirror, grouped by term type,
+    including the concept itself. Like RxNav's allrelated, each term type is
+    reached along specific relationships (RELATED_PATHS): ingredients of a
+    product through has_ingredient, brands through tradenames, and so on.
+    """
+    ttys = set(RxConcept.objects.filter(rxcui=rxcui).values_list('tty', flat=True))
+    tty = next((tty for tty in NAME_TTY_ORDER if tty in ttys and tty in RELATED_PATHS), None)
+    if tty is None:
+        return {}
+
+    # Paths share prefixes (e.g. IN -> SCD -> SBD), so walk each prefix once
+    walked = {(): {rxcui}}
+    related = {}
+    for related_tty, paths in RELATED_PATHS[tty].items():
+        for path in paths:
+            for length in range(1, len(path) + 1):
+                prefix = tuple(path[:length])
+                if prefix not in walked:
+                    walked[prefix] = _step(walked[prefix[:-1]], *prefix[-1]) if walked[prefix[:-1]] else set()
+            related.setdefault(related_tty, set()).update(walked[tuple(path)])
+    if not any(found - {rxcui} for found in related.values()):
+        return {}
+
+    groups = {}
+    for related_tty in RELATED_TTYS:
+        found = related.get(related_tty)
+        if not found:
+            continue
+        names = {}
+        for chunk in _chunks(found):
+            rows = RxConcept.objects.filter(rxcui__in=chunk, tty=related_tty).values_list('rxcui', 'name')
+            for related_rxcui, name in rows:
+                names.setdefault(related_rxcui, name)
+        groups[related_tty] = sorted(({'name': name, 'rxcui': related_rxcui} for related_rxcui, name in names.items()),
+                                     key=lambda concept: concept['name'])
+    return groups
+
+
+def remote_related(rxcui):
+    """RxNav allrelated for an RxCUI, grouped by term type (includes EPC drug classes)."""
+    data = rxnav_get(f'rxcui/{rxcui}/allrelated.json')
+    groups = {}
+    for group in data.get('allRelatedGroup', {}).get('conceptGroup', []):
+        if group.get('conceptProperties'):
+            groups[group.get('tty')] = [
+                {'name': prop.get('name'), 'rxcui': prop.get('rxcui')} for prop in group['conceptProperties']
+            ]
+    return groups
+
+
+def related_concepts(rxcui):
+    """
+    Return {tty: [{'name', 'rxcui'}, ...]} for concepts related to an RxCUI,
+    from the local mirror, or from RxNav if the mirror knows nothing about it.
+    """
+    groups = local_related(rxcui)
+    if groups or not remote_fallback():
+        return groups
+    return cached_remote('allrelated', rxcui, lambda: remote_related(rxcui)) or {}
+
+
+def interaction_list(rxcuis):
+    """
+    Return RxNav's interaction/list JSON for a set of RxCUIs. The answer
+    does not depend on order, so the cache key is the sorted RxCUIs.
+    """
+    key = '+'.join(sorted(rxcuis))
+    return cached_remote('interactions', key,
+                         lambda: rxnav_get('interaction/list.json', {'rxcuis': ' '.join(sorted(rxcuis))})) or {}
+
+
+def interaction_pairs(interaction_data):
+    """
+    Yield (rxcui1, rxcui2, interaction) for every pair in an interaction/list
+    answer, where interaction has the description, severity and source.
+    """
+    for group in interaction_data.get('fullInteractionTypeGroup', []):
+        for interaction_type in group.get('fullInteractionType', []):
+            concepts = [concept.get('rxcui') for concept in interaction_type.get('minConcept', [])]
+            if len(concepts) != 2:
+                continue
+            for pair in interaction_type.get('interactionPair', []):
+                severity = pair.get('severity')
+                yield concepts[0], concepts[1], {
+                    'description': pair.get('description', 'No description available'),
+                    'severity': severity if severity and severity != 'N/A' else 'moderate',
+                    'source': group.get('sourceName', 'RxNav'),
+                }
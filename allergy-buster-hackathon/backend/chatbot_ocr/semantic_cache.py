@@ -0,0 +1,393 @@
+"""
+Local semantic answer cache for chat_api.
+Questions are embedded with an offline feature-hashing vectorizer and kept in
+a NumPy matrix; a new question is answered from the most similar earlier
+ChatMessage when the cosine similarity clears a threshold. No network or GPU
+is needed.
+
+Bag-of-words similarity cannot tell "how much cetirizine for a 3 year old"
+from the same question about diphenhydramine or a 13 year old, so every
+entry also carries a guard key built from the terms that change the answer
+(medication names, numbers, ages and negations), and only entries with the
+same key can match. Dosing questions are never cached.
+"""
+import hashlib
+import logging
+import re
+import threading
+import zlib
+import numpy as np
+from django.conf import settings
+from django.db import connection
+from .cross_reactivity import get_cross_reactivity
+from .models import ChatMessage
+from .rxnorm import QUERY_CHUNK, local_rxcuis
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset("""
+a about an and any are as at be but by can could do does for from get had has have how i if
+in is it its me my of on or should so take taking that the their them there these they this
+to was we what when where which who why will with would you your
+""".split())
+
+# Terms that must be identical for a cached reply to be reused
+NUMBER_WORDS = frozenset("""
+zero one two three four five six seven eight nine ten eleven twelve thirteen fourteen fifteen sixteen
+seventeen eighteen nineteen twenty thirty forty fifty sixty seventy eighty ninety hundred half once twice
+""".split())
+AGE_WORDS = frozenset("""
+newborn newborns infant infants baby babies toddler toddlers child children kid kids teen teens teenager
+teenagers adolescent adolescents adult adults elderly senior seniors pregnant pregnancy breastfeeding
+nursing
+""".split())
+# Contractions split on the apostrophe, so "can't" and "isn't" leave a "t"
+NEGATION_WORDS = frozenset("""
+not no never without unsafe cannot t nor none avoid
+""".split())
+
+# Questions with these words are about doses, which depend on details a paraphrase can drop
+DOSING_WORDS = frozenset("""
+dose doses dosage dosing overdose mg mcg ml milligram milligrams microgram micrograms milliliter
+milliliters millilitre millilitres tablet tablets pill pills capsule capsules teaspoon teaspoons
+tablespoon tablespoons
+""".split())
+DOSING_RE = re.compile(r"\bhow (?:much|many|often)\b")
+
+
+def is_dosing_question(text):
+    """True for questions about doses, which the cache never stores or answers."""
+    text = text.lower()
+    return bool(DOSING_RE.search(text)) or any(t in DOSING_WORDS for t in TOKEN_RE.findall(text))
+
+
+def guard_keys(questions):
+    """
+    Return one int64 guard key per question: a hash of its medication names
+    (from the local RxNorm mirror and the cross-reactivity data), numbers,
+    age words and negations. Looks names up with one query per QUERY_CHUNK
+    candidate names.
+    """
+    tokens = [TOKEN_RE.findall(question.lower()) for question in questions]
+    candidates = [{t for t in words if t not in STOPWORDS} | {f"{a} {b}" for a, b in zip(words, words[1:])}
+                  for words in tokens]
+    names = sorted(set().union(*candidates)) if candidates else []
+    medications = set()
+    for start in range(0, len(names), QUERY_CHUNK):
+        medications.update(local_rxcuis(names[start:start + QUERY_CHUNK]))
+    engine = get_cross_reactivity()
+
+    keys = []
+    for question, words, found in zip(questions, tokens, candidates):
+        terms = {t for t in words if t.isdigit() or t in NUMBER_WORDS or t in AGE_WORDS or t in NEGATION_WORDS}
+        terms |= {f"rx:{name}" for name in found & medications}
+        if engine is not None:
+            terms |= {f"{kind}:{name}" for kind, name in engine.find(question)}
+        digest = hashlib.blake2b('\x1f'.join(sorted(terms)).encode('utf-8'), digest_size=8).digest()
+        keys.append(int.from_bytes(digest, 'little', signed=True))
+    return keys
+
+
+def guard_key(question):
+    return guard_keys([question])[0]
+
+
+class HashingVectorizer:
+    """
+    Maps text to a fixed-size, L2-normalised float32 vector by hashing
+    unigrams and bigrams (after stopword removal) into `dims` buckets with a
+    sign bit, using sublinear term frequency. crc32 is used instead of
+    hash() so vectors are stable across processes.
+    """
+
+    BIGRAM_WEIGHT = 0.5
+
+    def __init__(self, dims=256):
+        self.dims = dims
+
+    def features(self, text):
+        """Return (feature, weight) pairs: unigrams at 1.0 and bigrams at BIGRAM_WEIGHT."""
+        tokens = [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+        return ([(t, 1.0) for t in tokens] +
+                [(f"{a} {b}", self.BIGRAM_WEIGHT) for a, b in zip(tokens, tokens[1:])])
+
+    def sparse(self, text):
+        """Return (indices, values) of the normalised vector's non-zero entries."""
+        buckets = {}
+        for feature, weight in self.features(text):
+            h = zlib.crc32(feature.encode('utf-8'))
+            index = h % self.dims
+            sign = 1.0 if (h >> 31) & 1 else -1.0
+            buckets[index] = buckets.get(index, 0.0) + sign * weight
+        if not buckets:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        indices = np.fromiter(buckets.keys(), dtype=np.intp, count=len(buckets))
+        counts = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets))
+        magnitude = np.abs(counts)
+        values = np.sign(counts) * np.where(magnitude > 1.0, 1.0 + np.log(np.maximum(magnitude, 1.0)), magnitude)
+        norm = np.linalg.norm(values)
+        if norm == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        return indices, (values / norm).astype(np.float32)
+
+    def transform(self, text):
+        """Return the dense normalised vector for a text."""
+        vector = np.zeros(self.dims, dtype=np.float32)
+        indices, values = self.sparse(text)
+        vector[indices] = values
+        return vector
+
+
+class SemanticCache:
+    """
+    Nearest-neighbour cache from question vectors to ChatMessage ids.
+
+    Only an entry's non-zero features are stored: up to `features` (bucket,
+    weight) pairs in fixed-width uint16 and float16 rows, zero-padded, so an
+    entry costs about 4 * features + 16 bytes however large `dims` is.
+
+    Slots are grouped into segments of SEGMENT entries. Once a segment is
+    full it is sealed into an inverted index (its features sorted by bucket,
+    CSR style), so a lookup only reads the postings of the query's own
+    features; only the segment being written, and guard-key buckets small
+    enough that it is cheaper, are scanned entry by entry. Only entries
+    whose guard key equals the query's are scored. Once
+    `max_entries` is reached the oldest entries are overwritten, and a
+    segment is unsealed while its slots are being reused.
+    """
+
+    SEGMENT = 16384
+    # Guard key of discarded entries, so they never match
+    DISCARDED = np.iinfo(np.int64).min
+
+    def __init__(self, dims=65536, threshold=0.95, max_entries=1000000, features=32, initial_capacity=4096):
+        if dims > 65536:
+            raise ValueError('dims must fit in uint16')
+        self.vectorizer = HashingVectorizer(dims)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.features = features
+        capacity = min(initial_capacity, max_entries)
+        self._indices = np.zeros((capacity, features), dtype=np.uint16)
+        self._values = np.zeros((capacity, features), dtype=np.float16)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._keys = np.zeros(capacity, dtype=np.int64)
+        # Segment number -> (buckets, local slots, weights), sorted by bucket
+        self._segments = {}
+        self._size = 0
+        self._next = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return self._size
+
+    def _grow(self):
+        capacity = min(self.max_entries, self._ids.shape[0] * 2)
+        arrays = []
+        for array in (self._indices, self._values, self._ids, self._keys):
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:self._size] = array[:self._size]
+            arrays.append(grown)
+        self._indices, self._values, self._ids, self._keys = arrays
+
+    def _stored(self, question):
+        """The (indices, values) kept for a question: its `features` strongest, renormalised."""
+        indices, values = self.vectorizer.sparse(question)
+        if len(indices) > self.features:
+            strongest = np.argsort(-np.abs(values))[:self.features]
+            indices, values = indices[strongest], values[strongest]
+            values = values / np.linalg.norm(values)
+        return indices, values
+
+    def _seal(self, segment):
+        """Build the inverted index of a full segment; call with _lock held."""
+        start = segment * self.SEGMENT
+        end = min(start + self.SEGMENT, self.max_entries)
+        values = self._values[start:end].ravel()
+        present = np.flatnonzero(values)
+        buckets = self._indices[start:end].ravel()[present]
+        order = np.argsort(buckets, kind='stable')
+        slots = (present // self.features).astype(np.uint16)
+        self._segments[segment] = (buckets[order], slots[order], values[present][order])
+
+    def add(self, message_id, question, key=0):
+        """Cache the reply of ChatMessage `message_id` under its question and guard key."""
+        indices, values = self._stored(question)
+        if not len(indices):
+            return
+        with self._lock:
+            if self._next == self._ids.shape[0] and self._ids.shape[0] < self.max_entries:
+                self._grow()
+            slot = self._next
+            segment = slot // self.SEGMENT
+            # Reusing a slot unseals its segment until the segment is full again
+            self._segments.pop(segment, None)
+            self._indices[slot] = 0
+            self._values[slot] = 0
+            self._indices[slot, :len(indices)] = indices
+            self._values[slot, :len(values)] = values
+            self._ids[slot] = message_id
+            self._keys[slot] = key
+            if (slot + 1) % self.SEGMENT == 0 or slot + 1 == self.max_entries:
+                self._seal(segment)
+            self._next = (slot + 1) % self.max_entries
+            self._size = min(self._size + 1, self.max_entries)
+
+    def _score_sealed(self, index, query_indices, query_values, candidates, size):
+        """
+        Scores of `candidates` in a sealed segment from the postings of the
+        query's buckets, or None if reading the candidates' rows is cheaper.
+        """
+        buckets, slots, weights = index
+        # Same dtype as the postings, or searchsorted converts the whole array per call
+        query_indices = query_indices.astype(buckets.dtype)
+        left = np.searchsorted(buckets, query_indices, side='left')
+        lengths = np.searchsorted(buckets, query_indices, side='right') - left
+        total = int(lengths.sum())
+        if total > len(candidates) * self.features:
+            return None
+        if not total:
+            return np.zeros(len(candidates))
+        # Positions of all matching postings, concatenated
+        positions = np.arange(total) + np.repeat(left - np.cumsum(lengths) + lengths, lengths)
+        contributions = weights[positions].astype(np.float32) * np.repeat(query_values, lengths)
+        return np.bincount(slots[positions], weights=contributions, minlength=size)[candidates]
+
+    def search(self, question, key=0):
+        """
+        Return (message_id, similarity) of the closest cached question with
+        the same guard key, or None if there is none or the question has no
+        usable terms.
+        """
+        query_indices, query_values = self.vectorizer.sparse(question)
+        if not len(query_indices):
+            return None
+        query = np.zeros(self.vectorizer.dims, dtype=np.float32)
+        query[query_indices] = query_values
+        # Score outside the lock so concurrent adds are not held up
+        with self._lock:
+            indices, values, keys, size = self._indices, self._values, self._keys, self._size
+            segments = dict(self._segments)
+        matches = keys[:size] == key
+        best, best_score = None, -np.inf
+        for segment in range(-(-size // self.SEGMENT)):
+            start = segment * self.SEGMENT
+            end = min(start + self.SEGMENT, size)
+            candidates = np.flatnonzero(matches[start:end])
+            if not len(candidates):
+                continue
+            scores = None
+            if segment in segments:
+                scores = self._score_sealed(segments[segment], query_indices, query_values, candidates, end - start)
+            if scores is None:
+                rows = start + candidates
+                scores = (query[indices[rows]] * values[rows]).sum(axis=1, dtype=np.float32)
+            position = int(np.argmax(scores))
+            if scores[position] > best_score:
+                best, best_score = start + int(candidates[position]), float(scores[position])
+        if best is None:
+            return None
+        # The slot may have been overwritten meanwhile, so rescore it under the lock
+        with self._lock:
+            if self._keys[best] != key:
+                return None
+            score = (query[self._indices[best]] * self._values[best]).sum(dtype=np.float32)
+            return int(self._ids[best]), float(score)
+
+    def lookup(self, question, key=0):
+        """Return (message_id, similarity) if the best match clears the threshold."""
+        match = self.search(question, key)
+        if match is None or match[1] < self.threshold:
+            return None
+        return match
+
+    def discard(self, message_id):
+        """Stop answering from a message (e.g. if it was deleted)."""
+        with self._lock:
+            stale = np.nonzero(self._ids[:self._size] == message_id)[0]
+            self._keys[stale] = self.DISCARDED
+            self._values[stale] = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+_warm_thread = None
+
+
+def get_semantic_cache():
+    """
+    Return the process-wide cache, or None if it is disabled. The first call
+    starts warming it from the most recent ChatMessage rows in a background
+    thread; until that finishes, lookups only see what has been loaded.
+    """
+    global _cache, _warm_thread
+    config = settings.CHAT_SEMANTIC_CACHE
+    if not config.get('ENABLED'):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = SemanticCache(
+                dims=config.get('DIMENSIONS', 65536),
+                threshold=config.get('THRESHOLD', 0.95),
+                max_entries=config.get('MAX_ENTRIES', 1000000),
+                features=config.get('FEATURES', 32),
+            )
+            _warm_thread = threading.Thread(target=_warm, args=(_cache, config.get('WARM_ENTRIES', 100000)),
+                                            name='semantic-cache-warm', daemon=True)
+            _warm_thread.start()
+        return _cache
+
+
+def _warm(cache, limit):
+    try:
+        warm_from_history(cache, limit)
+    except Exception as e:
+        logger.error(f"Semantic cache warm-up failed: {e}")
+    finally:
+        # The warm-up thread owns its own connection
+        connection.close()
+
+
+def warm_from_history(cache, limit):
+    """Load the `limit` most recent successful chat replies into the cache."""
+    rows = (ChatMessage.objects.exclude(ai_reply__startswith='Error:')
+            .order_by('-id').values_list('id', 'user_message')[:limit])
+    # Oldest first so the newest entries survive if the cache wraps
+    rows = [(message_id, question) for message_id, question in reversed(list(rows))
+            if not is_dosing_question(question)]
+    for start in range(0, len(rows), QUERY_CHUNK):
+        chunk = rows[start:start + QUERY_CHUNK]
+        for (message_id, question), key in zip(chunk, guard_keys([question for _, question in chunk])):
+            cache.add(message_id, question, key)
+    logger.info(f"Semantic cache warmed with {len(rows)} chat messages")
+
+
+def cached_reply(question):
+    """
+    Return (reply, similarity) for a question answered before, or None.
+    Entries whose ChatMessage no longer exists are dropped.
+    """
+    cache = get_semantic_cache()
+    if cache is None or is_dosing_question(question):
+        return None
+    match = cache.lookup(question, guard_key(question))
+    if match is None:
+        return None
+    message_id, similarity = match
+    reply = ChatMessage.objects.filter(id=message_id).values_list('ai_reply', flat=True).first()
+    if reply is None:
+        cache.discard(message_id)
+        return None
+    return reply, similarity
+
+
+def remember_reply(chat_message):
+    """Add a newly saved ChatMessage to the cache, skipping error replies and dosing questions."""
+    cache = get_semantic_cache()
+    # Rows bulk-inserted on backends that don't return ids have no id to cache
+    if (cache is not None and chat_message.id is not None and not chat_message.ai_reply.startswith('Error:')
+            and not is_dosing_question(chat_message.user_message)):
+        cache.add(chat_message.id, chat_message.user_message, guard_key(chat_message.user_message))
@@ -0,0 +1,119 @@
+"""
+Conversation sessions for chat_api.
+Recent turns of a session are sent with each question, trimmed to a token
+budget; turns that fall out of the budget are folded into a running summary
+stored on the session, so prompt size stays bounded however long the
+conversation gets.
+"""
+import logging
+import re
+import uuid
+from django.conf import settings
+from .models import ChatMessage, ChatSession
+from .rate_limit import estimate_tokens
+from .write_behind import pending_chat_messages
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+SESSION_KEY_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def get_or_create_session(session_key=None):
+    """
+    Return the session for `session_key`, or a new one with a fresh key.
+
+    Only keys this server issued are resumed: anything that is not an existing
+    uuid4 hex key starts a new session instead of creating one under the
+    caller's chosen key.
+    """
+    if session_key and SESSION_KEY_RE.fullmatch(str(session_key)):
+        session = ChatSession.objects.filter(session_key=session_key).first()
+        if session is not None:
+            return session
+    return ChatSession.objects.create(session_key=uuid.uuid4().hex)
+
+
+def _clip(text, limit):
+    """First sentence of `text`, cut to `limit` characters."""
+    text = ' '.join(text.split())
+    text = SENTENCE_END_RE.split(text, 1)[0]
+    return text if len(text) <= limit else text[:limit - 3].rstrip() + '...'
+
+
+def summarize_turn(user_message, ai_reply):
+    """One-line extractive summary of a turn."""
+    return f"- User asked: {_clip(user_message, 160)} Assistant: {_clip(ai_reply, 200)}"
+
+
+def _trim_summary(summary, budget):
+    """Drop the oldest summary lines until the summary fits the token budget."""
+    lines = summary.split('\n') if summary else []
+    while lines and estimate_tokens('\n'.join(lines)) > budget:
+        lines.pop(0)
+    return '\n'.join(lines)
+
+
+def build_history(session):
+    """
+    Return (summary, turns) for the next prompt of a session.
+
+    `turns` are the most recent (user_message, ai_reply) pairs, oldest first,
+    up to CHAT_SESSIONS['MAX_TURNS'] that fit CHAT_SESSIONS['HISTORY_TOKENS'].
+    Every unsummarized turn older than those is folded into the session's
+    summary, which is saved and trimmed to CHAT_SESSIONS['SUMMARY_TOKENS'].
+    """
+    config = settings.CHAT_SESSIONS
+    max_turns = config.get('MAX_TURNS', 20)
+    # Turns still in the write-behind buffer are newer than any stored row
+    pending = [(None, message.user_message, message.ai_reply)
+               for message in reversed(pending_chat_messages(session.id))]
+    limit = max(0, max_turns - len(pending))
+    unsummarized = ChatMessage.objects.filter(session=session, id__gt=session.summarized_through)
+    stored = list(unsummarized.order_by('-id').values_list('id', 'user_message', 'ai_reply')[:limit])
+    rows = pending[:max_turns] + stored
+
+    kept = []
+    used = 0
+    for message_id, user_message, ai_reply in rows:
+        cost = estimate_tokens(user_message) + estimate_tokens(ai_reply)
+        if used + cost > config.get('HISTORY_TOKENS', 1500) and kept:
+            break
+        kept.append((message_id, user_message, ai_reply))
+        used += cost
+
+    # Stored turns older than the kept window, including any beyond MAX_TURNS.
+    # Buffered turns have no id yet; they are dropped from the prompt rather than folded
+    kept_ids = [message_id for message_id, _, _ in kept if message_id is not None]
+    if len(stored) > len(kept_ids) or len(stored) == limit:
+        older = unsummarized.filter(id__lt=min(kept_ids)) if kept_ids else unsummarized
+        folded, folded_tokens, newest = [], 0, None
+        budget = config.get('SUMMARY_TOKENS', 400)
+        for message_id, user_message, ai_reply in (older.order_by('-id')
+                                                   .values_list('id', 'user_message', 'ai_reply').iterator()):
+            newest = newest or message_id
+            # Older lines would only be trimmed from the summary again
+            if folded_tokens > budget:
+                break
+            folded.append(summarize_turn(user_message, ai_reply))
+            folded_tokens += estimate_tokens(folded[-1])
+        if newest is not None:
+            summary = '\n'.join(filter(None, [session.summary] + list(reversed(folded))))
+            session.summary = _trim_summary(summary, budget)
+            session.summarized_through = newest
+            session.save(update_fields=['summary', 'summarized_through', 'updated_at'])
+
+    return session.summary, [(user_message, ai_reply) for _, user_message, ai_reply in reversed(kept)]
+
+
+def format_history(summary, turns):
+    """Render a session's summary and recent turns for an LLM prompt."""
+    parts = []
+    if summary:
+        parts.append(f"Summary of the earlier conversation:\n{summary}")
+    if turns:
+        parts.append("Recent conversation:\n" + '\n'.join(
+            f"User: {user_message}\nAssistant: {ai_reply}" for user_message, ai_reply in turns
+        ))
+    return '\n\n'.join(parts)
@@ -0,0 +1,146 @@
+"""
+Offline symptom scorer for diagnose_symptoms.
+Symptom phrases are extracted from free text with one compiled regex and
+scored against a condition x symptom likelihood matrix (Bernoulli naive
+Bayes in NumPy), giving ranked conditions in well under a millisecond.
+The LLM is only needed when the ranking is unclear or a detailed analysis
+is requested.
+"""
+import json
+import logging
+import re
+import threading
+import numpy as np
+from django.conf import settings
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+NEGATION_RE = re.compile(r"\b(?:no|not|without|denies|never|none|haven't|hasn't|don't|doesn't)\b")
+CLAUSE_BREAK_RE = re.compile(r"[.,;:!?]|\bbut\b|\bthough\b")
+
+
+class SymptomScorer:
+    """
+    Naive Bayes over binary symptom features.
+
+    For each condition c, log P(c | text) is log prior(c) plus the sum of
+    log P(s | c) over symptoms present in the text and `absent_weight` times
+    log(1 - P(s | c)) over the ones not mentioned. Patients rarely list every
+    symptom, so absence counts for much less than presence. Likelihoods not
+    given for a condition default to `base_rate`.
+    """
+
+    def __init__(self, symptoms, conditions, base_rate=0.02, absent_weight=0.15):
+        self.symptom_ids = list(symptoms)
+        self.conditions = conditions
+        index = {symptom: i for i, symptom in enumerate(self.symptom_ids)}
+
+        likelihoods = np.full((len(conditions), len(self.symptom_ids)), base_rate, dtype=np.float64)
+        for row, condition in enumerate(conditions):
+            for symptom, p in condition['likelihoods'].items():
+                likelihoods[row, index[symptom]] = p
+        priors = np.array([condition.get('prior', 1.0) for condition in conditions], dtype=np.float64)
+
+        self._log_present = np.log(likelihoods)
+        self._log_absent = absent_weight * np.log1p(-likelihoods)
+        # Score with nothing present; each present symptom then adds one column
+        self._base = np.log(priors / priors.sum()) + self._log_absent.sum(axis=1)
+        self._delta = self._log_present - self._log_absent
+
+        self._phrase_to_symptom = {}
+        for symptom, phrases in symptoms.items():
+            for phrase in phrases:
+                self._phrase_to_symptom[phrase.lower()] = index[symptom]
+        # Longest phrases first so "itchy eyes" wins over "eyes"
+        alternatives = sorted(self._phrase_to_symptom, key=len, reverse=True)
+        self._phrase_re = re.compile(r'\b(?:' + '|'.join(map(re.escape, alternatives)) + r')\b')
+
+    def extract(self, text):
+        """Return the sorted column indices of symptoms mentioned (and not negated) in text."""
+        text = text.lower()
+        found = set()
+        for match in self._phrase_re.finditer(text):
+            clause = CLAUSE_BREAK_RE.split(text[max(0, match.start() - 40):match.start()])[-1]
+            if not NEGATION_RE.search(clause):
+                found.add(self._phrase_to_symptom[match.group(0)])
+        return sorted(found)
+
+    def score(self, text):
+        """
+        Return {'symptoms': [...], 'conditions': [(condition, probability), ...]}
+        with conditions ranked by posterior probability.
+        """
+        present = self.extract(text)
+        scores = self._base + self._delta[:, present].sum(axis=1)
+        probabilities = np.exp(scores - scores.max())
+        probabilities /= probabilities.sum()
+        order = np.argsort(-probabilities)
+        return {
+            'symptoms': [self.symptom_ids[i] for i in present],
+            'conditions': [(self.conditions[i], float(probabilities[i])) for i in order],
+        }
+
+
+_scorer = None
+_scorer_lock = threading.Lock()
+
+
+def get_symptom_scorer():
+    """Return the process-wide scorer, or None if local scoring is disabled."""
+    global _scorer
+    config = settings.SYMPTOM_SCORER
+    if not config.get('ENABLED'):
+        return None
+    with _scorer_lock:
+        if _scorer is None:
+            with open(config['PATH'], 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _scorer = SymptomScorer(data['symptoms'], data['conditions'])
+            logger.info(f"Symptom scorer built with {len(data['conditions'])} conditions "
+                        f"and {len(data['symptoms'])} symptoms")
+        return _scorer
+
+
+def _merge(conditions, field):
+    items = []
+    for condition in conditions:
+        for item in condition.get(field, []):
+            if item not in items:
+                items.append(item)
+    return items
+
+
+def local_diagnosis(symptoms):
+    """
+    Score a symptom description locally.
+    Returns None if the scorer is disabled or no symptoms were recognised;
+    otherwise the diagnose_symptoms fields plus `condition_scores` and
+    `confident`, which is False when the LLM should be consulted.
+    """
+    config = settings.SYMPTOM_SCORER
+    scorer = get_symptom_scorer()
+    if scorer is None:
+        return None
+    result = scorer.score(symptoms)
+    if not result['symptoms']:
+        return None
+
+    ranked = [(c, p) for c, p in result['conditions'] if p >= config.get('MIN_PROBABILITY', 0.05)][:5]
+    top_probability = ranked[0][1]
+    confident = (top_probability >= config.get('CONFIDENT_PROBABILITY', 0.6)
+                 and len(result['symptoms']) >= config.get('MIN_SYMPTOMS', 2))
+    # Advice comes from every condition that is reasonably likely
+    likely = [c for c, p in ranked if p >= top_probability / 3]
+    urgent = [c for c, p in ranked if c.get('urgent') and p >= config.get('URGENT_PROBABILITY', 0.1)]
+
+    return {
+        'possible_conditions': [c['name'] for c, _ in ranked],
+        'condition_scores': [{'condition': c['name'], 'probability': round(p, 3)} for c, p in ranked],
+        'recognized_symptoms': result['symptoms'],
+        'next_steps': _merge(likely, 'next_steps'),
+        'relief_suggestions': _merge(likely, 'relief'),
+        # Emergency advice for any plausible urgent condition comes first
+        'precautions': _merge(urgent + likely, 'precautions'),
+        'confident': confident,
+    }
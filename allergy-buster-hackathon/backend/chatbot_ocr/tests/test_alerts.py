@@ -0,0 +1,108 @@
+"""
+Unit tests for allergy alerts in the chatbot_ocr app.
+Covers geohash cells, the bounded alert cache and its daily rollover, and
+conditional GETs against the allergy-alerts endpoint.
+"""
+from datetime import datetime
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+from chatbot_ocr import alerts
+from chatbot_ocr.alerts import AlertCache
+from chatbot_ocr.geo import geohash
+
+APRIL = datetime(2025, 4, 10, 9, 30)
+
+
+class AlertCacheTest(TestCase):
+    """Test suite for geohash and AlertCache."""
+
+    def test_geohash(self):
+        """Test that geohash matches the published encoding."""
+        self.assertEqual(geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geohash(40.7128, -74.0060, 5), 'dr5re')
+
+    def test_same_cell_and_allergy_set_share_an_entry(self):
+        """Test that nearby points and reordered allergies hit the same entry."""
+        cache = AlertCache(precision=5)
+        first = cache.get(40.7128, -74.0060, ['Mold', 'pollen'], APRIL)
+        second = cache.get(40.7130, -74.0062, ['pollen ', 'mold', 'mold'], APRIL)
+        self.assertIs(first, second)
+        self.assertEqual([alert['type'] for alert in first.body['alerts']], ['pollen'])
+        self.assertIsNot(cache.get(34.0522, -118.2437, ['pollen', 'mold'], APRIL), first)
+
+    def test_bounded_lru(self):
+        """Test that the least recently used entry is evicted at capacity."""
+        cache = AlertCache(max_entries=2)
+        kept = cache.get(10, 10, ['mold'], APRIL)
+        cache.get(20, 20, ['mold'], APRIL)
+        cache.get(10, 10, ['mold'], APRIL)
+        cache.get(30, 30, ['mold'], APRIL)
+        self.assertEqual(len(cache), 2)
+        self.assertIs(cache.get(10, 10, ['mold'], APRIL), kept)
+
+    def test_daily_rollover(self):
+        """Test that entries expire at midnight and old days are dropped."""
+        cache = AlertCache()
+        today = cache.get(10, 10, ['pollen'], APRIL)
+        self.assertEqual(today.expires, datetime(2025, 4, 11))
+        tomorrow = cache.get(10, 10, ['pollen'], datetime(2025, 4, 11, 0, 0, 1))
+        self.assertEqual(tomorrow.body['current_date'], '2025-04-11')
+        self.assertNotEqual(tomorrow.etag, today.etag)
+        self.assertEqual(len(cache), 1)
+
+
+@override_settings(POLLEN_GRID={'ENABLED': False})
+class AllergyAlertsViewTest(TestCase):
+    """Test suite for the allergy_alerts view."""
+
+    def setUp(self):
+        self.client = APIClient()
+        alerts._cache = None
+
+    def tearDown(self):
+        alerts._cache = None
+
+    def get(self, headers=None, **params):
+        query = {'latitude': '40.7128', 'longitude': '-74.0060', 'allergies': 'pollen,mold', **params}
+        return self.client.get('/api/chatbot/allergy-alerts/', query, **(headers or {}))
+
+    def test_etag_revalidation(self):
+        """Test that a matching If-None-Match gets a 304 with the same validators."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('W/"'))
+        self.assertEqual(response.data['location']['latitude'], '40.7128')
+
+        again = self.get({'HTTP_IF_NONE_MATCH': etag}, allergies='mold,pollen')
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again['ETag'], etag)
+        self.assertEqual(self.get({'HTTP_IF_NONE_MATCH': 'W/"stale"'}).status_code, 200)
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured when no ETag is sent."""
+        response = self.get()
+        self.assertEqual(self.get({'HTTP_IF_MODIFIED_SINCE': response['Last-Modified']}).status_code, 304)
+        self.assertEqual(self.get({'HTTP_IF_MODIFIED_SINCE': http_date(0)}).status_code, 200)
+
+    def test_alerts_built_once_per_cell(self):
+        """Test that repeated requests in one cell reuse the cached alerts."""
+        with patch('chatbot_ocr.alerts.build_alerts', wraps=alerts.build_alerts) as build:
+            self.get()
+            self.get(latitude='40.7129')
+        self.assertEqual(build.call_count, 1)
+
+    @override_settings(ALERT_CACHE={'ENABLED': False})
+    def test_cache_disabled(self):
+        """Test that alerts are still served with validators when the cache is off."""
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+
+    def test_validation(self):
+        """Test that missing or invalid coordinates are rejected."""
+        self.assertEqual(self.client.get('/api/chatbot/allergy-alerts/', {'latitude': '1'}).status_code, 400)
+        self.assertEqual(self.get(latitude='north').status_code, 400)
+        self.assertEqual(self.get(longitude='200').status_code, 400)
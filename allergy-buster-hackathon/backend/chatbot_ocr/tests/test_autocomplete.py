@@ -0,0 +1,111 @@
+"""
+Unit tests for medication autocomplete in the chatbot_ocr app.
+Covers prefix ranking, exact matches, typo correction, names from the
+RxNorm mirror, the autocomplete endpoint and lookup latency.
+"""
+import random
+import string
+import time
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import autocomplete
+from chatbot_ocr.autocomplete import MedicationIndex
+from chatbot_ocr.models import RxConcept
+
+
+def names(results):
+    return [result['name'] for result in results]
+
+
+class MedicationIndexTest(TestCase):
+    """Test suite for MedicationIndex prefix search and typo correction."""
+
+    def setUp(self):
+        self.index = MedicationIndex([
+            ('amoxicillin', 'amoxicillin', '723', 9.0),
+            ('Amoxil', 'amoxicillin', '723', 4.0),
+            ('amlodipine', 'amlodipine', '17767', 8.0),
+            ('ampicillin', 'ampicillin', '733', 3.0),
+            ('amox', 'amox', None, 1.0),
+            ('cetirizine', 'cetirizine', '20610', 7.0),
+        ])
+
+    def search(self, query, limit=10):
+        return [(self.index.labels[position], corrected) for position, corrected in self.index.search(query, limit)]
+
+    def test_prefix_ranked_by_weight(self):
+        """Test that prefix matches come back heaviest first and respect the limit."""
+        self.assertEqual(self.search('am', 3), [('amoxicillin', False), ('amlodipine', False), ('Amoxil', False)])
+
+    def test_exact_match_first(self):
+        """Test that a name typed in full is listed before heavier longer names."""
+        self.assertEqual(self.search('amox')[0], ('amox', False))
+
+    def test_typo_correction(self):
+        """Test that one-edit misspellings find the intended name."""
+        self.assertEqual(self.search('amoxicilin'), [('amoxicillin', True)])
+        self.assertEqual(self.search('cetrizine'), [('cetirizine', True)])
+        self.assertEqual(self.search('cex'), [])
+
+    def test_duplicates_keep_heaviest(self):
+        """Test that the same name from two sources is listed once."""
+        index = MedicationIndex([('Aspirin', 'aspirin', None, 1.0), ('aspirin', 'aspirin', '1191', 5.0)])
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.suggestion(0, False)['rxcui'], '1191')
+
+    def test_latency(self):
+        """Test that lookups in a large index stay within a few milliseconds."""
+        rng = random.Random(7)
+        words = [''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 20)))
+                 for _ in range(100000)]
+        index = MedicationIndex((word, word, None, rng.random()) for word in words)
+        queries = [word[:rng.randint(1, 10)] for word in rng.sample(words, 300)]
+        queries += [word[:6] + 'q' for word in rng.sample(words, 100)]
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query, 10)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.assertLess(timings[int(len(timings) * 0.99)], 0.02)
+
+
+class AutocompleteViewTest(TestCase):
+    """Test suite for the medication_autocomplete view."""
+
+    def setUp(self):
+        self.client = APIClient()
+        autocomplete._index = None
+        RxConcept.objects.create(rxaui='A1', rxcui='58930', tty='BN', name='Zyrtec', normalized_name='zyrtec')
+        RxConcept.objects.create(rxaui='A2', rxcui='1', tty='SCD', name='Zyrtec 10 MG Oral Tablet',
+                                 normalized_name='zyrtec 10 mg oral tablet')
+
+    def tearDown(self):
+        autocomplete._index = None
+
+    def get(self, params):
+        return self.client.get('/api/chatbot/medication/autocomplete/', params)
+
+    def test_bundled_names_and_aliases(self):
+        """Test that common medications and brand aliases are suggested."""
+        response = self.get({'q': 'amox'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['name'], 'amoxicillin')
+        keflex = self.get({'q': 'keflex'}).data['results'][0]
+        self.assertEqual((keflex['canonical'], keflex['rxcui']), ('cephalexin', '2231'))
+
+    def test_rxnorm_names(self):
+        """Test that brand names from the RxNorm mirror are included but drug forms are not."""
+        self.assertEqual(names(self.get({'q': 'zyrt'}).data['results']), ['Zyrtec'])
+
+    def test_limit_and_validation(self):
+        """Test that limit is capped and a missing or bad query is rejected."""
+        self.assertEqual(len(self.get({'q': 'a', 'limit': 3}).data['results']), 3)
+        self.assertEqual(len(self.get({'q': 'a', 'limit': 500}).data['results']), 10)
+        self.assertEqual(self.get({}).status_code, 400)
+        self.assertEqual(self.get({'q': 'a', 'limit': 'x'}).status_code, 400)
+
+    @override_settings(AUTOCOMPLETE={'ENABLED': False})
+    def test_disabled(self):
+        """Test that the endpoint reports when autocomplete is switched off."""
+        self.assertEqual(self.get({'q': 'amox'}).status_code, 503)
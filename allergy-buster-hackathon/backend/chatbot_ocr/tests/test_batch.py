@@ -0,0 +1,115 @@
+"""
+Unit tests for batch diagnosis in the chatbot_ocr app.
+Covers the concurrent batch runner and the streamed diagnose-batch endpoint.
+"""
+import json
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from chatbot_ocr import providers, rate_limit, semantic_cache
+from chatbot_ocr.batch import run_batch, call_with_retries
+from chatbot_ocr.rate_limit import RateLimitExceeded
+
+SLOW_FAKE = {
+    'PRIMARY': 'fake',
+    'SECONDARY': 'fake',
+    'BACKENDS': {
+        'fake': {
+            'CLASS': 'chatbot_ocr.providers.FakeProvider',
+            'OPTIONS': {'latency': {'distribution': 'constant', 'value': 0.1}},
+        },
+    },
+}
+
+FAKE_LIMITS = {
+    'fake': {'MAX_CONCURRENT': 10, 'REQUESTS_PER_MINUTE': 100000, 'TOKENS_PER_MINUTE': 10000000},
+}
+
+
+class RunBatchTest(SimpleTestCase):
+    """Test suite for run_batch."""
+
+    def test_errors_are_isolated(self):
+        """Test that a failing item yields an error and the others still succeed."""
+        def square(n):
+            if n == 3:
+                raise ValueError('bad item')
+            return n * n
+
+        results = {index: (result, error) for index, result, error in run_batch(square, range(6), max_workers=2)}
+        self.assertEqual(len(results), 6)
+        self.assertEqual(results[4], (16, None))
+        self.assertIsNone(results[3][0])
+        self.assertIsInstance(results[3][1], ValueError)
+
+    def test_runs_concurrently(self):
+        """Test that total time depends on the worker count, not the item count."""
+        started = time.monotonic()
+        list(run_batch(lambda n: time.sleep(0.05), range(20), max_workers=10))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_retries_shed_calls(self):
+        """Test that calls shed by the rate limiter are retried."""
+        attempts = []
+
+        def flaky(item):
+            attempts.append(item)
+            if len(attempts) < 3:
+                raise RateLimitExceeded('fake', 'queue full', retry_after=0.01)
+            return item
+
+        self.assertEqual(call_with_retries(flaky, 'x', retries=2), 'x')
+        attempts.clear()
+        with self.assertRaises(RateLimitExceeded):
+            call_with_retries(flaky, 'y', retries=1)
+        self.assertEqual(attempts, ['y', 'y'])
+
+
+@override_settings(LLM_PROVIDERS=SLOW_FAKE, LLM_RATE_LIMITS=FAKE_LIMITS)
+class DiagnoseBatchTest(TestCase):
+    """Test suite for the diagnose_batch endpoint."""
+
+    def setUp(self):
+        providers._providers.clear()
+        rate_limit._limiters.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        rate_limit._limiters.clear()
+        semantic_cache._cache = None
+
+    def read_lines(self, response):
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_batch_streams_ndjson(self):
+        """Test that every record gets a line, invalid records fail alone, and calls overlap."""
+        records = [{'id': f'p{i}', 'symptoms': 'sneezing and itchy eyes', 'detailed': True} for i in range(20)]
+        records[5] = {'id': 'p5'}
+        started = time.monotonic()
+        response = self.client.post('/api/chatbot/diagnose-batch/', {'records': records}, format='json')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.read_lines(response)
+        elapsed = time.monotonic() - started
+
+        summary = lines.pop()['summary']
+        self.assertEqual(summary, dict(summary, total=20, succeeded=19, failed=1, workers=10))
+        by_id = {line['id']: line for line in lines}
+        self.assertEqual(len(by_id), 20)
+        self.assertEqual(by_id['p5']['status'], 'error')
+        self.assertEqual(by_id['p0']['status'], 'success')
+        self.assertEqual(by_id['p0']['source'], 'llm')
+        self.assertIn('Allergic rhinitis (hay fever)', by_id['p0']['possible_conditions'])
+        # 19 calls of 0.1s on 10 workers: about 0.2s, not 1.9s
+        self.assertLess(elapsed, 1.0)
+
+    def test_invalid_payload(self):
+        """Test that a missing or oversized records list is rejected."""
+        response = self.client.post('/api/chatbot/diagnose-batch/', {'records': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(DIAGNOSE_BATCH={'MAX_RECORDS': 2}):
+            response = self.client.post('/api/chatbot/diagnose-batch/',
+                                        {'records': [{'symptoms': 'x'}] * 3}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
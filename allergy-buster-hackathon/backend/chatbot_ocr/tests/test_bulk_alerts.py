@@ -0,0 +1,96 @@
+"""
+Unit tests for bulk alert computation in the chatbot_ocr app.
+Covers allergy name encoding, seasonal and forecast regions, re-runs, chunking
+and the compute_alerts command.
+"""
+import shutil
+import tempfile
+from datetime import date
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from chatbot_ocr.bulk_alerts import DUST, PET, POLLEN, TREE, WEED, RAGWEED, compute_alerts, encode_allergy
+from chatbot_ocr.models import AlertOutbox, AlertSubscription
+from chatbot_ocr.pollen_grid import GridSpec, PollenGrid, PollenGridWriter
+from core_api.models import Allergy
+
+APRIL = date(2025, 4, 10)
+
+
+def outbox():
+    return {(row.user.username, row.alert_type): row.severity for row in AlertOutbox.objects.select_related('user')}
+
+
+class EncodeAllergyTest(TestCase):
+    """Test suite for encode_allergy."""
+
+    def test_keywords(self):
+        """Test that free-text allergy names map onto allergen bits."""
+        self.assertEqual(encode_allergy('Pollen'), POLLEN)
+        self.assertEqual(encode_allergy('Hay fever'), POLLEN)
+        self.assertEqual(encode_allergy('Birch pollen'), TREE)
+        self.assertEqual(encode_allergy('Weeds'), WEED | RAGWEED)
+        self.assertEqual(encode_allergy('Cat dander'), PET)
+        self.assertEqual(encode_allergy('House dust mites'), DUST)
+        self.assertEqual(encode_allergy('Tree nuts'), 0)
+        self.assertEqual(encode_allergy('Peanuts'), 0)
+
+
+class ComputeAlertsTest(TestCase):
+    """Test suite for compute_alerts and the compute_alerts command."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for username, allergies in [('pollen', ['Pollen', 'Peanuts']), ('grass', ['Grass pollen']),
+                                    ('tree', ['Tree pollen']), ('cat', ['Cat dander']),
+                                    ('dust', ['Dust mites']), ('food', ['Peanuts'])]:
+            user = User.objects.create(username=username)
+            for name in allergies:
+                Allergy.objects.create(user=user, name=name, severity='mild', symptoms='Sneezing', triggers='-')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def forecast(self):
+        writer = PollenGridWriter(self.directory, GridSpec(30.0, -80.0, 50.0, -60.0, 0.5))
+        writer.add(APRIL, 'tree pollen', [40.7], [-74.0], [10.0])
+        writer.add(APRIL, 'grass pollen', [40.7], [-74.0], [250.0])
+        writer.commit(today=APRIL)
+        for username in ('grass', 'tree'):
+            AlertSubscription.objects.create(user=User.objects.get(username=username), latitude=40.7, longitude=-74.0)
+        return PollenGrid.load(self.directory)
+
+    def test_seasonal_alerts(self):
+        """Test that without a forecast users get the season's alerts."""
+        result = compute_alerts(APRIL)
+        self.assertEqual(result, {'users': 5, 'alerts': 4})
+        self.assertEqual(outbox(), {('pollen', 'pollen'): 'high', ('grass', 'pollen'): 'high',
+                                    ('tree', 'pollen'): 'high', ('cat', 'pet_dander'): 'varies'})
+
+    def test_forecast_regions(self):
+        """Test that subscribed users get their grid cell's forecast levels."""
+        compute_alerts(APRIL, self.forecast())
+        alerts = outbox()
+        self.assertEqual(alerts[('grass', 'pollen')], 'very high')
+        self.assertNotIn(('tree', 'pollen'), alerts)
+        self.assertEqual(alerts[('pollen', 'pollen')], 'high')
+        payload = AlertOutbox.objects.get(user__username='grass').payload
+        self.assertIn('250 grains/m³', payload['description'])
+
+    def test_rerun_and_chunking(self):
+        """Test that small chunks give the same alerts and re-runs add nothing."""
+        grid = self.forecast()
+        compute_alerts(APRIL, grid, chunk_size=1, batch_size=1)
+        first = outbox()
+        compute_alerts(APRIL, grid)
+        self.assertEqual(outbox(), first)
+        self.assertEqual(AlertOutbox.objects.count(), len(first))
+
+    def test_command(self):
+        """Test that compute_alerts runs for a given date."""
+        out = StringIO()
+        with override_settings(POLLEN_GRID={'ENABLED': False}):
+            call_command('compute_alerts', date='2025-01-15', stdout=out)
+        self.assertIn('seasonal alerts only', out.getvalue())
+        self.assertEqual(outbox(), {('cat', 'pet_dander'): 'varies', ('dust', 'dust_mites'): 'moderate'})
@@ -0,0 +1,109 @@
+"""
+Unit tests for drug-allergy cross-reactivity in the chatbot_ocr app.
+Covers class closure, ingredient and cross-reaction risks, combination
+products, the allergy-conflicts endpoint and conflicts in the OCR response.
+"""
+import io
+from unittest import mock
+from django.contrib.auth.models import User
+from django.test import TestCase
+from PIL import Image
+from rest_framework.test import APIClient
+from chatbot_ocr.cross_reactivity import get_cross_reactivity
+from core_api.models import Allergy
+
+
+def risks(conflicts):
+    return {conflict['medication']: conflict['risk'] for conflict in conflicts}
+
+
+class CrossReactivityTest(TestCase):
+    """Test suite for the CrossReactivity engine."""
+
+    def setUp(self):
+        self.engine = get_cross_reactivity()
+
+    def test_class_allergy_covers_subclasses(self):
+        """Test that a penicillin allergy flags aminopenicillins and brand names."""
+        conflicts = self.engine.check(['Penicillin'], ['Amoxil 500 mg', 'dicloxacillin', 'azithromycin'])
+        self.assertEqual(risks(conflicts), {'Amoxil 500 mg': 'high', 'dicloxacillin': 'high'})
+        self.assertEqual(conflicts[0]['ingredient'], 'amoxicillin')
+
+    def test_cross_reactions(self):
+        """Test that cross-reactive classes are flagged at their own risk level."""
+        conflicts = self.engine.check(['amoxicillin allergy'], ['amoxicillin', 'Keflex', 'ceftriaxone', 'aztreonam'])
+        self.assertEqual(risks(conflicts), {'amoxicillin': 'direct', 'Keflex': 'moderate', 'ceftriaxone': 'low'})
+
+    def test_within_class_risk(self):
+        """Test that class members are flagged unless the class is only an umbrella."""
+        self.assertEqual(risks(self.engine.check(['ibuprofen'], ['naproxen', 'celecoxib'])),
+                         {'naproxen': 'high', 'celecoxib': 'low'})
+        self.assertEqual(self.engine.check(['furosemide'], ['hydrochlorothiazide']), [])
+
+    def test_unrelated_allergies(self):
+        """Test that food allergies and unknown medications give no conflicts."""
+        self.assertEqual(self.engine.check(['peanuts', 'sulfa'], ['vitamin d', 'amoxicillin']), [])
+
+    def test_combination_products(self):
+        """Test that a combination product is checked for every one of its ingredients."""
+        self.assertEqual(risks(self.engine.check(['acetaminophen'], ['Percocet 5/325', 'Norco', 'OxyContin'])),
+                         {'Percocet 5/325': 'direct', 'Norco': 'direct'})
+        self.assertEqual(risks(self.engine.check(['trimethoprim'], ['Bactrim DS'])), {'Bactrim DS': 'direct'})
+        conflicts = self.engine.check(['Augmentin'], ['clavulanic acid', 'ampicillin'])
+        self.assertEqual(risks(conflicts), {'clavulanic acid': 'direct', 'ampicillin': 'high'})
+        conflicts = self.engine.check(['beta-lactam'], ['Zosyn'])
+        self.assertEqual(conflicts[0]['ingredients'], ['piperacillin'])
+
+
+class AllergyConflictsViewTest(TestCase):
+    """Test suite for the allergy_conflicts_api view and the OCR response."""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def post(self, data):
+        return self.client.post('/api/chatbot/allergy-conflicts/', data, format='json')
+
+    def test_conflicts(self):
+        """Test that conflicts and unrecognized medications are reported."""
+        response = self.post({'allergies': ['sulfa'], 'medications': ['Bactrim DS', 'Lasix 40mg', 'mystery']})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['has_conflicts'])
+        self.assertEqual(risks(response.data['conflicts']), {'Bactrim DS': 'high', 'Lasix 40mg': 'low'})
+        self.assertEqual(response.data['unrecognized_medications'], ['mystery'])
+        self.assertEqual(response.data['unrecognized_allergies'], [])
+
+    def test_unrecognized_allergies(self):
+        """Test that allergies the data does not know are reported rather than read as no conflict."""
+        response = self.post({'allergies': ['peanuts', 'penicillin'], 'medications': ['ibuprofen']})
+        self.assertFalse(response.data['has_conflicts'])
+        self.assertEqual(response.data['unrecognized_allergies'], ['peanuts'])
+
+    def test_user_allergy_records(self):
+        """Test that a signed-in user's Allergy records are used."""
+        user = User.objects.create_user(username='patient', password='secret')
+        Allergy.objects.create(user=user, name='Penicillin', severity='severe', symptoms='Hives', triggers='Antibiotics')
+        self.client.force_authenticate(user)
+        response = self.post({'medications': ['ampicillin']})
+        self.assertEqual(response.data['allergies'], ['Penicillin'])
+        self.assertEqual(response.data['conflicts'][0]['risk'], 'high')
+
+    def test_validation(self):
+        """Test that missing allergies or a malformed medication list are rejected."""
+        self.assertEqual(self.post({'medications': ['ampicillin']}).status_code, 400)
+        self.assertEqual(self.post({'allergies': ['sulfa'], 'medications': 'ampicillin'}).status_code, 400)
+
+    def test_ocr_response_includes_conflicts(self):
+        """Test that medications read from a label are checked against the allergies sent."""
+        image = io.BytesIO()
+        Image.new('L', (10, 10)).save(image, format='PNG')
+        image.seek(0)
+        image.name = 'label.png'
+        text = 'Cephalexin 500 mg capsules\nTake one capsule four times daily'
+        with mock.patch('chatbot_ocr.views.pytesseract.image_to_string', return_value=text), \
+                mock.patch('chatbot_ocr.views.pytesseract.image_to_data', return_value={}), \
+                mock.patch('chatbot_ocr.views.llm_available', return_value=False):
+            response = self.client.post('/api/chatbot/ocr/', {'image': image, 'allergies': 'amoxicillin, peanuts'},
+                                        format='multipart')
+        self.assertIn('cephalexin', response.data['detected_medications'])
+        self.assertEqual(response.data['allergy_conflicts'][0]['risk'], 'moderate')
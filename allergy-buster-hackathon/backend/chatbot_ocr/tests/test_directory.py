@@ -0,0 +1,115 @@
+"""
+Unit tests for the provider directory in the chatbot_ocr app.
+Covers geohash cell covers and distances, radius and specialty search,
+pagination, the antimeridian and the nearby_doctors endpoint.
+"""
+import math
+import random
+from django.test import TestCase
+from rest_framework.test import APIClient
+from chatbot_ocr.directory import nearby_providers
+from chatbot_ocr.geo import covering_cells, geohash, haversine_miles
+from chatbot_ocr.models import HealthcareProvider
+
+NYC = (40.7128, -74.0060)
+
+
+def offset(origin, miles_north, miles_east):
+    """A point roughly the given miles north and east of origin."""
+    latitude = origin[0] + miles_north / 69.05
+    return latitude, origin[1] + miles_east / (69.05 * math.cos(math.radians(latitude)))
+
+
+def provider(npi, point, kind='doctor', taxonomy='207K00000X', **fields):
+    return HealthcareProvider.objects.create(npi=npi, kind=kind, name=f'Provider {npi}', taxonomy=taxonomy,
+                                             latitude=point[0], longitude=point[1], **fields)
+
+
+class GeoTest(TestCase):
+    """Test suite for the geo helpers."""
+
+    def test_haversine(self):
+        """Test that distances match known city pairs."""
+        self.assertAlmostEqual(float(haversine_miles(*NYC, [34.0522], [-118.2437])[0]), 2445, delta=5)
+
+    def test_cells_cover_the_circle(self):
+        """Test that every point within the radius falls in one of the covering cells."""
+        rng = random.Random(5)
+        for latitude, longitude, miles in [(*NYC, 10), (0.0, 179.99, 30), (64.1, -21.9, 100), (-33.9, 151.2, 2)]:
+            cells = covering_cells(latitude, longitude, miles)
+            self.assertLessEqual(len(cells), 16)
+            for _ in range(300):
+                north, east = rng.uniform(-0.7, 0.7) * miles, rng.uniform(-0.7, 0.7) * miles
+                point = offset((latitude, longitude), north, east)
+                point = (point[0], (point[1] + 180) % 360 - 180)
+                self.assertTrue(geohash(*point, 9).startswith(tuple(cells)), (latitude, longitude, miles, point))
+
+
+class NearbyProvidersTest(TestCase):
+    """Test suite for nearby_providers."""
+
+    def setUp(self):
+        provider('1', offset(NYC, 1, 0))
+        provider('2', offset(NYC, 0, -4))
+        provider('3', offset(NYC, 8, 8))
+        provider('4', offset(NYC, 0.5, 0.5), taxonomy='207N00000X', specialty='Dermatology')
+        provider('5', offset(NYC, 2, 2), kind='hospital', taxonomy='282N00000X', emergency=True)
+        provider('6', offset(NYC, 30, 0))
+
+    def npis(self, found):
+        return [p.npi for p, _ in found['results']]
+
+    def test_radius_specialty_and_order(self):
+        """Test that allergists and hospitals within the radius come back nearest first."""
+        found = nearby_providers(*NYC, 10, 'allergist')
+        self.assertEqual(self.npis(found), ['1', '5', '2'])
+        self.assertEqual(found['total'], 3)
+        self.assertAlmostEqual(found['results'][0][1], 1.0, delta=0.05)
+
+    def test_other_specialties(self):
+        """Test that specialty keywords, free text and 'any' filter doctors."""
+        self.assertEqual(self.npis(nearby_providers(*NYC, 10, 'dermatologists')), ['4', '5'])
+        self.assertEqual(self.npis(nearby_providers(*NYC, 10, 'dermatology')), ['4', '5'])
+        self.assertEqual(nearby_providers(*NYC, 50, 'any')['total'], 6)
+
+    def test_pagination(self):
+        """Test that pages split the sorted results without overlap."""
+        first = nearby_providers(*NYC, 50, 'any', page=1, page_size=4)
+        second = nearby_providers(*NYC, 50, 'any', page=2, page_size=4)
+        self.assertEqual(len(first['results']), 4)
+        self.assertEqual(self.npis(first) + self.npis(second), ['4', '1', '5', '2', '3', '6'])
+
+    def test_antimeridian(self):
+        """Test that a search near 180 degrees finds providers on both sides."""
+        provider('7', (-17.8, 179.99))
+        provider('8', (-17.8, -179.99))
+        self.assertEqual(sorted(self.npis(nearby_providers(-17.8, 179.995, 5, 'any'))), ['7', '8'])
+
+
+class NearbyDoctorsViewTest(TestCase):
+    """Test suite for the nearby_doctors view."""
+
+    def setUp(self):
+        self.client = APIClient()
+        provider('1', offset(NYC, 1, 0), city='New York', state='NY', languages=['English'])
+        provider('2', offset(NYC, 2, 2), kind='hospital', taxonomy='282N00000X', emergency=True)
+
+    def get(self, **params):
+        query = {'latitude': NYC[0], 'longitude': NYC[1], **params}
+        return self.client.get('/api/chatbot/nearby-doctors/', query)
+
+    def test_response(self):
+        """Test that doctors and hospitals are split and paged."""
+        data = self.get(page_size=1).data
+        self.assertEqual(data['total_results'], 2)
+        self.assertEqual(data['total_pages'], 2)
+        self.assertEqual(data['doctors'][0]['distance'], '1.0 miles')
+        self.assertEqual(data['location']['city'], 'New York')
+        self.assertEqual(self.get(page=2, page_size=1).data['hospitals'][0]['emergency'], True)
+
+    def test_validation(self):
+        """Test that bad coordinates, radii and pages are rejected."""
+        self.assertEqual(self.get(latitude='x').status_code, 400)
+        self.assertEqual(self.get(distance='5000').status_code, 400)
+        self.assertEqual(self.get(page='0').status_code, 400)
+        self.assertEqual(self.get(page_size='500').status_code, 400)
@@ -0,0 +1,91 @@
+"""
+Unit tests for the BM25 FAQ retrieval in the chatbot_ocr app.
+Covers ranking, match confidence, and the FAQ fast path in chat_api.
+"""
+from unittest import mock
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import providers, semantic_cache
+from chatbot_ocr.faq import BM25Index, faq_lookup
+from chatbot_ocr.tests.test_providers import FAKE_ONLY
+
+PASSAGES = [
+    {'question': 'What causes hay fever?', 'answer': 'Pollen from trees, grass and weeds.'},
+    {'question': 'What are the symptoms of hay fever?', 'answer': 'Sneezing and itchy eyes.'},
+    {'question': 'How can I reduce dust mite allergy at home?', 'answer': 'Wash bedding weekly in hot water.'},
+]
+
+
+class BM25IndexTest(SimpleTestCase):
+    """Test suite for BM25Index."""
+
+    def setUp(self):
+        self.index = BM25Index(PASSAGES)
+
+    def test_ranking(self):
+        """Test that the passage matching the question ranks first."""
+        results = self.index.search('what causes hay fever')
+        self.assertEqual(results[0][0], PASSAGES[0])
+        self.assertEqual(results[0][2], 1.0)
+        self.assertLess(results[1][2], 1.0)
+
+    def test_ranked_by_confidence(self):
+        """Test that the closest question beats a passage with a higher BM25 score."""
+        index = BM25Index(PASSAGES + [
+            {'question': 'Cats and asthma',
+             'answer': 'Cats shed dander; cats can trigger asthma, and asthma with cats needs care. Cats asthma trigger.'},
+            {'question': 'Can cats trigger asthma?', 'answer': 'Yes, for some people.'},
+        ])
+        (first, first_score, _), (second, second_score, _) = index.search('can cats trigger asthma', top_k=2)
+        self.assertEqual(first['question'], 'Can cats trigger asthma?')
+        self.assertLess(first_score, second_score)
+        self.assertEqual(index.search('can cats trigger asthma', top_k=1)[0][0], first)
+
+    def test_no_match(self):
+        """Test that unrelated or empty queries return nothing."""
+        self.assertEqual(self.index.search('weather forecast'), [])
+        self.assertEqual(self.index.search('what is it'), [])
+
+
+class FAQLookupTest(SimpleTestCase):
+    """Test suite for faq_lookup with the bundled FAQ."""
+
+    def test_confident_match_is_answered(self):
+        """Test that a close match returns the curated answer."""
+        answer, context = faq_lookup('Is cetirizine safe with alcohol?')
+        self.assertIn('drowsiness', answer)
+        self.assertEqual(context, [])
+
+    def test_partial_match_returns_context(self):
+        """Test that a loose match returns passages for the prompt instead."""
+        answer, context = faq_lookup('can i drink beer on cetirizine')
+        self.assertIsNone(answer)
+        self.assertEqual(context[0]['question'], 'Is cetirizine safe with alcohol?')
+
+
+@override_settings(LLM_PROVIDERS=FAKE_ONLY)
+class ChatFAQTest(TestCase):
+    """Test suite for the FAQ fast path in chat_api."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+
+    def test_faq_answer_skips_llm(self):
+        """Test that a confident FAQ match never calls the provider."""
+        with mock.patch('chatbot_ocr.views.generate_reply') as generate_reply:
+            response = self.client.post('/api/chatbot/chat/', {'message': 'What is anaphylaxis?'}, format='json')
+        generate_reply.assert_not_called()
+        self.assertEqual(response.data['model_used'], 'faq')
+
+    def test_faq_context_is_added_to_prompt(self):
+        """Test that related passages are injected into the LLM prompt."""
+        with mock.patch('chatbot_ocr.views.generate_reply', return_value=('ok', 'fake')) as generate_reply:
+            self.client.post('/api/chatbot/chat/', {'message': 'can i drink beer on cetirizine'}, format='json')
+        prompt = generate_reply.call_args[0][0]
+        self.assertIn('Is cetirizine safe with alcohol?', prompt)
@@ -0,0 +1,88 @@
+"""
+Unit tests for the allergen-free food index in the chatbot_ocr app.
+Covers allergy normalisation, bitmask filtering, meal plans, and the local
+path of dietary_suggestions.
+"""
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import providers, semantic_cache
+from chatbot_ocr.food_index import get_food_index, food_suggestions
+from chatbot_ocr.tests.test_providers import FAKE_ONLY
+
+
+class FoodIndexTest(SimpleTestCase):
+    """Test suite for FoodIndex."""
+
+    def setUp(self):
+        self.index = get_food_index()
+
+    def test_allergy_aliases(self):
+        """Test that common names map to allergen bits and unknown ones are kept."""
+        mask, unrecognized = self.index.allergy_mask(['Dairy', 'shellfish', 'Peanuts', 'kiwi'])
+        self.assertEqual(self.index.allergen_names(mask), ['crustaceans', 'milk', 'molluscs', 'peanuts'])
+        self.assertEqual(unrecognized, ['kiwi'])
+
+    def test_safe_foods_exclude_allergens(self):
+        """Test that no safe recipe or alternative contains a listed allergen."""
+        result = food_suggestions(['milk', 'soy', 'gluten'])
+        recipes = {recipe['name']: recipe for recipe in self.index.recipes}
+        self.assertTrue(result['safe_foods'])
+        for name in result['safe_foods']:
+            self.assertFalse({'milk', 'soy', 'gluten'} & set(recipes[name]['allergens']), name)
+        alternatives = ' '.join(result['safe_alternatives'])
+        self.assertIn('Rice milk', alternatives)
+        self.assertNotIn('Soy milk', alternatives)
+        self.assertNotIn('Oat milk', alternatives)
+
+    def test_unrecognized_allergies_filter_by_ingredient(self):
+        """Test that allergies outside the 14 majors exclude recipes by ingredient."""
+        result = food_suggestions(['strawberry'])
+        self.assertNotIn('Fresh fruit salad', result['safe_foods'])
+        self.assertIn('Anything containing strawberry', result['foods_to_avoid'])
+
+    def test_meal_plan_and_diet(self):
+        """Test the 3-day plan covers every meal and honours vegan preferences."""
+        result = food_suggestions(['eggs'], 'vegan please')
+        self.assertEqual(len(result['meal_plan']), 12)
+        vegan = {recipe['name'] for recipe in self.index.recipes if 'vegan' in recipe['tags']}
+        self.assertTrue(set(result['safe_foods']) <= vegan)
+        self.assertTrue(result['shopping_list'])
+
+    def test_every_combination_is_fast(self):
+        """Test that any allergen combination is answered in about a millisecond."""
+        started = time.perf_counter()
+        for mask in range(0, 1 << 14, 37):
+            self.index.suggestions(mask)
+        per_call = (time.perf_counter() - started) / len(range(0, 1 << 14, 37))
+        self.assertLess(per_call, 0.002)
+
+
+class LocalDietaryEndpointTest(TestCase):
+    """Test suite for the local path of dietary_suggestions."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+
+    @override_settings(LLM_PROVIDERS=FAKE_ONLY)
+    def test_local_answer(self):
+        """Test that suggestions come from the index without an LLM call."""
+        response = self.client.post('/api/chatbot/dietary-suggestions/', {'allergies': ['peanuts']}, format='json')
+        self.assertEqual(response.data['source'], 'local')
+        self.assertIn('## Foods to Avoid', response.data['full_suggestions'])
+        self.assertNotIn('Peanut butter toast', response.data['safe_foods'])
+
+    @override_settings(LLM_PROVIDERS=FAKE_ONLY)
+    def test_narrative_uses_llm(self):
+        """Test that a requested narrative comes from the LLM while lists stay local."""
+        response = self.client.post('/api/chatbot/dietary-suggestions/',
+                                    {'allergies': ['peanuts'], 'narrative': True}, format='json')
+        self.assertEqual(response.data['source'], 'local+llm')
+        self.assertIn('Sunflower seed butter instead of peanut butter', response.data['full_suggestions'])
+        self.assertNotIn('Peanut butter toast', response.data['safe_foods'])
@@ -0,0 +1,84 @@
+"""
+Unit tests for the hedged LLM call layer in the chatbot_ocr app.
+Covers latency percentiles, the hedge budget, and winner selection in HedgedCaller.
+"""
+import time
+from django.test import SimpleTestCase
+from chatbot_ocr.hedging import LatencyTracker, HedgeBudget, HedgedCaller
+
+
+def slow(value, seconds):
+    """Return a callable that sleeps before returning value."""
+    def run():
+        time.sleep(seconds)
+        return value
+    return run
+
+
+def failing():
+    raise RuntimeError('provider down')
+
+
+class LatencyTrackerTest(SimpleTestCase):
+    """Test suite for LatencyTracker."""
+
+    def test_percentile(self):
+        """Test percentiles over the recorded window."""
+        tracker = LatencyTracker(window=100)
+        self.assertIsNone(tracker.percentile(95))
+        for i in range(1, 101):
+            tracker.record(i / 100.0)
+        self.assertAlmostEqual(tracker.percentile(50), 0.5)
+        self.assertAlmostEqual(tracker.percentile(95), 0.95)
+
+
+class HedgeBudgetTest(SimpleTestCase):
+    """Test suite for HedgeBudget."""
+
+    def test_budget_caps_hedges(self):
+        """Test that hedges never exceed the configured fraction."""
+        budget = HedgeBudget(fraction=0.1, window=100)
+        allowed = 0
+        for _ in range(100):
+            if budget.try_acquire():
+                allowed += 1
+        self.assertLessEqual(allowed, 10)
+        self.assertGreater(allowed, 0)
+
+
+class HedgedCallerTest(SimpleTestCase):
+    """Test suite for HedgedCaller."""
+
+    def test_fast_primary_is_not_hedged(self):
+        """Test that a primary answering within the delay wins without a hedge."""
+        caller = HedgedCaller(max_delay=0.5, budget_fraction=1.0)
+        result = caller.call(('gemini', lambda: 'a'), ('mistral', lambda: 'b'))
+        self.assertEqual(result, ('a', 'gemini'))
+
+    def test_slow_primary_is_hedged(self):
+        """Test that the secondary wins when the primary is slow."""
+        caller = HedgedCaller(max_delay=0.05, budget_fraction=1.0)
+        started = time.monotonic()
+        result = caller.call(('gemini', slow('a', 1.0)), ('mistral', lambda: 'b'))
+        self.assertEqual(result, ('b', 'mistral'))
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_hedge_denied_waits_for_primary(self):
+        """Test that without budget the primary result is returned."""
+        caller = HedgedCaller(max_delay=0.05, budget_fraction=0.0)
+        result = caller.call(('gemini', slow('a', 0.2)), ('mistral', lambda: 'b'))
+        self.assertEqual(result, ('a', 'gemini'))
+
+    def test_failed_primary_falls_back(self):
+        """Test that a failing primary falls back to the secondary."""
+        caller = HedgedCaller(max_delay=0.5, budget_fraction=0.0)
+        result = caller.call(('gemini', failing), ('mistral', lambda: 'b'))
+        self.assertEqual(result, ('b', 'mistral'))
+
+    def test_hedge_delay_uses_percentile(self):
+        """Test that the delay tracks the latency percentile within bounds."""
+        caller = HedgedCaller(percentile=90, min_delay=0.1, max_delay=2.0, min_samples=10)
+        self.assertEqual(caller.hedge_delay(), 2.0)
+        for _ in range(20):
+            caller.latencies.record(0.3)
+        self.assertAlmostEqual(caller.hedge_delay(), 0.3)
@@ -0,0 +1,149 @@
+"""
+Unit tests for the import_providers command in the chatbot_ocr app.
+Covers NPPES row normalization, ZIP geocoding, skipped rows, upserts on
+re-import, removal of deactivated NPIs and reading from a dissemination zip.
+"""
+import csv
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+from chatbot_ocr.geo import geohash
+from chatbot_ocr.management.commands.import_providers import format_phone, title
+from chatbot_ocr.models import HealthcareProvider
+
+HEADER = ['NPI', 'Entity Type Code', 'Provider Organization Name (Legal Business Name)',
+          'Provider Last Name (Legal Name)', 'Provider First Name', 'Provider Credential Text',
+          'Provider First Line Business Practice Location Address',
+          'Provider Business Practice Location Address City Name',
+          'Provider Business Practice Location Address State Name',
+          'Provider Business Practice Location Address Postal Code',
+          'Provider Business Practice Location Address Telephone Number', 'NPI Deactivation Date',
+          'NPI Reactivation Date', 'Healthcare Provider Taxonomy Code_1', 'Healthcare Provider Primary Taxonomy Switch_1',
+          'Healthcare Provider Taxonomy Code_2', 'Healthcare Provider Primary Taxonomy Switch_2']
+
+ROWS = [
+    ['1000000001', '1', '', 'SMITH', 'JANE', 'M.D.', '10 MAIN ST', 'NEW YORK', 'NY', '100011234', '2125551234',
+     '', '', '207Q00000X', 'N', '207K00000X', 'Y'],
+    ['1000000002', '2', 'MOUNT SINAI HOSPITAL', '', '', '', '1 GUSTAVE L LEVY PL', 'NEW YORK', 'NY', '10029',
+     '2122416500', '', '', '282N00000X', 'Y', '', ''],
+    # Deactivated, unknown ZIP and filtered-out taxonomy
+    ['1000000003', '1', '', 'DOE', 'JOHN', 'MD', '5 ELM ST', 'NEW YORK', 'NY', '10001', '', '01/01/2020', '',
+     '207K00000X', 'Y', '', ''],
+    ['1000000004', '1', '', 'ROE', 'RICHARD', 'MD', '9 OAK ST', 'NOWHERE', 'ZZ', '99999', '', '', '',
+     '207K00000X', 'Y', '', ''],
+    ['1000000005', '1', '', 'POE', 'EDGAR', 'DDS', '7 PINE ST', 'NEW YORK', 'NY', '10001', '', '', '',
+     '1223G0001X', 'Y', '', ''],
+]
+
+
+class NormalizeTest(TestCase):
+    """Test suite for the import_providers normalization helpers."""
+
+    def test_title_and_phone(self):
+        """Test that names are title-cased and phone numbers formatted."""
+        self.assertEqual(title('  SMITH-JONES  ENT PLLC '), 'Smith-Jones ENT PLLC')
+        self.assertEqual(title("O'BRIEN"), "O'Brien")
+        self.assertEqual(title("CHILDREN'S HOSPITAL"), "Children's Hospital")
+        self.assertEqual(format_phone('212-555-1234'), '(212) 555-1234')
+        self.assertEqual(format_phone('44 20 7946 0000'), '442079460000')
+
+
+class ImportProvidersTest(TestCase):
+    """Test suite for the import_providers command."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.centroids = os.path.join(self.directory, 'zcta.txt')
+        with open(self.centroids, 'w') as f:
+            f.write('GEOID\tALAND\tINTPTLAT\tINTPTLONG\n10001\t1\t40.750633\t-73.997177\n'
+                    '10029\t1\t40.791763\t-73.943970\n')
+        self.source = self.write_csv(ROWS)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_csv(self, rows, name='npidata_pfile_20250101-20250107.csv'):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, source, **options):
+        out = StringIO()
+        call_command('import_providers', source, zip_centroids=self.centroids, stdout=out, **options)
+        return out.getvalue()
+
+    def test_import(self):
+        """Test that rows are normalized, geocoded and skipped when unusable."""
+        out = self.run_import(self.source, taxonomy='207K,282N', batch_size=1)
+        self.assertIn('Imported 2 providers from 5 rows (2 skipped) and removed 0 deactivated', out)
+        self.assertIn('rows/s', out)
+        doctor = HealthcareProvider.objects.get(npi='1000000001')
+        self.assertEqual(doctor.name, 'Jane Smith, MD')
+        self.assertEqual(doctor.taxonomy, '207K00000X')
+        self.assertEqual(doctor.specialty, 'Allergist / Immunologist')
+        self.assertEqual((doctor.postal_code, doctor.phone), ('10001', '(212) 555-1234'))
+        self.assertEqual(doctor.geohash, geohash(40.750633, -73.997177, 9))
+        hospital = HealthcareProvider.objects.get(npi='1000000002')
+        self.assertEqual((hospital.kind, hospital.name), ('hospital', 'Mount Sinai Hospital'))
+
+    def test_reimport_updates(self):
+        """Test that importing again updates providers in place by NPI."""
+        self.run_import(self.source)
+        last_week = timezone.now() - timedelta(days=7)
+        HealthcareProvider.objects.filter(npi='1000000001').update(rating=4.5, updated_at=last_week)
+        moved = [ROWS[0][:9] + ['10029'] + ROWS[0][10:]]
+        self.run_import(self.write_csv(moved, 'update.csv'))
+        doctor = HealthcareProvider.objects.get(npi='1000000001')
+        self.assertEqual(HealthcareProvider.objects.count(), 3)
+        self.assertEqual(doctor.postal_code, '10029')
+        self.assertEqual(doctor.geohash, geohash(40.791763, -73.943970, 9))
+        self.assertEqual(doctor.rating, 4.5)
+        self.assertGreater(doctor.updated_at, last_week)
+
+    def test_deactivated_providers_are_removed(self):
+        """Test that a provider whose NPI is deactivated is deleted on the next import."""
+        active = [ROWS[2][:11] + ['', ''] + ROWS[2][13:]]
+        self.run_import(self.write_csv(active, 'active.csv'))
+        self.assertTrue(HealthcareProvider.objects.filter(npi='1000000003').exists())
+        out = self.run_import(self.source, batch_size=2)
+        self.assertIn('removed 1 deactivated', out)
+        self.assertFalse(HealthcareProvider.objects.filter(npi='1000000003').exists())
+        self.assertEqual(HealthcareProvider.objects.count(), 3)
+
+    def test_many_deactivated_providers(self):
+        """Test that more deactivated NPIs than one DELETE can bind are removed in chunks."""
+        npis = [str(2000000000 + i) for i in range(1200)]
+        HealthcareProvider.objects.bulk_create([
+            HealthcareProvider(npi=npi, kind='doctor', name='Doctor', latitude=40.75, longitude=-74.0,
+                               geohash=geohash(40.75, -74.0, 9)) for npi in npis])
+        deactivated = [[npi] + ROWS[2][1:] for npi in npis]
+        out = self.run_import(self.write_csv(deactivated, 'deactivated.csv'))
+        self.assertIn('removed 1200 deactivated', out)
+        self.assertFalse(HealthcareProvider.objects.filter(npi__in=npis[:500]).exists())
+
+    def test_zip_source(self):
+        """Test that the npidata file is read from an NPPES zip."""
+        archive = os.path.join(self.directory, 'NPPES_Data_Dissemination.zip')
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('npidata_pfile_20250101-20250107_fileheader.csv', ','.join(HEADER))
+            z.write(self.source, os.path.basename(self.source))
+        self.assertIn('Imported 3 providers', self.run_import(archive))
+
+    def test_errors(self):
+        """Test that missing files and bad lookup tables are rejected."""
+        with self.assertRaises(CommandError):
+            self.run_import(os.path.join(self.directory, 'missing.csv'))
+        with open(self.centroids, 'w') as f:
+            f.write('postcode,lat,lng\n10001,40.7,-74.0\n')
+        with self.assertRaises(CommandError):
+            self.run_import(self.source)
@@ -0,0 +1,166 @@
+"""
+Unit tests for the local drug interaction graph in the chatbot_ocr app.
+Covers ingredient and class edges, the import_interactions command, and
+drug_interactions and the interaction matrix answering without RxNav or
+the LLM.
+"""
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from chatbot_ocr import interaction_graph, rxnorm
+from chatbot_ocr.interaction_graph import InteractionGraph
+from chatbot_ocr.models import RxConcept, RxRelation
+from chatbot_ocr.tests.test_rxnav_cache import CACHES
+from chatbot_ocr.tests.test_rxnorm import OFFLINE
+
+WARFARIN, ASPIRIN, IBUPROFEN, CETIRIZINE, DIPHENHYDRAMINE = '11289', '1191', '5640', '20610', '3498'
+MONTELUKAST, ZYRTEC = '88249', '58930'
+
+
+def bundled_graph():
+    config = settings.INTERACTION_GRAPH
+    return InteractionGraph.from_csv(config['CLASSES'], config['INTERACTIONS'])
+
+
+class InteractionGraphTest(TestCase):
+    """Test suite for InteractionGraph lookups and the import command."""
+
+    def setUp(self):
+        self.graph = bundled_graph()
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_ingredient_and_class_edges(self):
+        """Test that a pair gets both its ingredient and class interactions."""
+        found = self.graph.interactions([ASPIRIN, IBUPROFEN])
+        levels = sorted(interaction['level'] for interaction in found[(ASPIRIN, IBUPROFEN)])
+        self.assertEqual(levels, ['class', 'ingredient'])
+
+        bleeding = self.graph.interactions([WARFARIN, IBUPROFEN])[(WARFARIN, IBUPROFEN)]
+        self.assertEqual(bleeding[0]['severity'], 'severe')
+        self.assertEqual(bleeding[0]['classes'], ['Anticoagulants', 'NSAIDs'])
+
+    def test_pairs_are_order_independent(self):
+        """Test that a pair is found whichever way round it is given."""
+        forward = self.graph.interactions([CETIRIZINE, DIPHENHYDRAMINE])[(CETIRIZINE, DIPHENHYDRAMINE)]
+        backward = self.graph.interactions([DIPHENHYDRAMINE, CETIRIZINE])[(DIPHENHYDRAMINE, CETIRIZINE)]
+        self.assertEqual([i['description'] for i in forward], [i['description'] for i in backward])
+
+    def test_unknown_and_non_interacting(self):
+        """Test that unknown RxCUIs and pairs without edges are left out."""
+        self.assertFalse(self.graph.has('999999'))
+        self.assertEqual(self.graph.interactions([CETIRIZINE, MONTELUKAST, '999999']), {})
+
+    def test_import_command_round_trip(self):
+        """Test that import_interactions writes arrays that load back identically."""
+        output = os.path.join(self.directory, 'graph.npz')
+        call_command('import_interactions', output=output, stdout=StringIO())
+        loaded = InteractionGraph.load(output)
+        self.assertEqual(loaded.interactions([WARFARIN, ASPIRIN, IBUPROFEN]),
+                         self.graph.interactions([WARFARIN, ASPIRIN, IBUPROFEN]))
+
+    def test_import_rejects_bad_severity(self):
+        """Test that an unknown severity stops the import."""
+        path = os.path.join(self.directory, 'interactions.csv')
+        with open(path, 'w') as f:
+            f.write('level,a,b,severity,description\ningredient,1191,5640,catastrophic,Bad row\n')
+        with self.assertRaises(CommandError):
+            call_command('import_interactions', interactions=path,
+                         output=os.path.join(self.directory, 'graph.npz'), stdout=StringIO())
+
+
+@override_settings(RXNORM=OFFLINE, CACHES=CACHES)
+class LocalInteractionViewsTest(TestCase):
+    """Test suite for drug_interactions and the matrix using the local graph."""
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['rxnav'].clear()
+        interaction_graph._graph = None
+        for i, (rxcui, tty, name) in enumerate([
+            (WARFARIN, 'IN', 'warfarin'), (ASPIRIN, 'IN', 'aspirin'), (IBUPROFEN, 'IN', 'ibuprofen'),
+            (CETIRIZINE, 'IN', 'cetirizine'), (DIPHENHYDRAMINE, 'IN', 'diphenhydramine'),
+            (MONTELUKAST, 'IN', 'montelukast'), (ZYRTEC, 'BN', 'Zyrtec'), ('424242', 'IN', 'obscurol'),
+        ]):
+            RxConcept.objects.create(rxaui=f'A{i}', rxcui=rxcui, tty=tty, name=name, normalized_name=name.lower())
+        RxRelation.objects.create(rxcui1=CETIRIZINE, rxcui2=ZYRTEC, rela='has_tradename')
+
+    def tearDown(self):
+        caches['rxnav'].clear()
+        interaction_graph._graph = None
+
+    def check(self, med1, med2):
+        return self.client.get('/api/chatbot/drug-interactions/', {'med1': med1, 'med2': med2}).data
+
+    def test_known_pair_answered_locally(self):
+        """Test that a known pair is answered from the graph."""
+        data = self.check('warfarin', 'aspirin')
+        self.assertTrue(data['has_interactions'])
+        self.assertTrue(all(i['source'] == interaction_graph.SOURCE_NAME for i in data['interactions']))
+
+    def test_known_pair_without_edge_falls_back(self):
+        """Test that a pair the graph has no edge for is not reported as safe."""
+        with patch('chatbot_ocr.views.get_interactions_from_gemini', return_value=Response({})) as llm:
+            self.check('cetirizine', 'montelukast')
+        llm.assert_called_once_with('cetirizine', 'montelukast')
+
+    def test_graph_negative_goes_to_rxnav(self):
+        """Test that with RxNav enabled a graph miss is checked there."""
+        with override_settings(RXNORM=dict(OFFLINE, REMOTE_FALLBACK=True)), \
+                patch('chatbot_ocr.views.interaction_list', return_value={}) as get, \
+                patch('chatbot_ocr.views.get_interactions_from_gemini', return_value=Response({})) as llm:
+            self.check('cetirizine', 'montelukast')
+        get.assert_called_once()
+        llm.assert_called_once()
+
+    def test_unknown_ingredient_is_not_substituted(self):
+        """Test that an ingredient outside the graph never borrows a co-ingredient's edges."""
+        RxConcept.objects.create(rxaui='B1', rxcui='8163', tty='IN', name='pseudoephedrine',
+                                 normalized_name='pseudoephedrine')
+        RxConcept.objects.create(rxaui='B2', rxcui='1020477', tty='SCD', name='cetirizine / pseudoephedrine',
+                                 normalized_name='cetirizine / pseudoephedrine')
+        RxRelation.objects.create(rxcui1='1020477', rxcui2=CETIRIZINE, rela='has_ingredient')
+        RxRelation.objects.create(rxcui1='1020477', rxcui2='8163', rela='has_ingredient')
+        self.assertEqual(interaction_graph.graph_ingredients(bundled_graph(), '8163'), [])
+        self.assertEqual(interaction_graph.graph_ingredients(bundled_graph(), '1020477'), [CETIRIZINE])
+        with patch('chatbot_ocr.views.get_interactions_from_gemini', return_value=Response({})) as llm:
+            self.check('pseudoephedrine', 'diphenhydramine')
+        llm.assert_called_once()
+
+    def test_brand_maps_to_ingredient(self):
+        """Test that a brand name is checked through its ingredients."""
+        data = self.check('Zyrtec', 'diphenhydramine')
+        self.assertTrue(data['has_interactions'])
+        self.assertEqual(data['interactions'][0]['level'], 'ingredient')
+
+    def test_unknown_ingredient_falls_back(self):
+        """Test that an ingredient missing from the graph still goes to the LLM fallback."""
+        with patch('chatbot_ocr.views.get_interactions_from_gemini', return_value=Response({})) as llm:
+            self.check('obscurol', 'aspirin')
+        llm.assert_called_once_with('obscurol', 'aspirin')
+
+    def test_matrix_without_rxnav(self):
+        """Test that the matrix is built from the graph without calling RxNav."""
+        with patch.object(rxnorm, 'rxnav_get') as get:
+            response = self.client.post('/api/chatbot/drug-interactions/matrix/',
+                                        {'medications': ['warfarin', 'ibuprofen', 'Zyrtec', 'diphenhydramine']},
+                                        format='json')
+        get.assert_not_called()
+        matrix = response.data['matrix']
+        self.assertEqual(matrix[0][1], 'severe')
+        self.assertEqual(matrix[2][3], 'moderate')
+        self.assertIsNone(matrix[0][2])
+        # Without RxNav, pairs the graph has no edge for are not vouched for
+        self.assertFalse(response.data['complete'])
+        self.assertIn(['warfarin', 'Zyrtec'], response.data['unchecked'])
+        self.assertNotIn(['warfarin', 'ibuprofen'], response.data['unchecked'])
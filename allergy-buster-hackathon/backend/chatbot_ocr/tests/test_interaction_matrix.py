@@ -0,0 +1,147 @@
+"""
+Unit tests for the drug interaction matrix endpoint in the chatbot_ocr app.
+Covers batched and concurrent name resolution with a deadline, pair
+deduplication, the severity matrix and request validation.
+"""
+import time
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import rxnorm
+from chatbot_ocr.models import RxConcept
+from chatbot_ocr.rxnorm import resolve_rxcuis
+from chatbot_ocr.tests.test_rxnav_cache import CACHES, ONLINE
+
+REMOTE_IDS = {'warfarin': '11289', 'aspirin': '1191', 'ibuprofen': '5640'}
+
+
+def interaction_type(rxcui1, rxcui2, description, severity='N/A'):
+    return {
+        'minConcept': [{'rxcui': rxcui1}, {'rxcui': rxcui2}],
+        'interactionPair': [{'description': description, 'severity': severity}],
+    }
+
+
+INTERACTIONS = {'fullInteractionTypeGroup': [{
+    'sourceName': 'DrugBank',
+    'fullInteractionType': [
+        interaction_type('11289', '1191', 'Increased risk of bleeding.'),
+        # The same pair reported in the other direction
+        interaction_type('1191', '11289', 'Increased risk of bleeding.'),
+        interaction_type('1191', '5640', 'Reduced antiplatelet effect.'),
+    ],
+}, {
+    'sourceName': 'ONCHigh',
+    'fullInteractionType': [
+        interaction_type('11289', '5640', 'Serious bleeding risk.', severity='high'),
+    ],
+}]}
+
+
+def fake_rxnav(path, params=None):
+    if path == 'rxcui.json':
+        time.sleep(0.2)
+        rxcui = REMOTE_IDS.get(params['name'].lower())
+        return {'idGroup': {'rxnormId': [rxcui] if rxcui else []}}
+    return INTERACTIONS
+
+
+# These tests cover the RxNav path; the local graph has its own tests
+@override_settings(RXNORM=dict(ONLINE, MAX_MEDICATIONS=20, RESOLVE_WORKERS=8), CACHES=CACHES,
+                   INTERACTION_GRAPH={'ENABLED': False})
+class DrugInteractionMatrixTest(TestCase):
+    """Test suite for the drug_interaction_matrix view."""
+
+    def setUp(self):
+        self.client = APIClient()
+        caches['rxnav'].clear()
+        RxConcept.objects.create(rxaui='A1', rxcui='20610', tty='IN', name='cetirizine',
+                                 normalized_name='cetirizine')
+
+    def tearDown(self):
+        caches['rxnav'].clear()
+
+    def post(self, medications):
+        return self.client.post('/api/chatbot/drug-interactions/matrix/', {'medications': medications},
+                                format='json')
+
+    def test_resolve_rxcuis_concurrently(self):
+        """Test that local names skip RxNav and remote lookups run in parallel."""
+        names = ['Cetirizine', 'warfarin', 'aspirin', 'ibuprofen', 'unknown a', 'unknown b']
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav) as get:
+            started = time.monotonic()
+            rxcuis = resolve_rxcuis(names)
+            elapsed = time.monotonic() - started
+        self.assertEqual(rxcuis['Cetirizine'], '20610')
+        self.assertEqual(rxcuis['warfarin'], '11289')
+        self.assertIsNone(rxcuis['unknown a'])
+        self.assertEqual(get.call_count, 5)
+        self.assertLess(elapsed, 0.6)
+
+    def test_resolve_deadline(self):
+        """Test that lookups still running at the deadline raise RxNavError."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav):
+            with self.assertRaises(rxnorm.RxNavError):
+                resolve_rxcuis(['warfarin', 'aspirin'], deadline=time.monotonic() + 0.05)
+
+    def test_drug_interactions_resolves_concurrently(self):
+        """Test that drug_interactions looks up both medications at once."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav):
+            started = time.monotonic()
+            response = self.client.get('/api/chatbot/drug-interactions/', {'med1': 'warfarin', 'med2': 'aspirin'})
+            elapsed = time.monotonic() - started
+        self.assertTrue(response.data['has_interactions'])
+        self.assertLess(elapsed, 0.35)
+
+    def test_matrix(self):
+        """Test that pairs are reported once with the highest severity in the matrix."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav) as get:
+            response = self.post(['Warfarin', 'Aspirin', 'ibuprofen', 'cetirizine', 'mystery pill'])
+        self.assertEqual(response.status_code, 200)
+        # Four name lookups and a single interaction call
+        self.assertEqual(get.call_count, 5)
+        self.assertEqual(response.data['unresolved'], ['mystery pill'])
+
+        pairs = {tuple(pair['medications']): pair for pair in response.data['pairs']}
+        self.assertEqual(set(pairs), {('Warfarin', 'Aspirin'), ('Warfarin', 'ibuprofen'), ('Aspirin', 'ibuprofen')})
+        self.assertEqual(len(pairs[('Warfarin', 'Aspirin')]['interactions']), 1)
+
+        matrix = response.data['matrix']
+        self.assertEqual(matrix[0][2], 'high')
+        self.assertEqual(matrix[2][0], 'high')
+        self.assertEqual(matrix[0][1], 'moderate')
+        self.assertIsNone(matrix[0][3])
+        self.assertIsNone(matrix[0][0])
+        # RxNav says nothing about cetirizine, so its pairs are unchecked rather than clean
+        self.assertFalse(response.data['complete'])
+        self.assertIn(['Warfarin', 'cetirizine'], response.data['unchecked'])
+        self.assertIn(['cetirizine', 'mystery pill'], response.data['unchecked'])
+
+    def test_duplicate_names_collapse(self):
+        """Test that repeated names are only checked once."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav):
+            response = self.post(['aspirin', ' Aspirin ', 'warfarin'])
+        self.assertEqual([m['name'] for m in response.data['medications']], ['aspirin', 'warfarin'])
+
+    def test_validation(self):
+        """Test that too few, too many or malformed medication lists are rejected."""
+        self.assertEqual(self.post(['aspirin']).status_code, 400)
+        self.assertEqual(self.post('aspirin, warfarin').status_code, 400)
+        self.assertEqual(self.post([f'drug {i}' for i in range(21)]).status_code, 400)
+
+    def test_rxnav_unavailable(self):
+        """Test that an RxNav outage is reported as 503."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=rxnorm.RxNavError('down')):
+            response = self.post(['warfarin', 'aspirin'])
+        self.assertEqual(response.status_code, 503)
+
+    def test_interaction_list_unavailable(self):
+        """Test that RxNav failing on the interaction list is a 503, not a clean result."""
+        def resolve_only(path, params=None):
+            if path == 'rxcui.json':
+                return fake_rxnav(path, params)
+            raise rxnorm.RxNavError('down')
+        with patch.object(rxnorm, 'rxnav_get', side_effect=resolve_only):
+            response = self.post(['warfarin', 'aspirin'])
+        self.assertEqual(response.status_code, 503)
@@ -0,0 +1,162 @@
+"""
+Unit tests for the gridded pollen forecast store in the chatbot_ocr app.
+Covers CSV and .npz ingestion, incremental drops and snapshot reloads,
+retention, the ingest_pollen command and forecast-driven allergy alerts.
+"""
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import alerts, pollen_grid
+from chatbot_ocr.pollen_grid import GridSpec, PollenGrid, PollenGridWriter
+
+TODAY = date.today()
+SPEC = GridSpec(30.0, -80.0, 50.0, -60.0, 0.5)
+
+
+def write_csv(directory, name, text):
+    path = os.path.join(directory, name)
+    with open(path, 'w') as f:
+        f.write(text)
+    return path
+
+
+class PollenGridTest(TestCase):
+    """Test suite for PollenGridWriter and PollenGrid."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = os.path.join(self.directory, 'grid')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_long_csv(self):
+        """Test that long CSV rows land in the cell containing their coordinates."""
+        path = write_csv(self.directory, 'drop.csv',
+                         'date,latitude,longitude,allergen,value\n'
+                         f'{TODAY},40.71,-74.01,Tree_Pollen,250\n'
+                         f'{TODAY},40.71,-74.01,mold,7000\n'
+                         f'{TODAY},10.0,-74.0,mold,9\n')
+        writer = PollenGridWriter(self.store, SPEC)
+        self.assertEqual(writer.add_csv(path), 2)
+        writer.commit()
+
+        grid = PollenGrid.load(self.store)
+        sample = grid.sample(40.9, -74.4, TODAY)
+        self.assertEqual(sample.readings, {'tree pollen': 250.0, 'mold': 7000.0})
+        self.assertIsNone(grid.sample(40.2, -74.4, TODAY))
+        self.assertIsNone(grid.sample(40.9, -74.4, TODAY + timedelta(days=1)))
+
+    def test_wide_csv_and_npz(self):
+        """Test that wide CSV columns and NetCDF-style arrays are both read."""
+        path = write_csv(self.directory, 'wide.csv',
+                         'date,latitude,longitude,grass_pollen,ragweed\n'
+                         f'{TODAY},35.1,-70.1,30,\n')
+        npz = os.path.join(self.directory, 'drop.npz')
+        values = np.full((1, 2, 2), np.nan, dtype=np.float32)
+        values[0, 1, 0] = 42.0
+        np.savez(npz, time=np.array([TODAY.isoformat()]), latitude=np.array([45.0, 45.5]),
+                 longitude=np.array([-65.0, -64.5]), weed_pollen=values)
+        writer = PollenGridWriter(self.store, SPEC)
+        self.assertEqual(writer.add_csv(path) + writer.add_npz(npz), 2)
+        writer.commit()
+
+        grid = PollenGrid.load(self.store)
+        self.assertEqual(grid.sample(35.1, -70.1, TODAY).readings, {'grass pollen': 30.0})
+        self.assertEqual(grid.sample(45.6, -64.9, TODAY).readings, {'weed pollen': 42.0})
+
+    def test_incremental_drop_and_snapshots(self):
+        """Test that a drop keeps other days and leaves older snapshots untouched."""
+        writer = PollenGridWriter(self.store, SPEC)
+        writer.add(TODAY, 'mold', [40.0], [-70.0], [100.0])
+        writer.add(TODAY + timedelta(days=1), 'mold', [40.0], [-70.0], [200.0])
+        writer.commit()
+        before = PollenGrid.load(self.store)
+
+        writer = PollenGridWriter(self.store, SPEC)
+        writer.add(TODAY, 'mold', [40.0], [-70.0], [300.0])
+        self.assertEqual(writer.pending_days(), [TODAY])
+        self.assertEqual(writer.commit(), 2)
+
+        after = PollenGrid.load(self.store)
+        self.assertEqual(after.sample(40.0, -70.0, TODAY).readings['mold'], 300.0)
+        self.assertEqual(after.sample(40.0, -70.0, TODAY + timedelta(days=1)).readings['mold'], 200.0)
+        self.assertEqual(before.sample(40.0, -70.0, TODAY).readings['mold'], 100.0)
+
+    def test_retention(self):
+        """Test that days older than the retention window are removed."""
+        writer = PollenGridWriter(self.store, SPEC, keep_days=2)
+        old = TODAY - timedelta(days=1)
+        writer.add(old, 'mold', [40.0], [-70.0], [1.0])
+        writer.commit(today=old)
+        writer.add(TODAY + timedelta(days=1), 'mold', [40.0], [-70.0], [1.0])
+        writer.commit(today=TODAY + timedelta(days=1))
+        self.assertEqual(list(PollenGrid.load(self.store).days), [TODAY + timedelta(days=1)])
+        self.assertFalse(os.path.exists(os.path.join(self.store, f'{old}.npy')))
+
+    def test_ingest_command(self):
+        """Test that ingest_pollen writes the store and rejects a different grid."""
+        path = write_csv(self.directory, 'drop.csv',
+                         f'date,latitude,longitude,allergen,value\n{TODAY},40.0,-70.0,mold,5\n')
+        config = {'DIR': self.store, 'BOUNDS': (30.0, -80.0, 50.0, -60.0), 'RESOLUTION': 0.5, 'KEEP_DAYS': 7}
+        with override_settings(POLLEN_GRID=config):
+            call_command('ingest_pollen', path, dir=self.store, stdout=StringIO())
+        self.assertEqual(PollenGrid.load(self.store).version, 1)
+        with override_settings(POLLEN_GRID={**config, 'RESOLUTION': 1.0}):
+            with self.assertRaises(CommandError):
+                call_command('ingest_pollen', path, dir=self.store, stdout=StringIO())
+
+
+class ForecastAlertsViewTest(TestCase):
+    """Test suite for allergy_alerts driven by the pollen grid."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.directory = tempfile.mkdtemp()
+        self.settings = override_settings(POLLEN_GRID={
+            'ENABLED': True, 'DIR': self.directory, 'RELOAD_INTERVAL': 0,
+        })
+        self.settings.enable()
+        self.reset()
+
+    def tearDown(self):
+        self.settings.disable()
+        self.reset()
+        shutil.rmtree(self.directory)
+
+    def reset(self):
+        alerts._cache = None
+        pollen_grid._grid, pollen_grid._grid_checked, pollen_grid._grid_stat = None, None, None
+
+    def drop(self, tree, mold):
+        writer = PollenGridWriter(self.directory, SPEC)
+        writer.add(TODAY, 'tree pollen', [40.71], [-74.01], [tree])
+        writer.add(TODAY, 'mold', [40.71], [-74.01], [mold])
+        writer.commit()
+
+    def get(self, **headers):
+        return self.client.get('/api/chatbot/allergy-alerts/',
+                               {'latitude': '40.71', 'longitude': '-74.01', 'allergies': 'pollen,mold'}, **headers)
+
+    def test_alerts_follow_forecast(self):
+        """Test that alert severities come from the forecast levels."""
+        self.drop(tree=1600, mold=100)
+        response = self.get()
+        self.assertEqual([(a['type'], a['severity']) for a in response.data['alerts']], [('pollen', 'very high')])
+        self.assertEqual(response.data['forecast']['mold'], {'count': 100.0, 'level': 'low'})
+
+    def test_new_drop_changes_etag(self):
+        """Test that a feed drop is picked up and invalidates cached responses."""
+        self.drop(tree=20, mold=100)
+        first = self.get()
+        self.assertEqual(first.data['alerts'][0]['severity'], 'moderate')
+        self.drop(tree=200, mold=100)
+        second = self.get(HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data['alerts'][0]['severity'], 'high')
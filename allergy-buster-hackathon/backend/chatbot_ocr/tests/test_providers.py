@@ -0,0 +1,89 @@
+"""
+Unit tests for the LLM provider backends in the chatbot_ocr app.
+Covers the offline FakeProvider, provider selection from settings, and the
+LLM-backed endpoints running fully offline.
+"""
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from chatbot_ocr import providers, semantic_cache
+from chatbot_ocr.providers import FakeProvider, LLMProviderError
+
+FAKE_ONLY = {
+    'PRIMARY': 'fake',
+    'SECONDARY': 'fake',
+    'BACKENDS': {
+        'fake': {'CLASS': 'chatbot_ocr.providers.FakeProvider', 'OPTIONS': {'seed': 1}},
+    },
+}
+
+
+class FakeProviderTest(SimpleTestCase):
+    """Test suite for FakeProvider."""
+
+    def test_canned_responses(self):
+        """Test that the first matching canned response is returned."""
+        provider = FakeProvider(responses=[{'keywords': ['hay fever'], 'text': 'Pollen.'}])
+        self.assertEqual(provider.complete('What causes hay fever?'), 'Pollen.')
+        self.assertEqual(provider.complete('Something else'), FakeProvider.DEFAULT_REPLY)
+
+    def test_latency_is_deterministic(self):
+        """Test that the same seed gives the same latency draws."""
+        latency = {'distribution': 'lognormal', 'median': 0.5, 'sigma': 0.5}
+        first = FakeProvider(latency=latency, seed=7)
+        second = FakeProvider(latency=latency, seed=7)
+        self.assertEqual([first.sample_latency() for _ in range(5)],
+                         [second.sample_latency() for _ in range(5)])
+
+    def test_latency_is_applied(self):
+        """Test that calls take the configured latency."""
+        provider = FakeProvider(latency={'distribution': 'constant', 'value': 0.05})
+        started = time.monotonic()
+        provider.complete('hello')
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_error_rate(self):
+        """Test that an error rate of 1 always fails."""
+        provider = FakeProvider(error_rate=1.0)
+        with self.assertRaises(LLMProviderError):
+            provider.complete('hello')
+
+    def test_streaming(self):
+        """Test that streamed chunks reassemble into the full reply."""
+        provider = FakeProvider(responses=[{'keywords': [], 'text': 'one two three four five'}], chunk_size=2)
+        chunks = list(provider.stream('hello'))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(''.join(chunks), 'one two three four five')
+
+
+@override_settings(LLM_PROVIDERS=FAKE_ONLY)
+class OfflineEndpointTest(TestCase):
+    """Test suite for LLM-backed endpoints using the fake provider."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+
+    def test_get_providers(self):
+        """Test that providers are built from settings."""
+        primary, secondary = providers.get_providers()
+        self.assertIsInstance(primary, FakeProvider)
+        self.assertIs(primary, secondary)
+
+    def test_diagnose_symptoms_offline(self):
+        """Test that diagnose_symptoms works without network or keys."""
+        response = self.client.post('/api/chatbot/diagnose/', {'symptoms': 'sneezing and itchy eyes'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Allergic rhinitis (hay fever)', response.data['possible_conditions'])
+
+    def test_chat_offline(self):
+        """Test that chat_api works without network or keys."""
+        response = self.client.post('/api/chatbot/chat/', {'message': 'Hello'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['model_used'], 'fake')
@@ -0,0 +1,69 @@
+"""
+Unit tests for the LLM provider rate limiter in the chatbot_ocr app.
+Covers token buckets, concurrency limits, queue deadlines, and load shedding.
+"""
+import threading
+import time
+from django.test import SimpleTestCase
+from chatbot_ocr.rate_limit import TokenBucket, ProviderLimiter, RateLimitExceeded, estimate_tokens
+
+
+class TokenBucketTest(SimpleTestCase):
+    """Test suite for TokenBucket."""
+
+    def test_delay_until_refill(self):
+        """Test that an empty bucket reports the time until refill."""
+        bucket = TokenBucket(rate_per_minute=60)
+        now = bucket.updated
+        self.assertEqual(bucket.delay(60, now), 0.0)
+        bucket.take(60)
+        self.assertAlmostEqual(bucket.delay(1, now), 1.0)
+        self.assertEqual(bucket.delay(1, now + 1.0), 0.0)
+
+
+class ProviderLimiterTest(SimpleTestCase):
+    """Test suite for ProviderLimiter."""
+
+    def test_rate_limit_sheds_early(self):
+        """Test that calls the buckets cannot admit before the deadline are shed immediately."""
+        limiter = ProviderLimiter('gemini', requests_per_minute=2, queue_timeout=1.0)
+        limiter.acquire()
+        limiter.release()
+        limiter.acquire()
+        limiter.release()
+        started = time.monotonic()
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            limiter.acquire()
+        self.assertEqual(ctx.exception.reason, 'rate limit')
+        self.assertLess(time.monotonic() - started, 0.1)
+
+    def test_oversized_request_is_rejected(self):
+        """Test that a call larger than the token budget is never admitted."""
+        limiter = ProviderLimiter('gemini', tokens_per_minute=100)
+        with self.assertRaises(RateLimitExceeded):
+            limiter.acquire(estimate_tokens('x' * 400, max_tokens=100))
+
+    def test_concurrency_limit_waits_for_release(self):
+        """Test that a queued call is admitted when a slot frees up."""
+        limiter = ProviderLimiter('gemini', max_concurrent=1, queue_timeout=1.0)
+        limiter.acquire()
+        threading.Timer(0.05, limiter.release).start()
+        with limiter.slot():
+            self.assertEqual(limiter.in_flight, 1)
+        self.assertEqual(limiter.in_flight, 0)
+
+    def test_concurrency_limit_deadline(self):
+        """Test that a queued call is shed once its deadline passes."""
+        limiter = ProviderLimiter('gemini', max_concurrent=1, queue_timeout=0.05)
+        limiter.acquire()
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            limiter.acquire()
+        self.assertEqual(ctx.exception.reason, 'too many concurrent requests')
+
+    def test_queue_full(self):
+        """Test that calls beyond the queue length are shed without waiting."""
+        limiter = ProviderLimiter('gemini', max_concurrent=1, max_queue=0)
+        limiter.acquire()
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            limiter.acquire()
+        self.assertEqual(ctx.exception.reason, 'queue full')
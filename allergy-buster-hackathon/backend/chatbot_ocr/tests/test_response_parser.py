@@ -0,0 +1,111 @@
+"""
+Unit tests for the LLM response parser in the chatbot_ocr app.
+Covers markdown section parsing, JSON replies, and the structured endpoints.
+"""
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import providers, semantic_cache
+from chatbot_ocr.response_parser import DIAGNOSIS_SCHEMA, DIETARY_SCHEMA
+
+
+class ResponseSchemaTest(SimpleTestCase):
+    """Test suite for ResponseSchema."""
+
+    def test_heading_and_bullet_styles(self):
+        """Test that markdown, bold and colon headings and all bullet styles are parsed."""
+        text = (
+            "**1. Possible Allergic Conditions:**\n"
+            "1. Allergic rhinitis\n"
+            "2. **Sinusitis**, less likely\n"
+            "### Recommended next steps\n"
+            "* Skin prick test\n"
+            "Immediate relief:\n"
+            "+ Antihistamines\n"
+            "## Disclaimer\n"
+            "- Not medical advice\n"
+        )
+        sections = DIAGNOSIS_SCHEMA.parse_markdown(text)
+        self.assertEqual(sections['possible_conditions'], ['Allergic rhinitis', 'Sinusitis, less likely'])
+        self.assertEqual(sections['next_steps'], ['Skin prick test'])
+        self.assertEqual(sections['relief_suggestions'], ['Antihistamines'])
+        self.assertEqual(sections['precautions'], [])
+
+    def test_bold_bullets_are_items(self):
+        """Test that a fully bold bullet with a section keyword stays an item of its section."""
+        text = (
+            "## Possible Conditions\n"
+            "- **Allergic rhinitis**\n"
+            "- **Food allergy testing history**\n"
+            "* **Contact dermatitis**\n"
+            "1. **Eczema**\n"
+            "2. **Next steps:**\n"
+            "- Skin prick test\n"
+        )
+        sections, _ = DIAGNOSIS_SCHEMA.parse(text)
+        self.assertEqual(sections['possible_conditions'],
+                         ['Allergic rhinitis', 'Food allergy testing history', 'Contact dermatitis', 'Eczema'])
+        self.assertEqual(sections['next_steps'], ['Skin prick test'])
+
+    def test_earliest_keyword_wins(self):
+        """Test that a heading goes to the section whose keyword appears first."""
+        self.assertEqual(DIETARY_SCHEMA.classify('Safe alternatives to the foods to avoid'), 'safe_alternatives')
+        self.assertEqual(DIETARY_SCHEMA.classify('Foods to avoid and their alternatives'), 'foods_to_avoid')
+        self.assertIsNone(DIETARY_SCHEMA.classify('Introduction'))
+
+    def test_sub_headings_stay_in_section(self):
+        """Test that bold day headings inside a meal plan are kept as items."""
+        sections = DIETARY_SCHEMA.parse_markdown("## Meal Plan\n**Day 1**\n- Breakfast: oats\n")
+        self.assertEqual(sections['meal_plan'], ['Day 1', 'Breakfast: oats'])
+
+    def test_json_reply(self):
+        """Test that fenced JSON replies are parsed and rendered back to markdown."""
+        sections, text = DIETARY_SCHEMA.parse('```json\n{"foods_to_avoid": "Milk", "meal_plan": ["Oats"]}\n```')
+        self.assertEqual(sections['foods_to_avoid'], ['Milk'])
+        self.assertEqual(sections['meal_plan'], ['Oats'])
+        self.assertEqual(DIETARY_SCHEMA.parse_markdown(text), sections)
+
+    def test_invalid_json_falls_back_to_markdown(self):
+        """Test that a reply that is not valid JSON is parsed as markdown."""
+        sections, text = DIAGNOSIS_SCHEMA.parse('{not json')
+        self.assertEqual(text, '{not json')
+        self.assertEqual(sections, DIAGNOSIS_SCHEMA.empty())
+
+
+JSON_FAKE = {
+    'PRIMARY': 'fake',
+    'SECONDARY': 'fake',
+    'BACKENDS': {
+        'fake': {
+            'CLASS': 'chatbot_ocr.providers.FakeProvider',
+            'OPTIONS': {
+                'json_output': True,
+                'responses': [{
+                    'keywords': ['allergist', 'json object'],
+                    'text': 'Not JSON',
+                    'json': {'possible_conditions': ['Hay fever'], 'precautions': ['Avoid pollen']},
+                }],
+            },
+        },
+    },
+}
+
+
+class StructuredEndpointTest(TestCase):
+    """Test suite for the endpoints that return parsed sections."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+
+    @override_settings(LLM_PROVIDERS=JSON_FAKE)
+    def test_diagnosis_uses_json_mode(self):
+        """Test that providers supporting JSON are asked for it and parsed."""
+        response = self.client.post('/api/chatbot/diagnose/', {'symptoms': 'sneezing'}, format='json')
+        self.assertEqual(response.data['possible_conditions'], ['Hay fever'])
+        self.assertEqual(response.data['precautions'], ['Avoid pollen'])
+        self.assertIn('## Possible Allergic Conditions', response.data['full_analysis'])
@@ -0,0 +1,81 @@
+"""
+Unit tests for the RxNav response cache in the chatbot_ocr app.
+Covers cached name resolution, negative entries, order-independent
+interaction keys and errors not being cached.
+"""
+from unittest.mock import patch
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from chatbot_ocr import rxnorm
+from chatbot_ocr.rxnorm import RxNavError, interaction_list, related_concepts, resolve_rxcui
+
+ONLINE = {
+    'REMOTE_FALLBACK': True,
+    'BASE_URL': 'http://rxnav.invalid/REST',
+    'TIMEOUT': 0.1,
+    'CACHE_ALIAS': 'rxnav',
+    'CACHE_TTL': {'rxcui': 60, 'allrelated': 60, 'interactions': 60, 'not_found': 60},
+}
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'rxnav': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'rxnav-tests'},
+}
+
+
+def fake_rxnav(path, params=None):
+    if path == 'rxcui.json':
+        ids = ['20610'] if params['name'].lower() == 'cetirizine' else []
+        return {'idGroup': {'rxnormId': ids}}
+    if path.endswith('allrelated.json'):
+        return {'allRelatedGroup': {'conceptGroup': [
+            {'tty': 'BN', 'conceptProperties': [{'name': 'Zyrtec', 'rxcui': '58930'}]},
+        ]}}
+    return {'fullInteractionTypeGroup': [], 'rxcuis': params['rxcuis']}
+
+
+@override_settings(RXNORM=ONLINE, CACHES=CACHES)
+class RxNavCacheTest(TestCase):
+    """Test suite for cached RxNav lookups."""
+
+    def setUp(self):
+        caches['rxnav'].clear()
+
+    def tearDown(self):
+        caches['rxnav'].clear()
+
+    def test_resolve_is_cached(self):
+        """Test that a repeat lookup is answered without calling RxNav."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav) as get:
+            self.assertEqual(resolve_rxcui('Cetirizine'), '20610')
+            self.assertEqual(resolve_rxcui(' cetirizine '), '20610')
+        self.assertEqual(get.call_count, 1)
+
+    def test_unknown_name_is_cached(self):
+        """Test that an unknown name is remembered as not found."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav) as get:
+            self.assertIsNone(resolve_rxcui('not a drug'))
+            self.assertIsNone(resolve_rxcui('not a drug'))
+        self.assertEqual(get.call_count, 1)
+
+    def test_related_is_cached(self):
+        """Test that allrelated answers are cached per RxCUI."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav) as get:
+            related_concepts('20610')
+            related = related_concepts('20610')
+        self.assertEqual(related['BN'], [{'name': 'Zyrtec', 'rxcui': '58930'}])
+        self.assertEqual(get.call_count, 1)
+
+    def test_interaction_key_ignores_order(self):
+        """Test that the same RxCUIs in another order hit the cache."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav) as get:
+            interaction_list(['3498', '20610'])
+            interaction_list(['20610', '3498'])
+        self.assertEqual(get.call_count, 1)
+
+    def test_errors_are_not_cached(self):
+        """Test that an RxNav failure is retried on the next lookup."""
+        with patch.object(rxnorm, 'rxnav_get', side_effect=RxNavError('down')):
+            with self.assertRaises(RxNavError):
+                resolve_rxcui('cetirizine')
+        with patch.object(rxnorm, 'rxnav_get', side_effect=fake_rxnav):
+            self.assertEqual(resolve_rxcui('cetirizine'), '20610')
@@ -0,0 +1,160 @@
+"""
+Unit tests for the local RxNorm mirror in the chatbot_ocr app.
+Covers the streaming RRF importer, name and related-concept lookups, and
+medication_api answering without network access.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr.models import RxConcept, RxRelation
+from chatbot_ocr.rxnorm import QUERY_CHUNK, resolve_rxcui, related_concepts
+
+OFFLINE = {'REMOTE_FALLBACK': False, 'BASE_URL': 'http://rxnav.invalid/REST', 'TIMEOUT': 0.1}
+
+
+def conso_row(rxcui, rxaui, tty, name, sab='RXNORM', suppress='N'):
+    return f"{rxcui}|ENG||||||{rxaui}||||{sab}|{tty}|{rxcui}|{name}||{suppress}|4096|\n"
+
+
+def rel_row(rxcui1, rxcui2, rela, sab='RXNORM'):
+    return f"{rxcui1}|||RO|{rxcui2}|||{rela}|||{sab}||||N||\n"
+
+
+CONSO = ''.join([
+    conso_row('20610', 'A1', 'IN', 'cetirizine'),
+    conso_row('203150', 'A2', 'PIN', 'cetirizine hydrochloride'),
+    conso_row('58930', 'A3', 'BN', 'Zyrtec'),
+    conso_row('1014678', 'A4', 'SCD', 'cetirizine hydrochloride 10 MG Oral Tablet'),
+    conso_row('1014679', 'A5', 'SBD', 'cetirizine hydrochloride 10 MG Oral Tablet [Zyrtec]'),
+    conso_row('20610', 'A6', 'IN', 'Cetirizine', sab='MTHSPL'),
+    conso_row('999', 'A7', 'IN', 'retired drug', suppress='O'),
+    conso_row('3498', 'A8', 'IN', 'diphenhydramine'),
+])
+REL = ''.join([
+    rel_row('20610', '58930', 'has_tradename'),
+    rel_row('58930', '20610', 'tradename_of'),
+    rel_row('20610', '1014678', 'ingredient_of'),
+    rel_row('1014678', '1014679', 'has_tradename'),
+    rel_row('58930', '1014679', 'ingredient_of'),
+    rel_row('3498', '58930', 'not_rxnorm', sab='MTHSPL'),
+])
+
+
+def write_release(directory):
+    os.makedirs(os.path.join(directory, 'rrf'))
+    with open(os.path.join(directory, 'rrf', 'RXNCONSO.RRF'), 'w') as f:
+        f.write(CONSO)
+    with open(os.path.join(directory, 'rrf', 'RXNREL.RRF'), 'w') as f:
+        f.write(REL)
+
+
+@override_settings(RXNORM=OFFLINE)
+class RxNormImportTest(TestCase):
+    """Test suite for the import_rxnorm command and local lookups."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        write_release(self.directory)
+        call_command('import_rxnorm', self.directory, batch_size=2, stdout=StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_import_filters_rows(self):
+        """Test that only unsuppressed RxNorm-sourced rows are imported."""
+        self.assertEqual(RxConcept.objects.count(), 6)
+        self.assertEqual(RxRelation.objects.count(), 5)
+        self.assertFalse(RxConcept.objects.filter(rxcui='999').exists())
+
+    def test_import_from_zip_replaces_data(self):
+        """Test that a release zip is read directly and replaces earlier data."""
+        archive = os.path.join(self.directory, 'release.zip')
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('RxNorm_full/rrf/RXNCONSO.RRF', CONSO)
+            z.writestr('RxNorm_full/rrf/RXNREL.RRF', REL)
+        call_command('import_rxnorm', archive, stdout=StringIO())
+        self.assertEqual(RxConcept.objects.count(), 6)
+
+    def test_failed_import_keeps_previous_release(self):
+        """Test that an import failing part way leaves the existing mirror in place."""
+        archive = os.path.join(self.directory, 'no_relations.zip')
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('rrf/RXNCONSO.RRF', conso_row('1', 'B1', 'IN', 'placeholder'))
+        with self.assertRaises(CommandError):
+            call_command('import_rxnorm', archive, stdout=StringIO())
+        self.assertEqual(RxConcept.objects.count(), 6)
+        self.assertEqual(RxRelation.objects.count(), 5)
+        self.assertEqual(resolve_rxcui('cetirizine'), '20610')
+
+    def test_resolve_rxcui(self):
+        """Test that names resolve case-insensitively, preferring ingredients."""
+        self.assertEqual(resolve_rxcui('Cetirizine'), '20610')
+        self.assertEqual(resolve_rxcui('  ZYRTEC '), '58930')
+        self.assertIsNone(resolve_rxcui('not a drug'))
+
+    def test_related_concepts(self):
+        """Test that a branded product reaches its brand and ingredient."""
+        related = related_concepts('1014679')
+        self.assertEqual(related['IN'], [{'name': 'cetirizine', 'rxcui': '20610'}])
+        self.assertEqual(related['BN'], [{'name': 'Zyrtec', 'rxcui': '58930'}])
+        self.assertEqual(related_concepts('3498'), {})
+
+    def test_medication_api_offline(self):
+        """Test that medication_api answers from the mirror without RxNav."""
+        response = APIClient().get('/api/chatbot/medication/', {'name': 'zyrtec'})
+        result = response.data['results'][0]
+        self.assertEqual(result['rxcui'], '58930')
+        self.assertEqual(result['ingredients'], [{'name': 'cetirizine', 'rxcui': '20610'}])
+
+
+@override_settings(RXNORM=OFFLINE)
+class RelatedConceptsTest(TestCase):
+    """Test suite for related_concepts over combination products."""
+
+    def setUp(self):
+        concepts = [('20610', 'IN', 'cetirizine'), ('8163', 'IN', 'pseudoephedrine'), ('58930', 'BN', 'Zyrtec'),
+                    ('1014678', 'SCD', 'cetirizine 10 MG Oral Tablet'),
+                    ('1020477', 'SCD', 'cetirizine 5 MG / pseudoephedrine 120 MG Extended Release Oral Tablet'),
+                    ('1020479', 'SBD', 'cetirizine 5 MG / pseudoephedrine 120 MG ER Oral Tablet [Zyrtec-D]'),
+                    ('1020478', 'BN', 'Zyrtec-D')]
+        RxConcept.objects.bulk_create([RxConcept(rxaui=f'A{i}', rxcui=rxcui, tty=tty, name=name,
+                                                 normalized_name=name.lower())
+                                       for i, (rxcui, tty, name) in enumerate(concepts)])
+        relations = [('1014678', '20610', 'has_ingredient'), ('1020477', '20610', 'has_ingredient'),
+                     ('1020477', '8163', 'has_ingredient'), ('1020477', '1020479', 'has_tradename'),
+                     ('1020479', '1020478', 'has_ingredient'), ('20610', '58930', 'has_tradename'),
+                     ('1020478', '20610', 'tradename_of'), ('1020478', '8163', 'tradename_of')]
+        RxRelation.objects.bulk_create([RxRelation(rxcui1=a, rxcui2=b, rela=rela) for a, b, rela in relations])
+
+    def names(self, concepts):
+        return [concept['name'] for concept in concepts]
+
+    def test_ingredient_keeps_itself(self):
+        """Test that an ingredient's combination products do not add their co-ingredients."""
+        related = related_concepts('8163')
+        self.assertEqual(related['IN'], [{'name': 'pseudoephedrine', 'rxcui': '8163'}])
+        self.assertEqual(self.names(related['BN']), ['Zyrtec-D'])
+        self.assertEqual(self.names(related['SBD']), [
+            'cetirizine 5 MG / pseudoephedrine 120 MG ER Oral Tablet [Zyrtec-D]'])
+
+    def test_products_reach_every_ingredient(self):
+        """Test that combination products and brands map to all of their ingredients."""
+        self.assertEqual(self.names(related_concepts('1020479')['IN']), ['cetirizine', 'pseudoephedrine'])
+        self.assertEqual(self.names(related_concepts('1020478')['IN']), ['cetirizine', 'pseudoephedrine'])
+        self.assertEqual(self.names(related_concepts('1020477')['BN']), ['Zyrtec-D'])
+
+    def test_large_fan_out(self):
+        """Test that ingredients with more products than one query can list are chunked."""
+        count = QUERY_CHUNK * 2 + 5
+        RxConcept.objects.bulk_create([RxConcept(rxaui=f'S{i}', rxcui=str(5000000 + i), tty='SCD',
+                                                 name=f'cetirizine product {i}', normalized_name='-')
+                                       for i in range(count)])
+        RxRelation.objects.bulk_create([RxRelation(rxcui1=str(5000000 + i), rxcui2='20610', rela='has_ingredient')
+                                        for i in range(count)])
+        self.assertEqual(len(related_concepts('20610')['SCD']), count + 2)
+
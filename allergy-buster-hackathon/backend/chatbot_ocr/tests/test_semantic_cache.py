@@ -0,0 +1,179 @@
+"""
+Unit tests for the semantic answer cache in the chatbot_ocr app.
+Covers the hashing vectorizer, nearest-neighbour lookup, eviction, guard
+keys, background warm-up, and cache hits in chat_api.
+"""
+import threading
+from unittest import mock
+import numpy as np
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import semantic_cache, providers
+from chatbot_ocr.models import ChatMessage, RxConcept
+from chatbot_ocr.semantic_cache import (HashingVectorizer, SemanticCache, get_semantic_cache, guard_key,
+                                        is_dosing_question, warm_from_history)
+from chatbot_ocr.tests.test_providers import FAKE_ONLY
+
+
+class HashingVectorizerTest(SimpleTestCase):
+    """Test suite for HashingVectorizer."""
+
+    def test_vectors_are_normalised(self):
+        """Test that vectors have unit length and ignore stopwords and case."""
+        vectorizer = HashingVectorizer(dims=64)
+        vector = vectorizer.transform('What causes hay fever?')
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+        np.testing.assert_array_equal(vector, vectorizer.transform('what CAUSES hay fever'))
+
+    def test_empty_text(self):
+        """Test that text with only stopwords has no features."""
+        indices, values = HashingVectorizer().sparse('what is it?')
+        self.assertEqual(len(indices), 0)
+
+
+class SemanticCacheTest(SimpleTestCase):
+    """Test suite for SemanticCache."""
+
+    def setUp(self):
+        self.cache = SemanticCache(initial_capacity=2)
+        self.cache.add(1, 'Is cetirizine safe with alcohol?')
+        self.cache.add(2, 'What causes hay fever?')
+        self.cache.add(3, 'What are the symptoms of a peanut allergy?')
+
+    def test_paraphrase_hits(self):
+        """Test that paraphrases are matched to the earlier question."""
+        self.assertEqual(self.cache.lookup('is cetirizine safe to take with alcohol')[0], 1)
+        self.assertEqual(self.cache.lookup('symptoms of peanut allergy')[0], 3)
+
+    def test_different_question_misses(self):
+        """Test that a question about another drug is not answered from the cache."""
+        self.assertIsNone(self.cache.lookup('is loratadine safe with alcohol'))
+
+    def test_oldest_entries_are_evicted(self):
+        """Test that the cache overwrites the oldest entries once full."""
+        cache = SemanticCache(max_entries=2, initial_capacity=1)
+        cache.add(1, 'What causes hay fever?')
+        cache.add(2, 'peanut allergy symptoms')
+        cache.add(3, 'mold allergy treatment')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.lookup('What causes hay fever?'))
+        self.assertEqual(cache.lookup('mold allergy treatment')[0], 3)
+
+    @mock.patch.object(SemanticCache, 'SEGMENT', 4)
+    def test_sealed_segments(self):
+        """Test that full segments are indexed, reused ones unsealed, and lookups agree either way."""
+        questions = ['What causes hay fever?', 'peanut allergy symptoms', 'mold allergy treatment',
+                     'Is pollen worse at night?', 'cat allergy at home', 'dust mites in pillows',
+                     'hives after exercise', 'eczema in winter', 'shellfish allergy in adults', 'bee sting swelling']
+        cache = SemanticCache(max_entries=10, initial_capacity=3)
+        for message_id, question in enumerate(questions):
+            cache.add(message_id, question, key=message_id % 2)
+        self.assertEqual(sorted(cache._segments), [0, 1, 2])
+        for message_id, question in enumerate(questions):
+            self.assertEqual(cache.lookup(question.upper(), key=message_id % 2)[0], message_id)
+        cache.add(10, 'sesame in bread', key=0)
+        self.assertEqual(sorted(cache._segments), [1, 2])
+        self.assertIsNone(cache.lookup('What causes hay fever?', key=0))
+        self.assertEqual(cache.lookup('peanut allergy symptoms', key=1)[0], 1)
+        self.assertEqual(cache.lookup('sesame in bread', key=0)[0], 10)
+
+    def test_discard(self):
+        """Test that a discarded message is no longer returned."""
+        self.cache.discard(2)
+        self.assertIsNone(self.cache.lookup('What causes hay fever?'))
+
+    def test_guard_key_must_match(self):
+        """Test that an identical question under another guard key is not a hit."""
+        self.cache.add(4, 'Is it safe during pregnancy?', key=7)
+        self.assertIsNone(self.cache.lookup('Is it safe during pregnancy?', key=8))
+        self.assertEqual(self.cache.lookup('is it safe during pregnancy', key=7)[0], 4)
+
+
+class GuardKeyTest(TestCase):
+    """Test suite for guard keys and dosing questions."""
+
+    def test_answer_changing_terms(self):
+        """Test that numbers, ages and negations change the key and filler words do not."""
+        self.assertNotEqual(guard_key('Can a 3 year old have hives from milk?'),
+                            guard_key('Can a 13 year old have hives from milk?'))
+        self.assertNotEqual(guard_key('Is honey safe for toddlers?'), guard_key('Is honey safe for adults?'))
+        self.assertNotEqual(guard_key('Is it safe with asthma?'), guard_key('Is it unsafe with asthma?'))
+        self.assertNotEqual(guard_key("Is it safe with asthma?"), guard_key("Isn't it safe with asthma?"))
+        self.assertEqual(guard_key('Is cetirizine safe to take with alcohol'),
+                         guard_key('is cetirizine safe with alcohol?'))
+
+    def test_medication_names(self):
+        """Test that medications known to the RxNorm mirror or the cross-reactivity data change the key."""
+        RxConcept.objects.create(rxaui='1', rxcui='20610', tty='IN', name='cetirizine',
+                                 normalized_name='cetirizine')
+        RxConcept.objects.create(rxaui='2', rxcui='3498', tty='IN', name='diphenhydramine',
+                                 normalized_name='diphenhydramine')
+        self.assertNotEqual(guard_key('Is cetirizine safe with alcohol?'),
+                            guard_key('Is diphenhydramine safe with alcohol?'))
+        self.assertNotEqual(guard_key('Can I take ibuprofen with a sulfa allergy?'),
+                            guard_key('Can I take naproxen with a sulfa allergy?'))
+
+    def test_dosing_questions(self):
+        """Test that dose questions are recognised."""
+        self.assertTrue(is_dosing_question('How much Benadryl can a 3 year old have?'))
+        self.assertTrue(is_dosing_question('Is 10 mg of cetirizine too much?'))
+        self.assertFalse(is_dosing_question('What causes hay fever?'))
+
+
+@override_settings(CHAT_SEMANTIC_CACHE={'ENABLED': True, 'WARM_ENTRIES': 100})
+class WarmUpTest(SimpleTestCase):
+    """Test suite for warming the process-wide cache."""
+
+    def tearDown(self):
+        semantic_cache._cache = None
+
+    def test_warm_up_does_not_block(self):
+        """Test that the first get_semantic_cache call returns while history is still loading."""
+        semantic_cache._cache = None
+        release = threading.Event()
+        with mock.patch('chatbot_ocr.semantic_cache.warm_from_history',
+                        side_effect=lambda cache, limit: release.wait(5)) as warm:
+            cache = get_semantic_cache()
+            self.assertIs(get_semantic_cache(), cache)
+            self.assertEqual(len(cache), 0)
+            release.set()
+            semantic_cache._warm_thread.join(5)
+        warm.assert_called_once_with(cache, 100)
+
+
+@override_settings(LLM_PROVIDERS=FAKE_ONLY, CHAT_FAQ={'ENABLED': False},
+                   CHAT_SEMANTIC_CACHE={'ENABLED': True})
+class ChatSemanticCacheTest(TestCase):
+    """Test suite for semantic cache hits in chat_api."""
+
+    def setUp(self):
+        providers._providers.clear()
+        self.client = APIClient()
+        ChatMessage.objects.create(user_message='What causes hay fever?', ai_reply='Pollen, mostly.')
+        ChatMessage.objects.create(user_message='How much cetirizine can a 3 year old take?', ai_reply='2.5 mg.')
+        semantic_cache._cache = SemanticCache()
+        warm_from_history(semantic_cache._cache, 100)
+
+    def tearDown(self):
+        semantic_cache._cache = None
+        providers._providers.clear()
+
+    def test_paraphrase_is_served_from_cache(self):
+        """Test that a paraphrase of a stored question reuses its reply."""
+        response = self.client.post('/api/chatbot/chat/', {'message': 'WHAT causes hay-fever'}, format='json')
+        self.assertEqual(response.data['reply'], 'Pollen, mostly.')
+        self.assertEqual(response.data['model_used'], 'semantic-cache')
+        self.assertTrue(response.data['cached'])
+
+    def test_new_question_calls_provider(self):
+        """Test that an unrelated question goes to the provider."""
+        response = self.client.post('/api/chatbot/chat/', {'message': 'Is mold worse in autumn?'}, format='json')
+        self.assertEqual(response.data['model_used'], 'fake')
+        self.assertFalse(response.data['cached'])
+
+    def test_dosing_question_calls_provider(self):
+        """Test that dose questions are never answered from the cache."""
+        self.assertEqual(len(semantic_cache._cache), 1)
+        response = self.client.post('/api/chatbot/chat/', {'message': 'How much cetirizine can a 3 year old take?'},
+                                    format='json')
+        self.assertEqual(response.data['model_used'], 'fake')
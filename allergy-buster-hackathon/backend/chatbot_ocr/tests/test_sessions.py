@@ -0,0 +1,96 @@
+"""
+Unit tests for chat sessions in the chatbot_ocr app.
+Covers token-budgeted history, folding old turns into the summary, and session use in chat_api.
+"""
+from unittest import mock
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import providers, semantic_cache
+from chatbot_ocr.models import ChatMessage, ChatSession
+from chatbot_ocr.sessions import get_or_create_session, build_history
+from chatbot_ocr.tests.test_providers import FAKE_ONLY
+
+
+@override_settings(CHAT_SESSIONS={'MAX_TURNS': 20, 'HISTORY_TOKENS': 100, 'SUMMARY_TOKENS': 60})
+class BuildHistoryTest(TestCase):
+    """Test suite for build_history."""
+
+    def setUp(self):
+        self.session = get_or_create_session()
+        for i in range(6):
+            ChatMessage.objects.create(
+                session=self.session,
+                user_message=f"Question number {i} about pollen?",
+                ai_reply=f"Answer {i}. " + 'More detail. ' * 10
+            )
+
+    def test_recent_turns_fit_budget(self):
+        """Test that only the newest turns within the token budget are kept, oldest first."""
+        summary, turns = build_history(self.session)
+        self.assertLess(len(turns), 6)
+        self.assertEqual(turns[-1][0], 'Question number 5 about pollen?')
+
+    def test_old_turns_are_summarized(self):
+        """Test that turns outside the budget are folded into the stored summary."""
+        summary, turns = build_history(self.session)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summary, summary)
+        self.assertIn('Question number', summary)
+        self.assertGreater(self.session.summarized_through, 0)
+        # Folded turns are not fetched again
+        _, again = build_history(self.session)
+        self.assertEqual(again, turns)
+
+    def test_summary_is_bounded(self):
+        """Test that the summary stays within its token budget as the conversation grows."""
+        for i in range(30):
+            ChatMessage.objects.create(session=self.session, user_message=f"Follow-up {i}?", ai_reply='Sure. ' * 20)
+            summary, _ = build_history(self.session)
+        self.assertLessEqual(len(summary) // 4, 60)
+
+    @override_settings(CHAT_SESSIONS={'MAX_TURNS': 2, 'HISTORY_TOKENS': 10000, 'SUMMARY_TOKENS': 1000})
+    def test_turns_beyond_max_turns_are_summarized(self):
+        """Test that every turn older than the kept window is folded, not only those over the token budget."""
+        summary, turns = build_history(self.session)
+        self.assertEqual([turn[0] for turn in turns],
+                         ['Question number 4 about pollen?', 'Question number 5 about pollen?'])
+        for i in range(4):
+            self.assertIn(f'Question number {i} about pollen?', summary)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.summarized_through,
+                         ChatMessage.objects.get(user_message='Question number 3 about pollen?').id)
+
+
+@override_settings(LLM_PROVIDERS=FAKE_ONLY)
+class ChatSessionViewTest(TestCase):
+    """Test suite for sessions in chat_api."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+
+    def test_session_is_created_and_reused(self):
+        """Test that a new session key is returned and follow-ups include earlier turns."""
+        response = self.client.post('/api/chatbot/chat/', {'message': 'Why do my eyes itch in May?'}, format='json')
+        session_id = response.data['session_id']
+        self.assertTrue(ChatSession.objects.filter(session_key=session_id).exists())
+
+        with mock.patch('chatbot_ocr.views.generate_reply', return_value=('ok', 'fake')) as generate_reply:
+            self.client.post('/api/chatbot/chat/', {'message': 'And in June?', 'session_id': session_id}, format='json')
+        self.assertIn('Why do my eyes itch in May?', generate_reply.call_args[0][0])
+        self.assertEqual(ChatMessage.objects.filter(session__session_key=session_id).count(), 2)
+
+    def test_unknown_session_keys_are_not_adopted(self):
+        """Test that client-chosen or unknown keys start a new session under a server-issued key."""
+        for session_id in ('my-session', 'a' * 32, '../../etc'):
+            response = self.client.post('/api/chatbot/chat/', {'message': 'Is it pollen?', 'session_id': session_id},
+                                        format='json')
+            self.assertNotEqual(response.data['session_id'], session_id)
+            self.assertRegex(response.data['session_id'], r'^[0-9a-f]{32}$')
+        self.assertFalse(ChatSession.objects.filter(session_key__in=['my-session', 'a' * 32]).exists())
+        self.assertEqual(ChatSession.objects.count(), 3)
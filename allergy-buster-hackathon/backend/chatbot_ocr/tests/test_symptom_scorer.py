@@ -0,0 +1,91 @@
+"""
+Unit tests for the offline symptom scorer in the chatbot_ocr app.
+Covers symptom extraction, condition ranking, and the local path of
+diagnose_symptoms.
+"""
+import time
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from chatbot_ocr import providers, semantic_cache
+from chatbot_ocr.symptom_scorer import get_symptom_scorer
+from chatbot_ocr.tests.test_providers import FAKE_ONLY
+
+FAILING_FAKE = {
+    'PRIMARY': 'fake',
+    'SECONDARY': 'fake',
+    'BACKENDS': {
+        'fake': {'CLASS': 'chatbot_ocr.providers.FakeProvider', 'OPTIONS': {'error_rate': 1.0}},
+    },
+}
+
+
+class SymptomScorerTest(SimpleTestCase):
+    """Test suite for SymptomScorer."""
+
+    def setUp(self):
+        self.scorer = get_symptom_scorer()
+
+    def test_extracts_symptoms_and_skips_negations(self):
+        """Test that phrases map to symptoms and negated ones are ignored."""
+        result = self.scorer.score('Sneezing and a runny nose, but no fever or cough')
+        self.assertEqual(sorted(result['symptoms']), ['runny_nose', 'sneezing'])
+
+    def test_ranks_textbook_presentations(self):
+        """Test that classic descriptions rank the expected condition first."""
+        cases = {
+            'I keep sneezing with a runny nose and itchy eyes every spring': 'Allergic rhinitis (hay fever)',
+            'Hives and swollen lips after eating peanuts': 'Food allergy',
+            "Throat feels tight, can't breathe and dizzy after shrimp": 'Anaphylaxis',
+            'My mouth tingles when I eat raw apple': 'Oral allergy syndrome (pollen-food syndrome)',
+            'Itchy red rash where my nickel watch strap sits': 'Allergic contact dermatitis',
+        }
+        for text, expected in cases.items():
+            top, probability = self.scorer.score(text)['conditions'][0]
+            self.assertEqual(top['name'], expected, text)
+            self.assertGreater(probability, 0.5, text)
+
+    def test_scoring_is_fast(self):
+        """Test that scoring takes well under a millisecond."""
+        started = time.perf_counter()
+        for _ in range(100):
+            self.scorer.score('wheezing and coughing at night with chest tightness')
+        self.assertLess((time.perf_counter() - started) / 100, 0.001)
+
+
+class LocalDiagnosisEndpointTest(TestCase):
+    """Test suite for the local path of diagnose_symptoms."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+
+    @override_settings(LLM_PROVIDERS=FAILING_FAKE)
+    def test_clear_case_answered_locally(self):
+        """Test that a clear-cut case is answered without the LLM."""
+        response = self.client.post('/api/chatbot/diagnose/',
+                                    {'symptoms': 'Hives and swollen lips after eating peanuts'}, format='json')
+        self.assertEqual(response.data['source'], 'local')
+        self.assertEqual(response.data['possible_conditions'][0], 'Food allergy')
+        # Food allergy is urgent, so emergency advice is included
+        self.assertTrue(any('epinephrine' in p for p in response.data['precautions']))
+
+    @override_settings(LLM_PROVIDERS=FAKE_ONLY)
+    def test_detailed_uses_llm(self):
+        """Test that a detailed analysis goes to the LLM and keeps the local scores."""
+        response = self.client.post('/api/chatbot/diagnose/', {
+            'symptoms': 'Hives and swollen lips after eating peanuts', 'detailed': True
+        }, format='json')
+        self.assertEqual(response.data['source'], 'llm')
+        self.assertEqual(response.data['condition_scores'][0]['condition'], 'Food allergy')
+
+    @override_settings(LLM_PROVIDERS=FAILING_FAKE)
+    def test_local_fallback_when_llm_fails(self):
+        """Test that the local ranking is returned when every provider fails."""
+        response = self.client.post('/api/chatbot/diagnose/', {'symptoms': 'sneezing'}, format='json')
+        self.assertEqual(response.data['source'], 'local-fallback')
+        self.assertIn('Allergic rhinitis (hay fever)', response.data['possible_conditions'])
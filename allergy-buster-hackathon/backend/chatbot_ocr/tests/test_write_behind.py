@@ -0,0 +1,101 @@
+"""
+Unit tests for write-behind persistence in the chatbot_ocr app.
+Covers buffering, bulk flushes, callbacks, and buffered writes from chat_api.
+"""
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from chatbot_ocr import providers, semantic_cache, write_behind
+from chatbot_ocr.models import ChatMessage, OCRScan
+from chatbot_ocr.sessions import get_or_create_session, build_history
+from chatbot_ocr.write_behind import WriteBehindBuffer
+from chatbot_ocr.tests.test_providers import FAKE_ONLY
+
+
+class WriteBehindBufferTest(TestCase):
+    """Test suite for WriteBehindBuffer."""
+
+    def test_flush_writes_in_bulk(self):
+        """Test that queued rows are only written on flush, and get ids."""
+        buffer = WriteBehindBuffer(OCRScan, autostart=False)
+        scans = [OCRScan(raw_text=f"scan {i}") for i in range(5)]
+        saved = []
+        for scan in scans:
+            buffer.add(scan, on_saved=saved.append)
+        self.assertEqual(OCRScan.objects.count(), 0)
+        self.assertEqual(len(buffer.pending()), 5)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(buffer.flush(), 5)
+        # One INSERT (inside a savepoint here, as the test runs in a transaction)
+        self.assertEqual(sum(query['sql'].startswith('INSERT') for query in queries.captured_queries), 1)
+        self.assertEqual(OCRScan.objects.count(), 5)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(saved, scans)
+        self.assertTrue(all(scan.id for scan in saved))
+
+    def test_public_id_is_known_before_flush(self):
+        """Test that the client key exists before the row is written."""
+        buffer = WriteBehindBuffer(OCRScan, autostart=False)
+        scan = OCRScan(raw_text='label')
+        buffer.add(scan)
+        key = scan.public_id
+        buffer.flush()
+        self.assertEqual(OCRScan.objects.get(public_id=key).raw_text, 'label')
+
+    def test_failed_rows_are_saved_individually_then_dropped(self):
+        """Test that a bad row doesn't hold back its batch and is dropped after max_retries flushes."""
+        buffer = WriteBehindBuffer(OCRScan, max_retries=2, autostart=False)
+        good, bad = OCRScan(raw_text='good'), OCRScan(raw_text='bad')
+        OCRScan.objects.create(raw_text='existing', public_id=bad.public_id)
+        buffer.add(good)
+        buffer.add(bad)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertTrue(OCRScan.objects.filter(raw_text='good').exists())
+        self.assertEqual(buffer.pending(), [bad])
+        with self.assertLogs('chatbot_ocr.write_behind', 'ERROR') as logs:
+            self.assertEqual(buffer.flush(), 0)
+        self.assertIn(str(bad.public_id), logs.output[0])
+        self.assertEqual(len(buffer), 0)
+
+    def test_pending_size_is_capped(self):
+        """Test that the oldest rows are dropped once max_pending rows are buffered."""
+        buffer = WriteBehindBuffer(OCRScan, max_pending=2, autostart=False)
+        scans = [OCRScan(raw_text=f"scan {i}") for i in range(3)]
+        with self.assertLogs('chatbot_ocr.write_behind', 'ERROR'):
+            for scan in scans:
+                buffer.add(scan)
+        self.assertEqual(buffer.pending(), scans[1:])
+
+
+@override_settings(LLM_PROVIDERS=FAKE_ONLY, WRITE_BEHIND={'ENABLED': True})
+class BufferedChatTest(TestCase):
+    """Test suite for chat_api with write-behind enabled."""
+
+    def setUp(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        self.buffer = WriteBehindBuffer(ChatMessage, autostart=False)
+        write_behind._buffers[ChatMessage] = self.buffer
+        self.client = APIClient()
+
+    def tearDown(self):
+        providers._providers.clear()
+        semantic_cache._cache = None
+        write_behind._buffers.clear()
+
+    def test_chat_returns_key_and_defers_insert(self):
+        """Test that chat_api answers before the row is written and returns its key."""
+        response = self.client.post('/api/chatbot/chat/', {'message': 'Is mold worse in autumn?'}, format='json')
+        self.assertIsNone(response.data['chat_id'])
+        self.assertEqual(ChatMessage.objects.count(), 0)
+        self.buffer.flush()
+        self.assertTrue(ChatMessage.objects.filter(public_id=response.data['chat_key']).exists())
+
+    def test_session_history_includes_buffered_turns(self):
+        """Test that follow-ups see turns that are still buffered."""
+        session = get_or_create_session()
+        write_behind.save(ChatMessage(session=session, user_message='First question?', ai_reply='First answer.'))
+        _, turns = build_history(session)
+        self.assertEqual(turns, [('First question?', 'First answer.')])
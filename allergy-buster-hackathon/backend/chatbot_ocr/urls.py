@@ -7,9 +7,13 @@ urlpatterns = [
     path('chat/', views.chat_api, name='chat_api'),      # POST /api/chatbot/chat/
     path('ocr/', views.ocr_api, name='ocr_api'),         # POST /api/chatbot/ocr/
     path('medication/', views.medication_api, name='medication_api'),  # GET /api/chatbot/medication/
+    path('medication/autocomplete/', views.medication_autocomplete, name='medication_autocomplete'),  # GET /api/chatbot/medication/autocomplete/
     path('diagnose/', views.diagnose_symptoms, name='diagnose_symptoms'),  # POST /api/chatbot/diagnose/
+    path('diagnose-batch/', views.diagnose_batch, name='diagnose_batch'),  # POST /api/chatbot/diagnose-batch/
     path('dietary-suggestions/', views.dietary_suggestions, name='dietary_suggestions'),  # POST /api/chatbot/dietary-suggestions/
     path('allergy-alerts/', views.allergy_alerts, name='allergy_alerts'),  # GET /api/chatbot/allergy-alerts/
     path('nearby-doctors/', views.nearby_doctors, name='nearby_doctors'),  # GET /api/chatbot/nearby-doctors/
     path('drug-interactions/', views.drug_interactions, name='drug_interactions'),  # GET /api/chatbot/drug-interactions/
+    path('drug-interactions/matrix/', views.drug_interaction_matrix, name='drug_interaction_matrix'),  # POST /api/chatbot/drug-interactions/matrix/
+    path('allergy-conflicts/', views.allergy_conflicts_api, name='allergy_conflicts'),  # POST /api/chatbot/allergy-conflicts/
 ]
\ No newline at end of file
@@ -2,8 +2,9 @@
 import os
 import json
 import re
+import time
 import traceback
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from .models import ChatMessage, OCRScan
@@ -14,27 +15,31 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import ChatMessageSerializer
-import requests
-
-# Load API keys from APIKeys.txt
-api_keys = {}
-try:
-    with open(os.path.join(os.path.dirname(__file__), '..', 'core_api', 'APIKeys.txt'), 'r') as f:
-        for line in f:
-            if ':' in line:
-                key, value = line.split(':', 1)
-                api_keys[key.strip()] = value.strip()
-except Exception as e:
-    print(f"Error loading API keys: {str(e)}")
-
-mistral_api_key = api_keys.get('MistralAPIKey', '')
-gemini_api_key = api_keys.get('GeminiAPIKey', '')
+from django.conf import settings
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from .hedging import HedgedCaller
+from .providers import LLMProviderError, get_providers
+from .rate_limit import RateLimitExceeded
+from .semantic_cache import cached_reply, remember_reply
+from .faq import faq_lookup, format_context
+from .sessions import get_or_create_session, build_history, format_history
+from .response_parser import DIAGNOSIS_SCHEMA, DIETARY_SCHEMA
+from .batch import provider_workers, run_batch
+from .symptom_scorer import local_diagnosis
+from .food_index import food_suggestions
+from .rxnorm import (RxNavError, SEVERITY_ORDER, interaction_list, interaction_pairs, related_concepts,
+                     remote_fallback, resolve_rxcui, resolve_rxcuis)
+from .interaction_graph import get_interaction_graph, graph_ingredients, local_interactions
+from .cross_reactivity import allergy_conflicts, get_cross_reactivity
+from .autocomplete import autocomplete
+from .alerts import alerts_for
+from .directory import nearby_providers
+from core_api.models import Allergy
+from . import write_behind
 
 def initialize_model():
-    """Check if API keys are available."""
-    if mistral_api_key or gemini_api_key:
-        return True
-    return False
+    """Check if an LLM provider is configured."""
+    return any(provider.is_available() for provider in get_providers())
 
 @csrf_exempt
 @require_http_methods(["GET"])
@@ -48,6 +53,9 @@ def test_env(request):
         'model_loaded': model_loaded
     })
 
+# Chat replies served without calling an LLM
+LOCAL_REPLY_SOURCES = ('faq', 'semantic-cache')
+
 @api_view(['POST'])
 @csrf_exempt
 def chat_api(request):
@@ -57,137 +65,137 @@ def chat_api(request):
         print("Error: Message is required")
         return Response({'error': 'Message is required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    # Check if we should use Gemini or fallback to Mistral
-    use_gemini = gemini_api_key and gemini_api_key != "YOUR_GEMINI_API_KEY_HERE"
-    print(f"Using Gemini: {use_gemini}")
-
     try:
-        if use_gemini:
-            # Call Google Gemini API
-            url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
-            headers = {
-                "Content-Type": "application/json"
-            }
-
-            # Add the API key as a query parameter
-            url = f"{url}?key={gemini_api_key}"
-
+        # Recent turns of the conversation, older ones folded into a summary
+        session = get_or_create_session(request.data.get('session_id'))
+        summary, turns = build_history(session)
+
+        # Curated FAQ answers first, then paraphrases of earlier questions.
+        # Follow-ups depend on the conversation, so they skip the semantic cache.
+        faq_answer, faq_context = faq_lookup(user_message)
+        cached = None if faq_answer or summary or turns else cached_reply(user_message)
+        if faq_answer:
+            ai_response, model_used = faq_answer, 'faq'
+        elif cached:
+            ai_response, model_used = cached[0], 'semantic-cache'
+        else:
             # Prepare the prompt with allergy-specific context
             prompt = f"""You are an AI assistant specialized in allergy information.
-            Provide helpful, accurate information about allergies, symptoms, treatments, and precautions.
+            Provide helpful, accurate information about allergies, symptoms, treatments, and precautions."""
+            if faq_context:
+                prompt += f"""
 
-            User question: {user_message}"""
+            Reference information from our FAQ (use it if relevant):
+            {format_context(faq_context)}"""
+            if summary or turns:
+                prompt += f"""
 
-            data = {
-                "contents": [
-                    {
-                        "parts": [
-                            {
-                                "text": prompt
-                            }
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "maxOutputTokens": 800,
-                    "topP": 0.95
-                }
-            }
+            {format_history(summary, turns)}"""
+            prompt += f"""
 
-            response = requests.post(url, headers=headers, json=data)
+            User question: {user_message}"""
 
-            if response.status_code == 200:
-                response_data = response.json()
-                ai_response = response_data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', 'No response from Gemini')
-            else:
-                # Fallback to Mistral if Gemini fails
-                ai_response = call_mistral_api(user_message)
-        else:
-            # Use Mistral as fallback
-            ai_response = call_mistral_api(user_message)
+            # Primary provider first, secondary (with the bare message) as fallback or hedge
+            ai_response, model_used = generate_reply(prompt, temperature=0.7, max_tokens=800,
+                                                     fallback_message=user_message)
+        print(f"Model used: {model_used}")
 
-        # Save the chat message
-        chat_message = ChatMessage.objects.create(
-            user_message=user_message,
-            ai_reply=ai_response
+        # Save the chat message (possibly buffered, see write_behind.py)
+        answered_locally = model_used in LOCAL_REPLY_SOURCES
+        chat_message = write_behind.save(
+            ChatMessage(user_message=user_message, ai_reply=ai_response, session=session),
+            on_saved=None if answered_locally else remember_reply
         )
 
         return Response({
             'status': 'success',
             'reply': ai_response,
             'chat_id': chat_message.id,
-            'model_used': 'gemini' if use_gemini else 'mistral'
+            'chat_key': str(chat_message.public_id),
+            'session_id': session.session_key,
+            'model_used': model_used,
+            'cached': answered_locally
         }, status=status.HTTP_201_CREATED)
+    except RateLimitExceeded as e:
+        return overloaded_response(e)
     except Exception as e:
         return Response({
             'status': 'error',
             'message': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def call_mistral_api(user_message):
-    """Helper function to call Mistral AI API"""
-    headers = {
-        'Authorization': f'Bearer {mistral_api_key}',
-        'Content-Type': 'application/json'
-    }
-    data = {
-        'model': 'mistral-small',
-        'messages': [{'role': 'user', 'content': user_message}],
-        'max_tokens': 100
-    }
+def llm_available():
+    """Check whether the primary LLM provider is configured."""
+    return get_providers()[0].is_available()
 
-    try:
-        response = requests.post('https://api.mistral.ai/v1/chat/completions', headers=headers, json=data)
+def provider_call(provider, prompt, temperature=0.7, max_tokens=800, schema=None):
+    """Call a provider, asking for JSON output when given a schema the provider can honour."""
+    if schema is not None and provider.supports_json:
+        return provider.complete(schema.json_prompt(prompt), temperature, max_tokens, json_mode=True)
+    return provider.complete(prompt, temperature, max_tokens)
 
-        if response.status_code == 200:
-            return response.json().get('choices', [{}])[0].get('message', {}).get('content', 'No response from AI')
-        else:
-            return 'Error: Could not get response from Mistral AI'
+def call_secondary_api(user_message, schema=None):
+    """Call the secondary provider, turning failures into an error reply."""
+    secondary = get_providers()[1]
+    try:
+        return provider_call(secondary, user_message, schema=schema)
+    except RateLimitExceeded:
+        raise
+    except LLMProviderError:
+        return f'Error: Could not get response from {secondary.name}'
     except Exception as e:
         return f'Error: {str(e)}'
 
-def call_gemini_api(prompt, temperature=0.7, max_tokens=800):
-    """Helper function to call Google Gemini API"""
-    if not gemini_api_key or gemini_api_key == "YOUR_GEMINI_API_KEY_HERE":
-        return call_mistral_api(prompt)
+# Optional hedging of slow primary calls with the secondary provider (see hedging.py)
+llm_hedger = HedgedCaller.from_settings(settings.LLM_HEDGING) if settings.LLM_HEDGING.get('ENABLED') else None
 
-    url = "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
-    headers = {
-        "Content-Type": "application/json"
-    }
-
-    # Add the API key as a query parameter
-    url = f"{url}?key={gemini_api_key}"
-
-    data = {
-        "contents": [
-            {
-                "parts": [
-                    {
-                        "text": prompt
-                    }
-                ]
-            }
-        ],
-        "generationConfig": {
-            "temperature": temperature,
-            "maxOutputTokens": max_tokens,
-            "topP": 0.95
-        }
-    }
+def generate_reply(prompt, temperature=0.7, max_tokens=800, fallback_message=None, schema=None):
+    """
+    Get a reply from the primary provider (Gemini by default), falling back
+    to the secondary (Mistral).
+    Raises RateLimitExceeded if every provider is over capacity.
+    Returns a (text, model_used) tuple. `fallback_message` is what the
+    secondary is sent instead of the prompt, if given. With hedging enabled, a
+    primary call slower than its recent latency percentile is raced against
+    the secondary. With a response `schema`, providers that support it are
+    asked for JSON (see response_parser.py).
+    """
+    primary, secondary = get_providers()
+    fallback_message = fallback_message or prompt
+    if not primary.is_available():
+        return call_secondary_api(fallback_message, schema), secondary.name
+
+    if llm_hedger is not None:
+        try:
+            return llm_hedger.call(
+                (primary.name, lambda: provider_call(primary, prompt, temperature, max_tokens, schema)),
+                (secondary.name, lambda: provider_call(secondary, fallback_message, schema=schema)),
+            )
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            return f'Error: {str(e)}', secondary.name
 
     try:
-        response = requests.post(url, headers=headers, json=data)
-
-        if response.status_code == 200:
-            response_data = response.json()
-            return response_data.get('candidates', [{}])[0].get('content', {}).get('parts', [{}])[0].get('text', 'No response from Gemini')
-        else:
-            # Fallback to Mistral if Gemini fails
-            return call_mistral_api(prompt)
+        return provider_call(primary, prompt, temperature, max_tokens, schema), primary.name
+    except (LLMProviderError, RateLimitExceeded):
+        # Fallback to the secondary provider if the primary fails or is over capacity
+        return call_secondary_api(fallback_message, schema), secondary.name
     except Exception as e:
-        return f'Error: {str(e)}'
+        return f'Error: {str(e)}', primary.name
+
+def overloaded_response(error):
+    """Build the 503 response for a call shed by the provider rate limiter."""
+    headers = {'Retry-After': str(max(1, round(error.retry_after)))} if error.retry_after else None
+    return Response({
+        'status': 'error',
+        'message': 'The AI service is busy right now. Please try again shortly.',
+        'reason': error.reason
+    }, status=status.HTTP_503_SERVICE_UNAVAILABLE, headers=headers)
+
+def call_gemini_api(prompt, temperature=0.7, max_tokens=800):
+    """Helper function to call the configured LLM (Google Gemini by default)"""
+    return generate_reply(prompt, temperature=temperature, max_tokens=max_tokens)[0]
 
 @api_view(['POST'])
 @csrf_exempt
@@ -298,7 +306,7 @@ def ocr_api(request):
 
         # Step 5: Use Gemini API to analyze the ingredients if available
         ai_analysis = None
-        if gemini_api_key and gemini_api_key != "YOUR_GEMINI_API_KEY_HERE":
+        if llm_available():
             # Use ingredients_text if available, otherwise use raw_text
             text_to_analyze = ingredients_text if ingredients_text else raw_text
 
@@ -372,26 +380,41 @@ def ocr_api(request):
                 if med_name not in medication_names:
                     medication_names.append(med_name)
 
-        # Save the OCR scan
-        scan = OCRScan.objects.create(
+        # Medications the cross-reactivity data knows by name, brand or combination (e.g. "Keflex", "Bactrim")
+        engine = get_cross_reactivity()
+        if engine is not None:
+            for kind, name in engine.find(raw_text):
+                if kind in ('ingredient', 'product') and name not in medication_names:
+                    medication_names.append(name)
+
+        # Check them against the patient's allergies, if we know any
+        allergies = requested_allergies(request)
+        conflicts = allergy_conflicts(allergies, medication_names) if allergies else None
+
+        # Save the OCR scan (possibly buffered, see write_behind.py)
+        scan = write_behind.save(OCRScan(
             raw_text=raw_text,
             detected_medicines={
                 'allergens': detected_allergens,
                 'medications': medication_names,
                 'ingredients_text': ingredients_text
             }
-        )
+        ))
 
         # Prepare the response
         response_data = {
             'status': 'success',
             'scan_id': scan.id,
+            'scan_key': str(scan.public_id),
             'raw_text': raw_text,
             'ingredients_text': ingredients_text,
             'detected_allergens': detected_allergens,
             'detected_medications': medication_names,
         }
 
+        if conflicts is not None:
+            response_data['allergy_conflicts'] = conflicts['conflicts']
+            response_data['unrecognized_allergies'] = conflicts['unrecognized_allergies']
         if ai_analysis:
             response_data['ai_analysis'] = ai_analysis
 
@@ -403,6 +426,63 @@ def ocr_api(request):
             'traceback': traceback.format_exc()
         }, status=status.HTTP_400_BAD_REQUEST)
 
+def requested_allergies(request):
+    """
+    Allergy names sent with the request (`allergies`, a list or a
+    comma-separated string) plus the signed-in user's Allergy records.
+    REST_FRAMEWORK has no authentication classes configured yet, so
+    request.user is always anonymous and clients must send their allergies
+    explicitly; the Allergy records are only picked up once auth exists.
+    """
+    value = request.data.get('allergies') or []
+    if isinstance(value, str):
+        value = value.split(',')
+    allergies = [name.strip() for name in value if isinstance(name, str) and name.strip()]
+    if request.user.is_authenticated:
+        for name in Allergy.objects.filter(user=request.user).values_list('name', flat=True):
+            if name not in allergies:
+                allergies.append(name)
+    return allergies
+
+@api_view(['POST'])
+@csrf_exempt
+def allergy_conflicts_api(request):
+    """
+    Check medications against a patient's drug allergies, including class
+    membership and known cross-reactions (e.g. penicillin and amoxicillin).
+
+    Request body:
+    - medications: List of medication names (brands and strengths are fine)
+    - allergies: List of allergy names. Required until the API has
+      authentication; a signed-in user's Allergy records are then added too
+    """
+    medications = request.data.get('medications')
+    if not isinstance(medications, list) or not all(isinstance(name, str) for name in medications):
+        return Response({
+            'status': 'error',
+            'message': 'medications must be a list of names'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    allergies = requested_allergies(request)
+    if not allergies:
+        return Response({
+            'status': 'error',
+            'message': 'Please provide allergies or sign in'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    result = allergy_conflicts(allergies, medications)
+    if result is None:
+        return Response({
+            'status': 'error',
+            'message': 'Cross-reactivity checking is disabled'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return Response({
+        'status': 'success',
+        'allergies': allergies,
+        'has_conflicts': bool(result['conflicts']),
+        **result
+    }, status=status.HTTP_200_OK)
+
 # Add this new function for medication API
 @api_view(['GET'])
 def medication_api(request):
@@ -424,108 +504,74 @@ def medication_api(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
-    # RxNorm API (free, provided by NIH)
+    # RxNorm (free, provided by NIH), answered from the local mirror when it has been imported
     # Documentation: https://rxnav.nlm.nih.gov/RxNormAPIs.html
-    base_url = "https://rxnav.nlm.nih.gov/REST/rxcui"
-
     try:
         # First, get the RxCUI (RxNorm Concept Unique Identifier)
-        if medication_name:
-            search_param = {'name': medication_name}
-        else:
-            search_param = {'name': ingredient}
-
-        rxcui_response = requests.get(f"{base_url}.json", params=search_param)
-
-        if rxcui_response.status_code != 200:
-            return Response(
-                {'error': 'Failed to connect to medication database'},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-
-        rxcui_data = rxcui_response.json()
+        rxcui = resolve_rxcui(medication_name or ingredient)
 
         # Check if we got any results
-        if 'idGroup' not in rxcui_data or not rxcui_data['idGroup'].get('rxnormId'):
+        if rxcui is None:
             return Response(
                 {'results': [], 'message': 'No medications found'},
                 status=status.HTTP_200_OK
             )
 
-        # Get the first RxCUI
-        rxcui = rxcui_data['idGroup']['rxnormId'][0]
-
         # Now get detailed information using the RxCUI
-        details_url = f"https://rxnav.nlm.nih.gov/REST/rxcui/{rxcui}/allrelated.json"
-        details_response = requests.get(details_url)
-
-        if details_response.status_code != 200:
-            return Response(
-                {'error': 'Failed to retrieve medication details'},
-                status=status.HTTP_503_SERVICE_UNAVAILABLE
-            )
-
-        details_data = details_response.json()
+        related = related_concepts(rxcui)
 
         # Format the response
         medication_info = {
             'name': medication_name or ingredient,
             'rxcui': rxcui,
-            'related_medications': [],
-            'ingredients': [],
-            'drug_classes': []
+            'related_medications': related.get('BN', []),  # Brand names
+            'ingredients': related.get('IN', []),
+            'drug_classes': [concept['name'] for concept in related.get('EPC', [])]
         }
 
-        # Extract relevant information
-        if 'allRelatedGroup' in details_data and 'conceptGroup' in details_data['allRelatedGroup']:
-            for group in details_data['allRelatedGroup']['conceptGroup']:
-                if group.get('tty') == 'IN' and 'conceptProperties' in group:  # Ingredients
-                    medication_info['ingredients'] = [
-                        {'name': prop.get('name'), 'rxcui': prop.get('rxcui')}
-                        for prop in group['conceptProperties']
-                    ]
-                elif group.get('tty') == 'BN' and 'conceptProperties' in group:  # Brand names
-                    medication_info['related_medications'] = [
-                        {'name': prop.get('name'), 'rxcui': prop.get('rxcui')}
-                        for prop in group['conceptProperties']
-                    ]
-                elif group.get('tty') == 'EPC' and 'conceptProperties' in group:  # Drug classes
-                    medication_info['drug_classes'] = [
-                        prop.get('name') for prop in group['conceptProperties']
-                    ]
-
         return Response({'results': [medication_info]}, status=status.HTTP_200_OK)
 
+    except RxNavError as e:
+        print("RxNav error:", e)
+        return Response(
+            {'error': 'Failed to connect to medication database'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
     except Exception as e:
         return Response(
             {'error': f'Error querying medication database: {str(e)}'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-@api_view(['POST'])
-@csrf_exempt
-def diagnose_symptoms(request):
+@api_view(['GET'])
+def medication_autocomplete(request):
     """
-    Diagnose allergy symptoms using Gemini AI.
+    Suggest medication names for a partial, possibly misspelled, name.
 
-    Request body:
-    - symptoms: String describing the symptoms
-    - age: Optional integer for patient age
-    - gender: Optional string for patient gender
-    - medical_history: Optional string with relevant medical history
+    Query parameters:
+    - q: What the user has typed so far
+    - limit: Maximum number of suggestions (capped by AUTOCOMPLETE['MAX_RESULTS'])
     """
-    print("Symptom Diagnosis API called with:", request.data)
-    symptoms = request.data.get('symptoms', '')
-    age = request.data.get('age', 'Not specified')
-    gender = request.data.get('gender', 'Not specified')
-    medical_history = request.data.get('medical_history', 'None provided')
-
-    if not symptoms:
-        return Response({
-            'status': 'error',
-            'message': 'Symptoms description is required'
-        }, status=status.HTTP_400_BAD_REQUEST)
-
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return Response(
+            {'error': 'Please provide a partial medication name'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limit = int(request.GET.get('limit', 0)) or None
+    except ValueError:
+        return Response({'error': 'limit must be a whole number'}, status=status.HTTP_400_BAD_REQUEST)
+    if limit is not None and limit < 1:
+        limit = None
+
+    results = autocomplete(query, limit)
+    if results is None:
+        return Response({'error': 'Autocomplete is disabled'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({'query': query, 'results': results}, status=status.HTTP_200_OK)
+
+def run_diagnosis(symptoms, age='Not specified', gender='Not specified', medical_history='None provided'):
+    """Ask the LLM for an allergy diagnosis and return the parsed response fields."""
     # Create a detailed prompt for the AI
     prompt = f"""You are an expert allergist and immunologist.
     Based on the following information, provide a detailed analysis of possible allergic conditions.
@@ -547,63 +593,193 @@ def diagnose_symptoms(request):
     Include a disclaimer that this is not a medical diagnosis and the patient should consult a healthcare professional.
     """
 
+    # Call Gemini API for diagnosis
+    ai_response, model_used = generate_reply(prompt, temperature=0.3, max_tokens=1000, schema=DIAGNOSIS_SCHEMA)
+    sections, ai_response = DIAGNOSIS_SCHEMA.parse(ai_response)
+
+    return {
+        'full_analysis': ai_response,
+        'possible_conditions': sections['possible_conditions'][:5],  # Limit to top 5
+        'next_steps': sections['next_steps'],
+        'relief_suggestions': sections['relief_suggestions'],
+        'precautions': sections['precautions'],
+        'disclaimer': 'This is not a medical diagnosis. Please consult a healthcare professional.',
+        'model_used': model_used
+    }
+
+def local_response(local, source):
+    """Build the diagnose_symptoms fields from a local_diagnosis result."""
+    sections = {
+        'possible_conditions': [f"{score['condition']} ({score['probability']:.0%})" for score in local['condition_scores']],
+        'next_steps': local['next_steps'],
+        'relief_suggestions': local['relief_suggestions'],
+        'precautions': local['precautions'],
+    }
+    return {
+        'full_analysis': DIAGNOSIS_SCHEMA.to_markdown(sections),
+        'possible_conditions': local['possible_conditions'],
+        'next_steps': local['next_steps'],
+        'relief_suggestions': local['relief_suggestions'],
+        'precautions': local['precautions'],
+        'condition_scores': local['condition_scores'],
+        'recognized_symptoms': local['recognized_symptoms'],
+        'disclaimer': 'This is not a medical diagnosis. Please consult a healthcare professional.',
+        'model_used': 'local',
+        'source': source
+    }
+
+def diagnose(symptoms, age='Not specified', gender='Not specified', medical_history='None provided', detailed=False):
+    """
+    Diagnose symptoms, answering from the local symptom scorer (see
+    symptom_scorer.py) when its ranking is clear and no `detailed` analysis
+    was asked for, and from the LLM otherwise. If the LLM fails, the local
+    ranking is returned instead. `source` in the result is 'local', 'llm'
+    or 'local-fallback'.
+    """
+    local = local_diagnosis(symptoms)
+    if local is not None and local['confident'] and not detailed:
+        return local_response(local, 'local')
+
     try:
-        # Call Gemini API for diagnosis
-        ai_response = call_gemini_api(prompt, temperature=0.3, max_tokens=1000)
-
-        # Parse the response to extract key information
-        # This is a simplified version - in a real app, you'd want to parse the response more carefully
-        possible_conditions = []
-        next_steps = []
-        relief_suggestions = []
-        precautions = []
-
-        # Very basic parsing - in a real app, you'd use more sophisticated NLP
-        lines = ai_response.split('\n')
-        current_section = None
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            if "possible" in line.lower() and "condition" in line.lower():
-                current_section = "conditions"
-                continue
-            elif "next step" in line.lower() or "recommend" in line.lower():
-                current_section = "next_steps"
-                continue
-            elif "relief" in line.lower():
-                current_section = "relief"
-                continue
-            elif "precaution" in line.lower():
-                current_section = "precautions"
-                continue
-
-            if current_section == "conditions" and line.startswith("-"):
-                possible_conditions.append(line.lstrip("- "))
-            elif current_section == "next_steps" and line.startswith("-"):
-                next_steps.append(line.lstrip("- "))
-            elif current_section == "relief" and line.startswith("-"):
-                relief_suggestions.append(line.lstrip("- "))
-            elif current_section == "precautions" and line.startswith("-"):
-                precautions.append(line.lstrip("- "))
+        diagnosis = run_diagnosis(symptoms, age, gender, medical_history)
+    except (RateLimitExceeded, LLMProviderError):
+        if local is None:
+            raise
+        return local_response(local, 'local-fallback')
+    if diagnosis['full_analysis'].startswith('Error:') and local is not None:
+        return local_response(local, 'local-fallback')
+
+    diagnosis['source'] = 'llm'
+    if local is not None:
+        diagnosis['condition_scores'] = local['condition_scores']
+    return diagnosis
+
+@api_view(['POST'])
+@csrf_exempt
+def diagnose_symptoms(request):
+    """
+    Diagnose allergy symptoms using Gemini AI.
+
+    Request body:
+    - symptoms: String describing the symptoms
+    - age: Optional integer for patient age
+    - gender: Optional string for patient gender
+    - medical_history: Optional string with relevant medical history
+    - detailed: Optional boolean; always ask the LLM for a full analysis
+
+    Clear-cut presentations are answered instantly by the local symptom
+    scorer; the response's `source` says which path answered.
+    """
+    print("Symptom Diagnosis API called with:", request.data)
+    symptoms = request.data.get('symptoms', '')
 
+    if not symptoms:
         return Response({
-            'status': 'success',
-            'full_analysis': ai_response,
-            'possible_conditions': possible_conditions[:5],  # Limit to top 5
-            'next_steps': next_steps,
-            'relief_suggestions': relief_suggestions,
-            'precautions': precautions,
-            'disclaimer': 'This is not a medical diagnosis. Please consult a healthcare professional.'
-        }, status=status.HTTP_200_OK)
+            'status': 'error',
+            'message': 'Symptoms description is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        diagnosis = diagnose(
+            symptoms,
+            age=request.data.get('age', 'Not specified'),
+            gender=request.data.get('gender', 'Not specified'),
+            medical_history=request.data.get('medical_history', 'None provided'),
+            detailed=str(request.data.get('detailed', '')).lower() in ('true', '1', 'yes'),
+        )
+        return Response({'status': 'success', **diagnosis}, status=status.HTTP_200_OK)
+    except RateLimitExceeded as e:
+        return overloaded_response(e)
     except Exception as e:
         return Response({
             'status': 'error',
             'message': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def diagnose_record(record):
+    """Diagnose one intake record of a batch; raises ValueError for invalid records."""
+    if not isinstance(record, dict) or not record.get('symptoms'):
+        raise ValueError('Symptoms description is required')
+    diagnosis = diagnose(
+        record['symptoms'],
+        age=record.get('age', 'Not specified'),
+        gender=record.get('gender', 'Not specified'),
+        medical_history=record.get('medical_history', 'None provided'),
+        detailed=str(record.get('detailed', '')).lower() in ('true', '1', 'yes'),
+    )
+    if diagnosis['full_analysis'].startswith('Error:'):
+        raise LLMProviderError(diagnosis['full_analysis'][len('Error:'):].strip())
+    return diagnosis
+
+@api_view(['POST'])
+@csrf_exempt
+def diagnose_batch(request):
+    """
+    Diagnose a batch of intake records concurrently, streaming the results.
+
+    Request body:
+    - records: List of objects with the diagnose_symptoms fields (symptoms,
+      age, gender, medical_history) and an optional client `id`
+
+    The response is NDJSON: one line per record as it finishes (in completion
+    order, with its `index` in the request and `id`), then a final `summary`
+    line. A failed record gets a `status: error` line; the rest still run.
+    """
+    config = settings.DIAGNOSE_BATCH
+    records = request.data.get('records')
+
+    if not isinstance(records, list) or not records:
+        return Response({
+            'status': 'error',
+            'message': 'records must be a non-empty list'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if len(records) > config.get('MAX_RECORDS', 500):
+        return Response({
+            'status': 'error',
+            'message': f"At most {config.get('MAX_RECORDS', 500)} records per batch"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    max_workers = config.get('MAX_WORKERS') or provider_workers()
+
+    def result_lines():
+        started = time.monotonic()
+        succeeded = 0
+        for index, diagnosis, error in run_batch(diagnose_record, records, max_workers, config.get('RETRIES', 2)):
+            record_id = records[index].get('id') if isinstance(records[index], dict) else None
+            if error is None:
+                succeeded += 1
+                line = {'index': index, 'id': record_id, 'status': 'success', **diagnosis}
+            else:
+                line = {'index': index, 'id': record_id, 'status': 'error', 'message': str(error)}
+                if isinstance(error, RateLimitExceeded):
+                    line['reason'] = error.reason
+            yield json.dumps(line) + '\n'
+        yield json.dumps({'summary': {
+            'total': len(records),
+            'succeeded': succeeded,
+            'failed': len(records) - succeeded,
+            'workers': max_workers,
+            'elapsed_seconds': round(time.monotonic() - started, 3)
+        }}) + '\n'
+
+    return StreamingHttpResponse(result_lines(), content_type='application/x-ndjson')
+
+def local_dietary_response(local, source):
+    """Build the dietary_suggestions response from a food_suggestions result."""
+    return {
+        'status': 'success',
+        'full_suggestions': DIETARY_SCHEMA.to_markdown(local),
+        'foods_to_avoid': local['foods_to_avoid'],
+        'safe_alternatives': local['safe_alternatives'],
+        'meal_plan': local['meal_plan'],
+        'shopping_list': local['shopping_list'],
+        'eating_out_tips': local['eating_out_tips'],
+        'safe_foods': local['safe_foods'],
+        'recognized_allergens': local['recognized_allergens'],
+        'unrecognized_allergies': local['unrecognized_allergies'],
+        'source': source
+    }
+
 @api_view(['POST'])
 @csrf_exempt
 def dietary_suggestions(request):
@@ -614,6 +790,10 @@ def dietary_suggestions(request):
     - allergies: List of allergies
     - preferences: Optional dietary preferences
     - restrictions: Optional additional dietary restrictions
+    - narrative: Optional boolean; add an AI-written narrative to the local suggestions
+
+    Suggestions come from the local allergen-free food index (food_index.py);
+    the LLM is only called for the narrative, or if the index is disabled.
     """
     allergies = request.data.get('allergies', [])
     preferences = request.data.get('preferences', 'None specified')
@@ -625,6 +805,13 @@ def dietary_suggestions(request):
             'message': 'At least one allergy must be specified'
         }, status=status.HTTP_400_BAD_REQUEST)
 
+    # Answer from the local food index unless an AI-written narrative is requested
+    local = food_suggestions(allergies if isinstance(allergies, list) else str(allergies).split(','),
+                             f"{preferences} {restrictions}")
+    narrative = str(request.data.get('narrative', '')).lower() in ('true', '1', 'yes')
+    if local is not None and not narrative:
+        return Response(local_dietary_response(local, 'local'), status=status.HTTP_200_OK)
+
     # Convert allergies list to string
     if isinstance(allergies, list):
         allergies_str = ', '.join(allergies)
@@ -651,66 +838,50 @@ def dietary_suggestions(request):
 
     try:
         # Call Gemini API for dietary suggestions
-        ai_response = call_gemini_api(prompt, temperature=0.4, max_tokens=1200)
-
-        # Parse the response to extract key information
-        foods_to_avoid = []
-        safe_alternatives = []
-        meal_plan = []
-        shopping_list = []
-        eating_out_tips = []
-
-        # Basic parsing - in a real app, you'd use more sophisticated NLP
-        lines = ai_response.split('\n')
-        current_section = None
-
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-
-            if "avoid" in line.lower() or "watch" in line.lower():
-                current_section = "avoid"
-                continue
-            elif "alternative" in line.lower() or "substitute" in line.lower():
-                current_section = "alternatives"
-                continue
-            elif "meal plan" in line.lower() or "day" in line.lower() and "breakfast" in line.lower():
-                current_section = "meal_plan"
-                continue
-            elif "shopping" in line.lower() or "grocery" in line.lower():
-                current_section = "shopping"
-                continue
-            elif "eating out" in line.lower() or "restaurant" in line.lower():
-                current_section = "eating_out"
-                continue
-
-            if current_section == "avoid" and line.startswith("-"):
-                foods_to_avoid.append(line.lstrip("- "))
-            elif current_section == "alternatives" and line.startswith("-"):
-                safe_alternatives.append(line.lstrip("- "))
-            elif current_section == "meal_plan" and line.startswith("-"):
-                meal_plan.append(line.lstrip("- "))
-            elif current_section == "shopping" and line.startswith("-"):
-                shopping_list.append(line.lstrip("- "))
-            elif current_section == "eating_out" and line.startswith("-"):
-                eating_out_tips.append(line.lstrip("- "))
+        ai_response, _ = generate_reply(prompt, temperature=0.4, max_tokens=1200, schema=DIETARY_SCHEMA)
+        sections, ai_response = DIETARY_SCHEMA.parse(ai_response)
+
+        if local is not None:
+            # The local index stays authoritative for the lists; the LLM only adds the narrative
+            if ai_response.startswith('Error:'):
+                return Response(local_dietary_response(local, 'local-fallback'), status=status.HTTP_200_OK)
+            return Response({
+                **local_dietary_response(local, 'local+llm'),
+                'full_suggestions': ai_response
+            }, status=status.HTTP_200_OK)
 
         return Response({
             'status': 'success',
             'full_suggestions': ai_response,
-            'foods_to_avoid': foods_to_avoid,
-            'safe_alternatives': safe_alternatives,
-            'meal_plan': meal_plan,
-            'shopping_list': shopping_list,
-            'eating_out_tips': eating_out_tips
+            'foods_to_avoid': sections['foods_to_avoid'],
+            'safe_alternatives': sections['safe_alternatives'],
+            'meal_plan': sections['meal_plan'],
+            'shopping_list': sections['shopping_list'],
+            'eating_out_tips': sections['eating_out_tips']
         }, status=status.HTTP_200_OK)
+    except RateLimitExceeded as e:
+        if local is not None:
+            return Response(local_dietary_response(local, 'local-fallback'), status=status.HTTP_200_OK)
+        return overloaded_response(e)
     except Exception as e:
         return Response({
             'status': 'error',
             'message': str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def not_modified(request, cached):
+    """
+    Whether the client's copy of a cached alert response is current. A
+    matching If-None-Match (weak comparison) wins; If-Modified-Since is only
+    checked when no ETag was sent.
+    """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = [etag.removeprefix('W/') for etag in parse_etags(if_none_match)]
+        return '*' in etags or cached.etag.removeprefix('W/') in etags
+    since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return since is not None and int(cached.modified.timestamp()) <= since
+
 @api_view(['GET'])
 def allergy_alerts(request):
     """
@@ -738,108 +909,29 @@ def allergy_alerts(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        # In a real app, you would call a weather/pollen API here
-        # For this demo, we'll simulate the response
-
-        # Get current date for seasonal context
-        from datetime import datetime
-        current_month = datetime.now().month
-
-        # Seasonal allergy mapping (simplified)
-        seasonal_mapping = {
-            # Winter (Dec-Feb)
-            12: ['dust mites', 'mold', 'pet dander'],
-            1: ['dust mites', 'mold', 'pet dander'],
-            2: ['dust mites', 'mold', 'pet dander'],
-
-            # Spring (Mar-May)
-            3: ['tree pollen', 'mold'],
-            4: ['tree pollen', 'grass pollen'],
-            5: ['tree pollen', 'grass pollen'],
-
-            # Summer (Jun-Aug)
-            6: ['grass pollen', 'weed pollen', 'insect stings'],
-            7: ['grass pollen', 'weed pollen', 'insect stings'],
-            8: ['ragweed', 'weed pollen', 'insect stings'],
-
-            # Fall (Sep-Nov)
-            9: ['ragweed', 'weed pollen', 'mold'],
-            10: ['ragweed', 'mold', 'dust mites'],
-            11: ['mold', 'dust mites']
-        }
-
-        # Get seasonal allergens for current month
-        seasonal_allergens = seasonal_mapping.get(current_month, [])
-
-        # Generate alerts based on user's allergies and seasonal allergens
-        alerts = []
-
-        # Check for pollen alerts
-        if any(a in ['pollen', 'tree pollen', 'grass pollen', 'weed pollen', 'ragweed'] for a in allergies):
-            if any(p in seasonal_allergens for p in ['tree pollen', 'grass pollen', 'weed pollen', 'ragweed']):
-                alerts.append({
-                    'type': 'pollen',
-                    'severity': 'high',
-                    'description': 'High pollen levels in your area. Consider limiting outdoor activities.',
-                    'recommendations': [
-                        'Keep windows closed',
-                        'Use air purifiers',
-                        'Shower after being outdoors',
-                        'Take allergy medication before symptoms start'
-                    ]
-                })
+        lat, lon = float(latitude), float(longitude)
+    except ValueError:
+        return Response({
+            'status': 'error',
+            'message': 'Latitude and longitude must be numbers'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return Response({
+            'status': 'error',
+            'message': 'Latitude must be between -90 and 90 and longitude between -180 and 180'
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Check for mold alerts
-        if 'mold' in allergies and 'mold' in seasonal_allergens:
-            alerts.append({
-                'type': 'mold',
-                'severity': 'moderate',
-                'description': 'Moderate mold levels due to recent weather conditions.',
-                'recommendations': [
-                    'Use dehumidifiers',
-                    'Clean damp areas regularly',
-                    'Use mold-killing products in bathrooms',
-                    'Ensure good ventilation'
-                ]
-            })
-
-        # Check for dust mite alerts
-        if 'dust' in allergies and 'dust mites' in seasonal_allergens:
-            alerts.append({
-                'type': 'dust_mites',
-                'severity': 'moderate',
-                'description': 'Indoor heating can increase dust mite activity.',
-                'recommendations': [
-                    'Use allergen-proof bed covers',
-                    'Wash bedding in hot water weekly',
-                    'Keep humidity below 50%',
-                    'Vacuum with a HEPA filter'
-                ]
-            })
-
-        # Check for pet dander alerts (always relevant if allergic)
-        if 'pet' in allergies or 'dander' in allergies:
-            alerts.append({
-                'type': 'pet_dander',
-                'severity': 'varies',
-                'description': 'Pet dander allergies can be worse in winter when more time is spent indoors.',
-                'recommendations': [
-                    'Keep pets out of bedrooms',
-                    'Bathe pets weekly',
-                    'Use HEPA air purifiers',
-                    'Clean floors and furniture regularly'
-                ]
-            })
-
-        # Add general seasonal information
-        season_names = {
-            12: 'Winter', 1: 'Winter', 2: 'Winter',
-            3: 'Spring', 4: 'Spring', 5: 'Spring',
-            6: 'Summer', 7: 'Summer', 8: 'Summer',
-            9: 'Fall', 10: 'Fall', 11: 'Fall'
+    try:
+        # In a real app, you would call a weather/pollen API here
+        # For this demo, the alerts come from the season and are cached per area and day
+        cached = alerts_for(lat, lon, allergies)
+        headers = {
+            'ETag': cached.etag,
+            'Last-Modified': http_date(cached.modified.timestamp()),
+            'Cache-Control': 'no-cache',
         }
-
-        current_season = season_names.get(current_month)
+        if not_modified(request, cached):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
 
         return Response({
             'status': 'success',
@@ -849,12 +941,8 @@ def allergy_alerts(request):
                 'city': 'Your City',  # In a real app, you would use reverse geocoding
                 'region': 'Your Region'
             },
-            'current_date': datetime.now().strftime('%Y-%m-%d'),
-            'season': current_season,
-            'seasonal_allergens': seasonal_allergens,
-            'alerts': alerts,
-            'general_info': f"{current_season} is typically a season when {', '.join(seasonal_allergens)} are common allergens."
-        }, status=status.HTTP_200_OK)
+            **cached.body
+        }, status=status.HTTP_200_OK, headers=headers)
     except Exception as e:
         return Response({
             'status': 'error',
@@ -870,8 +958,11 @@ def nearby_doctors(request):
     - latitude: User's latitude
     - longitude: User's longitude
     - distance: Search radius in miles (default: 10)
-    - specialty: Type of doctor (default: allergist)
+    - specialty: Type of doctor (default: allergist; 'any' for all doctors)
+    - page: Page of results, nearest first (default: 1)
+    - page_size: Results per page (default: PROVIDER_DIRECTORY['PAGE_SIZE'])
     """
+    config = settings.PROVIDER_DIRECTORY
     latitude = request.GET.get('latitude')
     longitude = request.GET.get('longitude')
     distance = request.GET.get('distance', '10')
@@ -884,88 +975,65 @@ def nearby_doctors(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        # In a real app, you would call a doctor directory API or database
-        # For this demo, we'll simulate the response with mock data
-
-        # Mock data for nearby doctors
-        doctors = [
-            {
-                'id': 1,
-                'name': 'Dr. Jane Smith',
-                'specialty': 'Allergist / Immunologist',
-                'address': '123 Main St, New York, NY 10001',
-                'phone': '(212) 555-1234',
-                'distance': '1.2 miles',
-                'rating': 4.8,
-                'reviews_count': 56,
-                'accepting_new_patients': True,
-                'insurance_accepted': ['Aetna', 'Blue Cross', 'Cigna', 'UnitedHealthcare'],
-                'languages': ['English', 'Spanish'],
-                'next_available': '2023-06-20'
-            },
-            {
-                'id': 2,
-                'name': 'Dr. Michael Johnson',
-                'specialty': 'Allergist / Immunologist',
-                'address': '456 Park Ave, New York, NY 10022',
-                'phone': '(212) 555-5678',
-                'distance': '2.5 miles',
-                'rating': 4.6,
-                'reviews_count': 42,
-                'accepting_new_patients': True,
-                'insurance_accepted': ['Aetna', 'Cigna', 'Medicare'],
-                'languages': ['English'],
-                'next_available': '2023-06-18'
-            },
-            {
-                'id': 3,
-                'name': 'Dr. Sarah Williams',
-                'specialty': 'Pediatric Allergist',
-                'address': '789 Broadway, New York, NY 10003',
-                'phone': '(212) 555-9012',
-                'distance': '3.1 miles',
-                'rating': 4.9,
-                'reviews_count': 78,
-                'accepting_new_patients': False,
-                'insurance_accepted': ['Blue Cross', 'UnitedHealthcare', 'Medicaid'],
-                'languages': ['English', 'French'],
-                'next_available': '2023-07-05'
-            }
-        ]
+        lat, lon, miles = float(latitude), float(longitude), float(distance)
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', config['PAGE_SIZE']))
+    except ValueError:
+        return Response({
+            'status': 'error',
+            'message': 'latitude, longitude and distance must be numbers, page and page_size whole numbers'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return Response({
+            'status': 'error',
+            'message': 'Latitude must be between -90 and 90 and longitude between -180 and 180'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 < miles <= config['MAX_RADIUS_MILES'] or page < 1 or not 0 < page_size <= config['MAX_PAGE_SIZE']:
+        return Response({
+            'status': 'error',
+            'message': f"distance must be between 0 and {config['MAX_RADIUS_MILES']:g} miles, page at least 1 "
+                       f"and page_size between 1 and {config['MAX_PAGE_SIZE']}"
+        }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Mock data for hospitals
-        hospitals = [
-            {
-                'id': 1,
-                'name': 'City General Hospital',
-                'address': '100 Hospital Blvd, New York, NY 10001',
-                'phone': '(212) 555-2000',
-                'distance': '1.8 miles',
-                'emergency': True,
-                'allergy_dept': True,
-                'rating': 4.2,
-                'insurance_accepted': ['Most major insurances']
-            },
-            {
-                'id': 2,
-                'name': 'University Medical Center',
-                'address': '200 College Ave, New York, NY 10016',
-                'phone': '(212) 555-3000',
-                'distance': '4.2 miles',
-                'emergency': True,
-                'allergy_dept': True,
-                'rating': 4.7,
-                'insurance_accepted': ['Most major insurances']
+    try:
+        found = nearby_providers(lat, lon, miles, specialty, page, page_size)
+        doctors, hospitals = [], []
+        for provider, miles_away in found['results']:
+            entry = {
+                'id': provider.id,
+                'npi': provider.npi,
+                'name': provider.name,
+                'address': ', '.join(part for part in [provider.address, provider.city,
+                                                       f"{provider.state} {provider.postal_code}".strip()] if part),
+                'phone': provider.phone,
+                'distance': f"{miles_away:.1f} miles",
+                'distance_miles': round(miles_away, 2),
+                'latitude': provider.latitude,
+                'longitude': provider.longitude,
+                'rating': provider.rating,
+                'insurance_accepted': provider.insurance_accepted,
             }
-        ]
+            if provider.kind == provider.HOSPITAL:
+                entry.update({'emergency': provider.emergency})
+                hospitals.append(entry)
+            else:
+                entry.update({
+                    'specialty': provider.specialty,
+                    'reviews_count': provider.reviews_count,
+                    'accepting_new_patients': provider.accepting_new_patients,
+                    'languages': provider.languages,
+                })
+                doctors.append(entry)
 
+        # The nearest provider's city stands in for reverse geocoding
+        nearest = found['results'][0][0] if found['results'] else None
         return Response({
             'status': 'success',
             'location': {
                 'latitude': latitude,
                 'longitude': longitude,
-                'city': 'New York',  # In a real app, you would use reverse geocoding
-                'region': 'NY'
+                'city': nearest.city if nearest else 'Your City',
+                'region': nearest.state if nearest else 'Your Region'
             },
             'search_params': {
                 'distance': distance,
@@ -973,7 +1041,10 @@ def nearby_doctors(request):
             },
             'doctors': doctors,
             'hospitals': hospitals,
-            'total_results': len(doctors) + len(hospitals)
+            'total_results': found['total'],
+            'page': found['page'],
+            'page_size': found['page_size'],
+            'total_pages': -(-found['total'] // found['page_size'])
         }, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({
@@ -1000,46 +1071,34 @@ def drug_interactions(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        # First, get RxCUIs for both medications
-        rxcuis = []
-        for med_name in [med1, med2]:
-            search_param = {'name': med_name}
-            rxcui_response = requests.get("https://rxnav.nlm.nih.gov/REST/rxcui.json", params=search_param)
-
-            if rxcui_response.status_code != 200:
-                continue
-
-            rxcui_data = rxcui_response.json()
-
-            if 'idGroup' in rxcui_data and rxcui_data['idGroup'].get('rxnormId'):
-                rxcuis.append(rxcui_data['idGroup']['rxnormId'][0])
+        # First, get RxCUIs for both medications (looked up concurrently)
+        rxcuis = [rxcui for rxcui in resolve_rxcuis([med1, med2]).values() if rxcui]
 
         # If we couldn't find RxCUIs for both medications, use Gemini AI
         if len(rxcuis) < 2:
             return get_interactions_from_gemini(med1, med2)
 
-        # Check for interactions using the RxNav API
-        interaction_url = f"https://rxnav.nlm.nih.gov/REST/interaction/list.json?rxcuis={'+'.join(rxcuis)}"
-        interaction_response = requests.get(interaction_url)
-
-        if interaction_response.status_code != 200:
+        # The local interaction graph answers when it records an interaction;
+        # it is too sparse for a missing edge to mean there is none
+        interactions = local_interactions(*rxcuis)
+        if interactions is not None:
+            return Response({
+                'status': 'success',
+                'medications': {
+                    'med1': med1,
+                    'med2': med2
+                },
+                'has_interactions': len(interactions) > 0,
+                'interactions': interactions
+            }, status=status.HTTP_200_OK)
+
+        # Otherwise check for interactions using the RxNav API
+        if not remote_fallback():
             return get_interactions_from_gemini(med1, med2)
-
-        interaction_data = interaction_response.json()
+        interaction_data = interaction_list(rxcuis)
 
         # Parse the interaction data
-        interactions = []
-        if 'fullInteractionTypeGroup' in interaction_data:
-            for group in interaction_data['fullInteractionTypeGroup']:
-                if 'fullInteractionType' in group:
-                    for interaction_type in group['fullInteractionType']:
-                        if 'interactionPair' in interaction_type:
-                            for pair in interaction_type['interactionPair']:
-                                interactions.append({
-                                    'description': pair.get('description', 'No description available'),
-                                    'severity': 'moderate',  # Default severity
-                                    'source': group.get('sourceName', 'RxNav')
-                                })
+        interactions = [interaction for _, _, interaction in interaction_pairs(interaction_data)]
 
         # If no interactions found from RxNav, use Gemini AI as backup
         if not interactions:
@@ -1059,9 +1118,144 @@ def drug_interactions(request):
         # Fallback to Gemini AI if there's an error
         return get_interactions_from_gemini(med1, med2)
 
+def add_interaction_pairs(pairs, positions, found_pairs):
+    """
+    Add (rxcui1, rxcui2, interaction) triples to `pairs`, keyed by the
+    (i, j) positions of the medications. Each source reports a pair once per
+    direction, so only one copy of each interaction is kept.
+    """
+    for rxcui1, rxcui2, interaction in found_pairs:
+        for i in positions.get(rxcui1, []):
+            for j in positions.get(rxcui2, []):
+                if i == j:
+                    continue
+                found = pairs.setdefault((min(i, j), max(i, j)), [])
+                if interaction not in found:
+                    found.append(interaction)
+
+@api_view(['POST'])
+@csrf_exempt
+def drug_interaction_matrix(request):
+    """
+    Check every pair in a medication list for interactions at once.
+
+    Request body:
+    - medications: List of medication names
+
+    All names are resolved together (one local query, concurrent RxNav
+    lookups for the rest) and checked against the local interaction graph in
+    one lookup. RxNav's interaction list is only asked (once, for all of
+    them) when some pair has no interaction in the graph. The response lists
+    each interacting pair once, plus a matrix of the highest severity per pair
+    in the order of `medications`. Pairs no source could check are listed in
+    `unchecked`, and `complete` is false when there are any.
+    """
+    config = settings.RXNORM
+    medications = request.data.get('medications')
+
+    if not isinstance(medications, list) or not all(isinstance(name, str) for name in medications):
+        return Response({
+            'status': 'error',
+            'message': 'medications must be a list of names'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    # Drop blanks and repeats, keeping the first spelling of each name
+    names = []
+    seen = set()
+    for name in medications:
+        if name.strip() and name.strip().lower() not in seen:
+            seen.add(name.strip().lower())
+            names.append(name.strip())
+    if len(names) < 2:
+        return Response({
+            'status': 'error',
+            'message': 'Please provide at least two medications'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if len(names) > config.get('MAX_MEDICATIONS', 50):
+        return Response({
+            'status': 'error',
+            'message': f"At most {config.get('MAX_MEDICATIONS', 50)} medications per request"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    graph = get_interaction_graph()
+    try:
+        rxcuis = resolve_rxcuis(names)
+        resolved = {name: rxcui for name, rxcui in rxcuis.items() if rxcui}
+        # Graph ingredients per name; brands and products map to their ingredients
+        ingredients = {name: graph_ingredients(graph, rxcui) if graph is not None else []
+                       for name, rxcui in resolved.items()}
+    except RxNavError as e:
+        print("RxNav error:", e)
+        return Response({
+            'status': 'error',
+            'message': 'Failed to connect to medication database'
+        }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    # Several names can share an RxCUI (e.g. two spellings of one drug)
+    positions = {}
+    for i, name in enumerate(names):
+        if name in resolved:
+            positions.setdefault(resolved[name], []).append(i)
+            for ingredient in ingredients[name]:
+                if ingredient != resolved[name]:
+                    positions.setdefault(ingredient, []).append(i)
+
+    pairs = {}
+    if graph is not None:
+        all_ingredients = [ingredient for name in resolved for ingredient in ingredients[name]]
+        graph_pairs = [(rxcui1, rxcui2, interaction)
+                       for (rxcui1, rxcui2), found in graph.interactions(all_ingredients).items()
+                       for interaction in found]
+        add_interaction_pairs(pairs, positions, graph_pairs)
+
+    # The graph only records known interactions, so resolved pairs it has
+    # nothing on are asked of RxNav (once, for all of them)
+    all_pairs = [(i, j) for i in range(len(names)) for j in range(i + 1, len(names))
+                 if not (names[i] in resolved and resolved[names[i]] == resolved.get(names[j]))]
+    checked = set()
+    if any(names[i] in resolved and names[j] in resolved and (i, j) not in pairs for i, j in all_pairs) \
+            and remote_fallback():
+        try:
+            rxnav_pairs = list(interaction_pairs(interaction_list(set(resolved.values()))))
+        except RxNavError as e:
+            print("RxNav error:", e)
+            return Response({
+                'status': 'error',
+                'message': 'Failed to connect to medication database'
+            }, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        add_interaction_pairs(pairs, positions, rxnav_pairs)
+        # RxNav's silence only clears medications it reports on
+        checked = {i for rxcui1, rxcui2, _ in rxnav_pairs for rxcui in (rxcui1, rxcui2)
+                   for i in positions.get(rxcui, [])}
+    unchecked = [[names[i], names[j]] for i, j in all_pairs
+                 if (i, j) not in pairs and not (i in checked and j in checked)]
+
+    matrix = [[None] * len(names) for _ in names]
+    pair_list = []
+    for (i, j), interactions in sorted(pairs.items()):
+        severity = max((interaction['severity'] for interaction in interactions),
+                       key=lambda s: SEVERITY_ORDER.index(s) if s in SEVERITY_ORDER else 1)
+        matrix[i][j] = matrix[j][i] = severity
+        pair_list.append({
+            'medications': [names[i], names[j]],
+            'severity': severity,
+            'interactions': interactions
+        })
+
+    return Response({
+        'status': 'success',
+        'medications': [{'name': name, 'rxcui': rxcuis[name]} for name in names],
+        'unresolved': [name for name in names if not rxcuis[name]],
+        'has_interactions': bool(pair_list),
+        'pairs': pair_list,
+        'matrix': matrix,
+        # Pairs no source could vouch for either way; absence from `pairs` is not a clean bill
+        'complete': not unchecked,
+        'unchecked': unchecked
+    }, status=status.HTTP_200_OK)
+
 def get_interactions_from_gemini(med1, med2):
     """Helper function to get drug interactions using Gemini AI"""
-    if not gemini_api_key or gemini_api_key == "YOUR_GEMINI_API_KEY_HERE":
+    if not llm_available():
         # Return a simulated response if Gemini is not available
         return Response({
             'status': 'success',
@@ -1133,6 +1327,8 @@ def get_interactions_from_gemini(med1, med2):
             ] if has_interactions else []
         }, status=status.HTTP_200_OK)
 
+    except RateLimitExceeded as e:
+        return overloaded_response(e)
     except Exception as e:
         return Response({
             'status': 'error',
@@ -0,0 +1,190 @@
+"""
+Optional write-behind persistence for ChatMessage and OCRScan.
+Instead of one INSERT per request (which serializes workers on SQLite's write
+lock), new rows are buffered in memory and written with bulk_create when the
+buffer reaches MAX_BATCH rows or MAX_DELAY seconds have passed, and once more
+at interpreter shutdown. Clients get the row's `public_id` straight away;
+the integer id exists only after the flush. If a bulk write fails, the rows
+are saved one at a time; rows that still fail are retried on later flushes
+up to MAX_RETRIES times, and the buffer never holds more than MAX_PENDING rows.
+"""
+import atexit
+import logging
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from .models import ChatMessage
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """
+    Buffers unsaved instances of one model and bulk-inserts them.
+    Each entry may carry an `on_saved` callback, run with the saved instance
+    after its flush (e.g. to index it once it has an id). Entries are
+    (instance, on_saved, failed attempts) tuples, oldest first.
+    """
+
+    def __init__(self, model, max_batch=200, max_delay=1.0, max_retries=3, max_pending=10000, autostart=True):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_retries = max_retries
+        self.max_pending = max_pending
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._autostart = autostart
+
+    def _ensure_thread(self):
+        if self._autostart and self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name=f"write-behind-{self.model._meta.model_name}", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.max_delay)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Write-behind flush of {self.model.__name__} failed: {e}")
+            finally:
+                # The flusher thread owns its own connection; don't keep it open between flushes
+                connection.close()
+
+    def add(self, instance, on_saved=None):
+        """Queue an unsaved instance for insertion."""
+        with self._lock:
+            self._pending.append((instance, on_saved, 0))
+            self._drop_overflow()
+            full = len(self._pending) >= self.max_batch
+            self._ensure_thread()
+        if full:
+            self._wakeup.set()
+
+    def _drop_overflow(self):
+        """Drop the oldest entries beyond max_pending; call with _lock held."""
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            for instance, _, _ in self._pending[:overflow]:
+                logger.error(f"Write-behind buffer for {self.model.__name__} is full; "
+                             f"dropping unsaved row {instance.public_id}")
+            del self._pending[:overflow]
+
+    def pending(self, predicate=None):
+        """Instances queued but not yet written, oldest first, optionally filtered."""
+        with self._lock:
+            return [instance for instance, _, _ in self._pending if predicate is None or predicate(instance)]
+
+    def flush(self):
+        """
+        Write everything queued so far in one bulk_create, falling back to
+        one save per row if that fails; returns the number of rows written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            try:
+                # bulk_create doesn't use a savepoint; without one a failure would poison an outer transaction
+                with transaction.atomic():
+                    self.model.objects.bulk_create([instance for instance, _, _ in batch], batch_size=self.max_batch)
+                saved = batch
+            except Exception as e:
+                logger.warning(f"Bulk write of {len(batch)} {self.model.__name__} rows failed ({e}); "
+                               f"saving them one at a time")
+                saved = self._save_each(batch)
+        for instance, on_saved, _ in saved:
+            if on_saved is not None:
+                on_saved(instance)
+        return len(saved)
+
+    def _save_each(self, batch):
+        """Save rows one by one; requeue the ones that fail, or drop them after max_retries attempts."""
+        saved, retry = [], []
+        for instance, on_saved, attempts in batch:
+            # A rolled-back bulk_create may have assigned an id that was never stored
+            instance.pk = None
+            instance._state.adding = True
+            try:
+                with transaction.atomic():
+                    instance.save(force_insert=True)
+                saved.append((instance, on_saved, attempts))
+            except Exception as e:
+                if attempts + 1 < self.max_retries:
+                    retry.append((instance, on_saved, attempts + 1))
+                else:
+                    logger.error(f"Dropping {self.model.__name__} row {instance.public_id} after "
+                                 f"{attempts + 1} failed writes: {e}")
+        if retry:
+            with self._lock:
+                self._pending[:0] = retry
+                self._drop_overflow()
+        return saved
+
+    def __len__(self):
+        return len(self._pending)
+
+
+_buffers = {}
+_buffers_lock = threading.Lock()
+
+
+def get_buffer(model):
+    """Return the shared buffer for a model, or None if write-behind is disabled."""
+    config = settings.WRITE_BEHIND
+    if not config.get('ENABLED'):
+        return None
+    with _buffers_lock:
+        if model not in _buffers:
+            _buffers[model] = WriteBehindBuffer(
+                model,
+                max_batch=config.get('MAX_BATCH', 200),
+                max_delay=config.get('MAX_DELAY', 1.0),
+                max_retries=config.get('MAX_RETRIES', 3),
+                max_pending=config.get('MAX_PENDING', 10000),
+            )
+        return _buffers[model]
+
+
+def save(instance, on_saved=None):
+    """
+    Persist a new ChatMessage or OCRScan, through the write-behind buffer when
+    enabled and immediately otherwise. `on_saved` runs once the row is written.
+    """
+    buffer = get_buffer(type(instance))
+    if buffer is None:
+        instance.save()
+        if on_saved is not None:
+            on_saved(instance)
+    else:
+        buffer.add(instance, on_saved)
+    return instance
+
+
+def pending_chat_messages(session_id):
+    """Buffered ChatMessages of a session that are not written yet, oldest first."""
+    buffer = get_buffer(ChatMessage)
+    if buffer is None:
+        return []
+    return buffer.pending(lambda message: message.session_id == session_id)
+
+
+@atexit.register
+def flush_all():
+    """Flush every buffer; registered to run at interpreter shutdown."""
+    for model, buffer in list(_buffers.items()):
+        try:
+            count = buffer.flush()
+            if count:
+                logger.info(f"Flushed {count} buffered {model.__name__} rows at shutdown")
+        except Exception as e:
+            logger.error(f"Could not flush buffered {model.__name__} rows at shutdown: {e}")
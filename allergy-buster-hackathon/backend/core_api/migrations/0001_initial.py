@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Allergy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, help_text='Name of the allergen.', max_length=100)),
+                ('severity', models.CharField(choices=[('mild', 'Mild'), ('moderate', 'Moderate'), ('severe', 'Severe')], help_text='Severity of the allergy: mild, moderate, or severe.', max_length=20)),
+                ('symptoms', models.TextField(help_text='Symptoms experienced due to the allergy.')),
+                ('triggers', models.TextField(help_text='Known triggers for the allergy.')),
+                ('notes', models.TextField(blank=True, help_text='Additional notes about the allergy.', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp when the allergy record was created.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp when the allergy record was last updated.')),
+                ('user', models.ForeignKey(help_text='The user who has this allergy.', on_delete=django.db.models.deletion.CASCADE, related_name='allergies', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Allergies',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'name'], name='core_api_al_user_id_c4da92_idx')],
+            },
+        ),
+    ]
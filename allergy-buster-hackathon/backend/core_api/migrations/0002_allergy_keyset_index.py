@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 02:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_api', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='allergy',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name_plural': 'Allergies'},
+        ),
+        migrations.AddIndex(
+            model_name='allergy',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='allergy_user_created_idx'),
+        ),
+    ]
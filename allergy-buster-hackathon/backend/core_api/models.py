@@ -63,7 +63,9 @@ class Allergy(models.Model):
 
     class Meta:
         verbose_name_plural = "Allergies"
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
         indexes = [
             models.Index(fields=['user', 'name']),
+            # Keyset pagination of a user's allergies, newest first
+            models.Index(fields=['user', '-created_at', '-id'], name='allergy_user_created_idx'),
         ]
\ No newline at end of file
@@ -0,0 +1,38 @@
+"""
+Pagination for the core_api app.
+List endpoints use cursor (keyset) pagination: each page is a range scan that
+starts where the previous page's last row left off, so page N costs the same
+as page 1 however large the table grows.
+"""
+import logging
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+# Set up a logger for this module
+logger = logging.getLogger(__name__)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination with page sizes from settings.CORE_API_PAGINATION.
+    Clients may ask for smaller or larger pages with ?limit=, capped at
+    MAX_PAGE_SIZE. Views set `ordering` to fields backed by an index.
+    """
+    page_size_query_param = 'limit'
+
+    def get_page_size(self, request):
+        """Read the default and maximum page size at request time so they can be tuned per deployment."""
+        config = settings.CORE_API_PAGINATION
+        self.page_size = config['PAGE_SIZE']
+        self.max_page_size = config['MAX_PAGE_SIZE']
+        return super().get_page_size(request)
+
+
+class UserPagination(KeysetPagination):
+    """Users in primary key order."""
+    ordering = 'id'
+
+
+class AllergyPagination(KeysetPagination):
+    """A user's allergies, newest first, on the (user, created_at, id) index."""
+    ordering = ('-created_at', '-id')
@@ -0,0 +1,63 @@
+"""
+Unit tests for pagination in the core_api app.
+Covers cursor pagination of the user and allergy lists, page size limits and
+ordering ties.
+"""
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from core_api.models import Allergy
+
+
+@override_settings(CORE_API_PAGINATION={'PAGE_SIZE': 3, 'MAX_PAGE_SIZE': 5})
+class KeysetPaginationTest(APITestCase):
+    """Test suite for cursor pagination of UserViewSet and AllergyViewSet."""
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        other = User.objects.create(username='otheruser')
+        Allergy.objects.create(user=other, name='Shellfish', severity='severe', symptoms='-', triggers='-')
+        for i in range(8):
+            Allergy.objects.create(user=self.user, name=f'Allergy {i}', severity='mild', symptoms='-', triggers='-')
+        # Two records created in the same instant still page in a stable order
+        same_time = timezone.now() - timedelta(days=1)
+        Allergy.objects.filter(name__in=['Allergy 2', 'Allergy 3']).update(created_at=same_time)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url):
+        names, pages = [], 0
+        while url:
+            data = self.client.get(url).data
+            names += [item.get('name') or item.get('username') for item in data['results']]
+            url, pages = data['next'], pages + 1
+        return names, pages
+
+    def test_allergy_pages(self):
+        """Test that following next links returns each of the user's allergies once, newest first."""
+        names, pages = self.walk('/api/core/allergies/')
+        self.assertEqual(pages, 3)
+        self.assertEqual(names, ['Allergy 7', 'Allergy 6', 'Allergy 5', 'Allergy 4', 'Allergy 1', 'Allergy 0',
+                                 'Allergy 3', 'Allergy 2'])
+
+    def test_limit(self):
+        """Test that ?limit= changes the page size up to the maximum."""
+        self.assertEqual(len(self.client.get('/api/core/allergies/', {'limit': 2}).data['results']), 2)
+        self.assertEqual(len(self.client.get('/api/core/allergies/', {'limit': 100}).data['results']), 5)
+
+    def test_previous_link(self):
+        """Test that the previous link of page two returns page one."""
+        first = self.client.get('/api/core/allergies/').data
+        second = self.client.get(first['next']).data
+        self.assertIsNone(first['previous'])
+        self.assertEqual(self.client.get(second['previous']).data['results'], first['results'])
+
+    def test_user_pages(self):
+        """Test that users page in id order."""
+        User.objects.bulk_create([User(username=f'user{i}') for i in range(5)])
+        names, pages = self.walk('/api/core/users/')
+        self.assertEqual(pages, 3)
+        self.assertEqual(names[:2], ['testuser', 'otheruser'])
+        self.assertEqual(len(names), 7)
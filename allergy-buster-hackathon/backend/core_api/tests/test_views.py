@@ -2,6 +2,8 @@
 Unit tests for views in the core_api app.
 Covers authentication, permissions, CRUD operations, custom actions, error handling, and edge cases for UserViewSet and AllergyViewSet.
 """
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
@@ -52,8 +54,8 @@ class AllergyViewSetTest(APITestCase):
         url = reverse('allergy-list') if 'allergy-list' in [u.name for u in self.client.handler._view_resolver.url_patterns] else '/api/core/allergies/'
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['name'], 'Peanuts')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['name'], 'Peanuts')
 
     def test_create_allergy(self):
         """Test creating a new allergy for the authenticated user."""
@@ -119,4 +121,96 @@ class AllergyViewSetTest(APITestCase):
         response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('name', response.data)
-        self.assertIn('severity', response.data) 
\ No newline at end of file
+        self.assertIn('severity', response.data) 
+
+class AllergyBulkTest(APITestCase):
+    """Test suite for the AllergyViewSet bulk action."""
+
+    url = '/api/core/allergies/bulk/'
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser')
+        self.other_user = User.objects.create(username='otheruser')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.allergy = Allergy.objects.create(user=self.user, name='Peanuts', severity='severe',
+                                              symptoms='Hives', triggers='Peanut butter')
+        self.other = Allergy.objects.create(user=self.other_user, name='Dust', severity='mild',
+                                            symptoms='Sneezing', triggers='Dust')
+
+    def record(self, name, severity='mild'):
+        return {'name': name, 'severity': severity, 'symptoms': 'Rash', 'triggers': name}
+
+    def test_create_update_delete(self):
+        """Test that creates, updates and deletes are applied together."""
+        extra = Allergy.objects.create(user=self.user, name='Eggs', severity='mild', symptoms='-', triggers='-')
+        response = self.client.post(self.url, {
+            'create': [self.record('Milk'), self.record('Soy')],
+            'update': [{'id': self.allergy.id, 'severity': 'moderate'}],
+            'delete': [extra.id],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.data['created']], ['Milk', 'Soy'])
+        self.assertIsNotNone(response.data['created'][0]['id'])
+        self.assertEqual(response.data['deleted'], 1)
+        self.allergy.refresh_from_db()
+        self.assertEqual(self.allergy.severity, 'moderate')
+        self.assertEqual(self.allergy.name, 'Peanuts')
+        self.assertGreater(self.allergy.updated_at, self.allergy.created_at)
+        self.assertEqual(sorted(self.user.allergies.values_list('name', flat=True)), ['Milk', 'Peanuts', 'Soy'])
+
+    def test_errors_write_nothing(self):
+        """Test that per-item errors are returned and no records change."""
+        response = self.client.post(self.url, {
+            'create': [self.record('Milk'), self.record('', severity='extreme')],
+            'update': [{'id': self.other.id, 'severity': 'severe'}, {'id': self.allergy.id, 'severity': 'x'}],
+            'delete': [999999, {'id': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = [(e['operation'], e['index'], sorted(e['errors'])) for e in response.data['errors']]
+        self.assertEqual(errors, [('create', 1, ['name', 'severity', 'triggers']), ('update', 0, ['id']),
+                                  ('update', 1, ['severity']), ('delete', 0, ['id']), ('delete', 1, ['id'])])
+        self.assertEqual(Allergy.objects.count(), 2)
+        self.other.refresh_from_db()
+        self.assertEqual(self.other.severity, 'mild')
+
+    def test_list_body_and_limits(self):
+        """Test that a bare list creates records and oversized or malformed requests are rejected."""
+        response = self.client.post(self.url, [self.record('Milk')], format='json')
+        self.assertEqual(len(response.data['created']), 1)
+        self.assertEqual(self.client.post(self.url, {'upsert': []}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'create': {}}, format='json').status_code, 400)
+        with self.settings(CORE_API_BULK={'MAX_ITEMS': 2, 'BATCH_SIZE': 500}):
+            response = self.client.post(self.url, [self.record('A'), self.record('B'), self.record('C')],
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_thousands_of_records(self):
+        """Test that a few thousand records are written in a handful of queries."""
+        records = [self.record(f'Allergen {i}') for i in range(3000)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, records, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # One INSERT per batch (SQLite caps a batch at 999 parameters), not one per record
+        self.assertLess(len(queries), 40)
+        self.assertEqual(self.user.allergies.count(), 3001)
+
+    def test_update_keeps_created_at(self):
+        """Test that updates change only the given fields and never insert rows."""
+        created_at = self.allergy.created_at
+        response = self.client.post(self.url, {'update': [{'id': self.allergy.id, 'notes': 'Epipen'}]},
+                                    format='json')
+        self.assertEqual(response.data['updated'][0]['notes'], 'Epipen')
+        self.allergy.refresh_from_db()
+        self.assertEqual((self.allergy.notes, self.allergy.created_at), ('Epipen', created_at))
+        self.assertEqual(Allergy.objects.count(), 2)
+
+    def test_update_and_delete_same_id(self):
+        """Test that an id cannot be both updated and deleted in one request."""
+        response = self.client.post(self.url, {'update': [{'id': self.allergy.id, 'severity': 'mild'}],
+                                               'delete': [self.allergy.id]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [{'operation': 'delete', 'index': 0,
+                                                    'errors': {'id': ['Also in update.']}}])
+        self.allergy.refresh_from_db()
+        self.assertEqual(self.allergy.severity, 'severe')
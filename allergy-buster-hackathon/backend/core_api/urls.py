@@ -10,7 +10,7 @@ from . import views
 router = DefaultRouter()
 # User endpoints: /users/, /users/{id}/, /users/me/
 router.register(r'users', views.UserViewSet)
-# Allergy endpoints: /allergies/, /allergies/{id}/
+# Allergy endpoints: /allergies/, /allergies/{id}/, /allergies/bulk/
 router.register(r'allergies', views.AllergyViewSet, basename='allergy')
 
 # The API URLs are now determined automatically by the router.
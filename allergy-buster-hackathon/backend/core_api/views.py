@@ -3,25 +3,36 @@ Views for the core_api app.
 Implements API endpoints for user and allergy management with security, efficiency, and logging.
 """
 import logging
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.serializers import as_serializer_error
 from django.contrib.auth.models import User
 from .models import Allergy
+from .pagination import AllergyPagination, UserPagination
 from .serializers import UserSerializer, AllergySerializer
 
 # Set up a logger for this module
 logger = logging.getLogger(__name__)
 
+def is_id(value):
+    """True for an integer primary key in a request body (JSON true/false are not ids)."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
 class UserViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing User objects.
     Only authenticated users can access these endpoints.
+    Lists are cursor-paginated by id.
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = UserPagination
 
     @action(detail=False, methods=['get'])
     def me(self, request):
@@ -39,9 +50,11 @@ class AllergyViewSet(viewsets.ModelViewSet):
     """
     ViewSet for managing Allergy objects for the authenticated user.
     Only authenticated users can access these endpoints.
+    Lists are cursor-paginated, newest first.
     """
     serializer_class = AllergySerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AllergyPagination
 
     def get_queryset(self):
         """
@@ -58,4 +71,109 @@ class AllergyViewSet(viewsets.ModelViewSet):
             serializer.save(user=self.request.user)
         except Exception as e:
             logger.error(f"Error creating allergy: {e}")
-            raise APIException("An error occurred while creating the allergy record.")
\ No newline at end of file
+            raise APIException("An error occurred while creating the allergy record.")
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create, update and delete many allergies in one transaction.
+        Expects {"create": [...], "update": [{"id": ..., ...}], "delete": [ids]};
+        a bare list is treated as creates. Every item is validated first, and
+        if any fails nothing is written and the per-item errors are returned.
+        """
+        data = request.data
+        if isinstance(data, list):
+            data = {'create': data}
+        if not isinstance(data, dict) or set(data) - {'create', 'update', 'delete'}:
+            return Response({'detail': 'Expected a list, or an object with create, update and delete lists.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        creates, updates, deletes = data.get('create', []), data.get('update', []), data.get('delete', [])
+        if not all(isinstance(items, list) for items in (creates, updates, deletes)):
+            return Response({'detail': 'create, update and delete must be lists.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        config = settings.CORE_API_BULK
+        if len(creates) + len(updates) + len(deletes) > config['MAX_ITEMS']:
+            return Response({'detail': f"At most {config['MAX_ITEMS']} items per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        ids = [item.get('id') if isinstance(item, dict) else None for item in updates] + deletes
+        try:
+            with transaction.atomic():
+                # One query loads (and locks) every allergy being updated or deleted
+                owned = Allergy.objects.filter(user=request.user).select_for_update().in_bulk(
+                    [i for i in ids if is_id(i)])
+                new, changed, fields, errors = self.validate_bulk(creates, updates, deletes, owned)
+                if errors:
+                    return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+                Allergy.objects.bulk_create(new, batch_size=config['BATCH_SIZE'])
+                if changed:
+                    self.update_bulk(changed, sorted(fields), config['BATCH_SIZE'])
+                deleted = Allergy.objects.filter(user=request.user, id__in=deletes).delete()[0] if deletes else 0
+        except Exception as e:
+            logger.error(f"Error writing allergies in bulk: {e}")
+            raise APIException("An error occurred while saving the allergy records.")
+
+        logger.info(f"Bulk allergies for {request.user}: {len(new)} created, {len(changed)} updated, "
+                    f"{deleted} deleted")
+        return Response({
+            'created': self.get_serializer(new, many=True).data,
+            'updated': self.get_serializer(changed, many=True).data,
+            'deleted': deleted,
+        })
+
+    def validate_bulk(self, creates, updates, deletes, owned):
+        """
+        Validate a bulk request against the user's allergies in `owned`.
+        Returns unsaved new allergies, changed allergies, the changed field
+        names and a list of per-item errors.
+        """
+        errors = []
+        # One serializer per operation validates every item, as ListSerializer
+        # does; building a ModelSerializer's fields per item dominates otherwise
+        new, serializer = [], self.get_serializer()
+        for index, item in enumerate(creates):
+            try:
+                new.append(Allergy(user=self.request.user, **serializer.run_validation(item)))
+            except ValidationError as exc:
+                errors.append({'operation': 'create', 'index': index, 'errors': as_serializer_error(exc)})
+
+        changed, fields, seen = [], set(), set()
+        serializer = self.get_serializer(partial=True)
+        for index, item in enumerate(updates):
+            allergy_id = item.get('id') if isinstance(item, dict) else None
+            if not is_id(allergy_id) or allergy_id not in owned:
+                errors.append({'operation': 'update', 'index': index, 'errors': {'id': ['Not found.']}})
+                continue
+            if allergy_id in seen:
+                errors.append({'operation': 'update', 'index': index, 'errors': {'id': ['Duplicate id.']}})
+                continue
+            seen.add(allergy_id)
+            serializer.instance = owned[allergy_id]
+            try:
+                validated = serializer.run_validation(item)
+            except ValidationError as exc:
+                errors.append({'operation': 'update', 'index': index, 'errors': as_serializer_error(exc)})
+                continue
+            for field, value in validated.items():
+                setattr(serializer.instance, field, value)
+                fields.add(field)
+            changed.append(serializer.instance)
+
+        for index, allergy_id in enumerate(deletes):
+            if not is_id(allergy_id) or allergy_id not in owned:
+                errors.append({'operation': 'delete', 'index': index, 'errors': {'id': ['Not found.']}})
+            elif allergy_id in seen:
+                errors.append({'operation': 'delete', 'index': index, 'errors': {'id': ['Also in update.']}})
+        return new, changed, fields, errors
+
+    def update_bulk(self, changed, fields, batch_size):
+        """
+        Write changed allergies with bulk_update: one UPDATE ... WHERE id IN
+        per batch, touching only rows validate_bulk found in the user's
+        allergies and never inserting.
+        """
+        now = timezone.now()
+        for allergy in changed:
+            # bulk_update skips auto_now
+            allergy.updated_at = now
+        Allergy.objects.bulk_update(changed, fields + ['updated_at'], batch_size=batch_size)
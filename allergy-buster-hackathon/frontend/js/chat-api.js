@@ -13,6 +13,9 @@ const sendButton = document.getElementById('send-button');
 // Chat history
 let chatHistory = [];
 
+// Server-side conversation session, so follow-up questions keep their context
+let chatSessionId = sessionStorage.getItem('chatSessionId');
+
 /**
  * Initialize the chat functionality
  */
@@ -50,7 +53,7 @@ async function sendMessage(event) {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify({ message: message })
+      body: JSON.stringify({ message: message, session_id: chatSessionId })
     });
     
     if (!response.ok) {
@@ -66,6 +69,10 @@ async function sendMessage(event) {
     
     // Add bot response to chat
     if (data.status === 'success') {
+      if (data.session_id) {
+        chatSessionId = data.session_id;
+        sessionStorage.setItem('chatSessionId', chatSessionId);
+      }
       addBotMessage(data.reply);
     } else {
       throw new Error(data.message || 'Failed to get response');
@@ -78,4 +78,67 @@ async function displayMedicationInfo(medicationName) {
   } catch (error) {
     resultsContainer.innerHTML = `<div class="error">Error loading medication data: ${error.message}</div>`;
   }
-}
\ No newline at end of file
+}
+
+/**
+ * Fetch medication name suggestions for a partial name
+ * @param {string} query - What the user has typed so far
+ * @returns {Promise} - Promise that resolves to a list of suggestions
+ */
+async function fetchMedicationSuggestions(query) {
+  const response = await fetch(`/api/chatbot/medication/autocomplete/?q=${encodeURIComponent(query)}`);
+
+  if (!response.ok) {
+    throw new Error(`API error: ${response.status}`);
+  }
+
+  const data = await response.json();
+  return data.results;
+}
+
+/**
+ * Attach name suggestions to a medication text input using a datalist
+ * @param {HTMLInputElement} input - The input to add suggestions to
+ */
+function attachMedicationAutocomplete(input, index) {
+  const datalist = document.createElement('datalist');
+  // The page reuses some input ids across modals, so number the lists
+  datalist.id = `medication-suggestions-${index}`;
+  input.setAttribute('list', datalist.id);
+  input.setAttribute('autocomplete', 'off');
+  input.insertAdjacentElement('afterend', datalist);
+
+  let timer = null;
+  let latest = '';
+  input.addEventListener('input', function() {
+    clearTimeout(timer);
+    const query = input.value.trim();
+    if (query.length < 2) {
+      datalist.innerHTML = '';
+      return;
+    }
+    // Wait for a short pause in typing before asking the backend
+    timer = setTimeout(async function() {
+      latest = query;
+      try {
+        const suggestions = await fetchMedicationSuggestions(query);
+        if (query !== latest) return;
+        datalist.innerHTML = '';
+        suggestions.forEach(suggestion => {
+          const option = document.createElement('option');
+          option.value = suggestion.name;
+          if (suggestion.canonical && suggestion.canonical.toLowerCase() !== suggestion.name.toLowerCase()) {
+            option.label = `${suggestion.name} (${suggestion.canonical})`;
+          }
+          datalist.appendChild(option);
+        });
+      } catch (error) {
+        console.error('Error fetching medication suggestions:', error);
+      }
+    }, 150);
+  });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+  document.querySelectorAll('#med-search, #med-name, #medication-search').forEach(attachMedicationAutocomplete);
+});
@@ -84,11 +84,12 @@ function handleUseCurrentLocationClick() {
  * @param {number} latitude - User's latitude
  * @param {number} longitude - User's longitude
  * @param {string} distance - Search radius in miles
+ * @param {number} page - Page of results, nearest first
  */
-function fetchNearbyDoctors(latitude, longitude, distance) {
+function fetchNearbyDoctors(latitude, longitude, distance, page = 1) {
   showDoctorsLoading(true);
   
-  const url = `/api/chatbot/nearby-doctors/?latitude=${latitude}&longitude=${longitude}&distance=${distance}&specialty=allergist`;
+  const url = `/api/chatbot/nearby-doctors/?latitude=${latitude}&longitude=${longitude}&distance=${distance}&specialty=allergist&page=${page}`;
   
   fetch(url)
     .then(response => {
@@ -217,14 +218,20 @@ function displayNearbyDoctors(data) {
   }
   
   // Show pagination if needed
-  if (data.total_results > 5) {
+  if (data.total_pages > 1) {
     const pagination = document.createElement('div');
     pagination.className = 'pagination';
     pagination.innerHTML = `
-      <button class="btn btn-outline"><i class="fas fa-chevron-left"></i> Previous</button>
-      <span>Page 1 of ${Math.ceil(data.total_results / 5)}</span>
-      <button class="btn btn-outline">Next <i class="fas fa-chevron-right"></i></button>
+      <button class="btn btn-outline" data-page="${data.page - 1}" ${data.page <= 1 ? 'disabled' : ''}><i class="fas fa-chevron-left"></i> Previous</button>
+      <span>Page ${data.page} of ${data.total_pages}</span>
+      <button class="btn btn-outline" data-page="${data.page + 1}" ${data.page >= data.total_pages ? 'disabled' : ''}>Next <i class="fas fa-chevron-right"></i></button>
     `;
+    pagination.querySelectorAll('button').forEach(button => {
+      button.addEventListener('click', () => {
+        fetchNearbyDoctors(data.location.latitude, data.location.longitude, data.search_params.distance,
+                           Number(button.dataset.page));
+      });
+    });
     doctorsContainer.appendChild(pagination);
   }
 }